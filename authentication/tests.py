@@ -1,3 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from onboarding.models import Document, DocumentType
+from tavonga_system.instrumentation import query_budget
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every authentication route runs the same number of queries with one worker
+    and one document as with 500 workers and 50 documents, and stays within its
+    entry in ``REQUEST_QUERY_BUDGETS``
+    """
+    LARGE_DOCUMENTS = 50
+    LARGE_WORKERS = 500
+
+    def setUp(self):
+        self.password = 'testpass123'
+        self.user = User.objects.create_user(
+            username='budgetuser', email='budgetuser@example.com', password=self.password,
+            first_name='Budget', last_name='User', role='worker',
+        )
+        self.registrations = 0
+        self.add_documents(1)
+
+    def add_documents(self, count):
+        # Profile changes re-index every document that embeds the user's name
+        types = DocumentType.objects.bulk_create([
+            DocumentType(name=f'type_{index}', display_name=f'Type {index}')
+            for index in range(DocumentType.objects.count(), DocumentType.objects.count() + count)
+        ])
+        for document_type in types:
+            Document.objects.create(
+                user=self.user, document_type=document_type, file=f'documents/{document_type.name}.pdf', file_size=8,
+            )
+
+    def grow(self):
+        User.objects.bulk_create([
+            User(username=f'worker{index}', email=f'worker{index}@example.com', role='worker')
+            for index in range(self.LARGE_WORKERS - 1)
+        ])
+        self.add_documents(self.LARGE_DOCUMENTS - 1)
+
+    def route_calls(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        refresh = str(RefreshToken.for_user(self.user))
+        self.registrations += 1
+        username = f'newworker{self.registrations}'
+        return [
+            ('register', lambda: APIClient().post(reverse('register'), {
+                'username': username, 'email': f'{username}@example.com',
+                'password': 'newpass12345', 'password_confirm': 'newpass12345',
+                'first_name': 'New', 'last_name': 'Worker', 'role': 'worker',
+            }, format='json')),
+            ('login', lambda: APIClient().post(
+                reverse('login'), {'email': self.user.email, 'password': self.password}, format='json'
+            )),
+            ('token_refresh', lambda: APIClient().post(reverse('token_refresh'), {'refresh': refresh}, format='json')),
+            ('profile', lambda: client.get(reverse('profile'))),
+            # A new name each pass, so every pass re-indexes the user's documents
+            ('update_profile', lambda: client.patch(
+                reverse('update_profile'), {'first_name': f'Budgeted{self.registrations}'}, format='json'
+            )),
+            ('change_password', lambda: client.put(
+                reverse('change_password'), {'old_password': self.password, 'new_password': self.password}, format='json'
+            )),
+        ]
+
+    def measure(self):
+        counts = {}
+        for route, call in self.route_calls():
+            with CaptureQueriesContext(connection) as queries:
+                response = call()
+            method = response.request['REQUEST_METHOD']
+            self.assertLess(response.status_code, 400, f'{method} {route}: {response.status_code}')
+            counts[method, route] = len(queries)
+        return counts
+
+    def test_routes_run_constant_queries_within_budget(self):
+        small = self.measure()
+        self.grow()
+        large = self.measure()
+        for key, count in large.items():
+            method, route = key
+            with self.subTest(route=route, method=method):
+                self.assertEqual(count, small[key], f'{method} {route} scales with data: {small[key]} -> {count} queries')
+                budget = query_budget(route, method)
+                self.assertIsNotNone(budget, f'{method} {route} has no query budget')
+                self.assertLessEqual(count, budget)
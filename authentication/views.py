@@ -1,5 +1,6 @@
 from rest_framework import status, generics
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -9,6 +10,7 @@ from users.serializers import UserSerializer, UserRegistrationSerializer
 from .serializers import ChangePasswordSerializer, EmailTokenObtainPairSerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from tavonga_system.throttling import TokenBucketThrottle
 
 User = get_user_model()
 
@@ -16,6 +18,8 @@ User = get_user_model()
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Custom login view that uses email instead of username"""
     serializer_class = EmailTokenObtainPairSerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
     
     @swagger_auto_schema(
         operation_description="Login with email and password to get JWT tokens",
@@ -43,7 +47,14 @@ class CustomTokenObtainPairView(TokenObtainPairView):
         }
     )
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
+        try:
+            response = super().post(request, *args, **kwargs)
+        except ValidationError:
+            # Wrong credentials count against the account's failures_only bucket
+            for throttle in self.get_throttles():
+                if hasattr(throttle, 'record_failure'):
+                    throttle.record_failure(request, self)
+            raise
         if response.status_code == 200:
             # Get user by email to include user data in response
             email = request.data.get('email')
@@ -66,6 +77,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([TokenBucketThrottle.for_scope('register')])
 def register(request):
     """User registration endpoint"""
     serializer = UserRegistrationSerializer(data=request.data)
@@ -121,7 +133,7 @@ class ChangePasswordView(generics.UpdateAPIView):
                 return Response({'error': 'Invalid old password'}, status=status.HTTP_400_BAD_REQUEST)
             
             user.set_password(new_password)
-            user.save()
+            user.save(update_fields=['password'])
             
             return Response({'message': 'Password updated successfully'}, status=status.HTTP_200_OK)
         
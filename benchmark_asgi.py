@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Compare dashboard latency between a WSGI and an ASGI deployment.
+
+Start the same code twice, one worker each, e.g.:
+
+    gunicorn tavonga_system.wsgi:application --workers 1 --bind 0.0.0.0:8000
+    gunicorn tavonga_system.asgi:application --workers 1 \\
+        --worker-class uvicorn_worker.UvicornWorker --bind 0.0.0.0:8001
+
+then run:
+
+    python benchmark_asgi.py --email worker@example.com --password secret
+
+The sync endpoint is hit on the WSGI server and the async endpoint on the ASGI
+server at each concurrency level; p50/p99 latency and requests/sec show how
+many concurrent clients one process sustains.
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from test_api import percentile
+
+TARGETS = [
+    ('wsgi', '--wsgi', '/api/onboarding/dashboard/'),
+    ('asgi', '--asgi', '/api/onboarding/dashboard/async/'),
+]
+
+
+def login(base_url, email, password):
+    response = requests.post(f"{base_url}/api/auth/login/", json={"email": email, "password": password})
+    response.raise_for_status()
+    return response.json()['access']
+
+
+def run_level(url, token, concurrency, duration):
+    """Hammer ``url`` from ``concurrency`` clients for ``duration`` seconds"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        nonlocal errors
+        session = requests.Session()
+        session.headers['Authorization'] = f"Bearer {token}"
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = session.get(url, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wsgi', default='http://localhost:8000', help='Base URL of the WSGI server')
+    parser.add_argument('--asgi', default='http://localhost:8001', help='Base URL of the ASGI server')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', default='1,10,50,100', help='Comma-separated client counts')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per level')
+    args = parser.parse_args()
+
+    try:
+        tokens = {label: login(getattr(args, option[2:]), args.email, args.password) for label, option, _ in TARGETS}
+    except requests.RequestException as exc:
+        print(f"❌ Login failed: {exc}")
+        sys.exit(1)
+
+    print(f"{'server':<6} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        for label, option, path in TARGETS:
+            url = getattr(args, option[2:]) + path
+            latencies, errors = run_level(url, tokens[label], concurrency, args.duration)
+            if not latencies:
+                print(f"{label:<6} {concurrency:>7} {'-':>9} {'-':>9} {'-':>9} {errors:>7}")
+                continue
+            print(
+                f"{label:<6} {concurrency:>7} {len(latencies) / args.duration:>9.1f} "
+                f"{statistics.median(latencies) * 1000:>9.1f} {percentile(latencies, 99) * 1000:>9.1f} {errors:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Gunicorn settings shared by the WSGI and ASGI start modes (see start.sh).
+
+Workers are recycled after a bounded number of requests to cap memory growth;
+database connections and pools are closed around every fork and exit so a
+recycled worker never inherits or leaks Postgres connections.
+"""
+import os
+import shutil
+
+# Workers write Prometheus samples here so /metrics aggregates all of them;
+# set before any worker imports prometheus_client
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/agnovat-prometheus')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+# More than one thread makes WSGI workers gthread workers, which serve several
+# requests at once (so the admission gates in tavonga_system/admission.py have
+# something to limit); keep it within DB_POOL_MAX_SIZE. Uvicorn workers ignore it.
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+# Loading the app in each worker keeps connection pools (and their background
+# threads) out of the master process
+preload_app = False
+
+
+def on_starting(server):
+    # Samples from a previous run would be counted again
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def post_fork(server, worker):
+    from tavonga_system.db import close_connections
+
+    close_connections()
+
+
+def worker_exit(server, worker):
+    from tavonga_system.db import close_connections
+
+    close_connections()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
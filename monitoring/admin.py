@@ -0,0 +1,66 @@
+from django.contrib import admin
+from django.utils.html import format_html
+
+from .models import SlowQuery, SlowQueryGroup
+
+
+class ReadOnlyAdminMixin:
+    """Captured data is written by the recorder only"""
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class SlowQueryInline(ReadOnlyAdminMixin, admin.TabularInline):
+    model = SlowQuery
+    fields = ['created_at', 'duration_ms', 'route', 'database']
+    readonly_fields = fields
+    show_change_link = True
+    extra = 0
+    max_num = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('stack', 'plan', 'sql')
+
+
+@admin.register(SlowQueryGroup)
+class SlowQueryGroupAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = ['short_sql', 'occurrences', 'average', 'max_ms', 'total_ms', 'last_seen']
+    search_fields = ['sql', 'fingerprint']
+    readonly_fields = ['fingerprint', 'formatted_sql', 'occurrences', 'total_ms', 'max_ms', 'first_seen', 'last_seen']
+    fields = readonly_fields
+    inlines = [SlowQueryInline]
+
+    def short_sql(self, obj):
+        return obj.sql[:120]
+    short_sql.short_description = 'SQL'
+
+    def average(self, obj):
+        return f"{obj.average_ms:.1f}"
+    average.short_description = 'Avg ms'
+    average.admin_order_field = 'total_ms'
+
+    def formatted_sql(self, obj):
+        return format_html('<pre style="white-space: pre-wrap">{}</pre>', obj.sql)
+    formatted_sql.short_description = 'SQL'
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = ['created_at', 'duration_ms', 'route', 'database', 'group']
+    list_filter = ['database', 'route', 'created_at']
+    search_fields = ['sql', 'route']
+    list_select_related = ['group']
+    readonly_fields = ['group', 'created_at', 'duration_ms', 'route', 'database', 'sql', 'formatted_stack', 'formatted_plan']
+    fields = readonly_fields
+
+    def formatted_stack(self, obj):
+        return format_html('<pre>{}</pre>', obj.stack)
+    formatted_stack.short_description = 'Stack'
+
+    def formatted_plan(self, obj):
+        return format_html('<pre>{}</pre>', obj.plan or 'Not captured (SLOW_QUERY_EXPLAIN is off)')
+    formatted_plan.short_description = 'Plan'
@@ -0,0 +1,54 @@
+import pstats
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.profiling import list_profiles, profile_dir
+
+
+class Command(BaseCommand):
+    help = 'List captured request profiles, or print one (--show) or a merged summary (--summary)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--route', help='Only profiles for this URL name')
+        parser.add_argument('--show', metavar='ID', help='Print the call statistics of one profile')
+        parser.add_argument('--summary', action='store_true', help='Merge the listed profiles and print their statistics')
+        parser.add_argument('--sort', default='cumulative', help='pstats sort key (default: cumulative)')
+        parser.add_argument('--limit', type=int, default=25, help='Functions to print')
+
+    def handle(self, *args, **options):
+        profiles = list_profiles()
+        if options['route']:
+            profiles = [entry for entry in profiles if entry['route'] == options['route']]
+
+        if options['show']:
+            path = profile_dir() / f"{options['show']}.prof"
+            if not path.exists():
+                raise CommandError(f"No profile {options['show']!r} in {profile_dir()}")
+            self.print_stats([path], options)
+        elif options['summary']:
+            if not profiles:
+                raise CommandError('No profiles to summarise')
+            self.stdout.write(f'Merged {len(profiles)} profiles')
+            self.print_stats([profile_dir() / f"{entry['id']}.prof" for entry in profiles], options)
+        else:
+            self.list(profiles)
+
+    def list(self, profiles):
+        if not profiles:
+            self.stdout.write(f'No profiles in {profile_dir()}')
+            return
+        for entry in profiles:
+            started = datetime.fromtimestamp(entry['started']).strftime('%Y-%m-%d %H:%M:%S')
+            self.stdout.write(
+                f"{entry['id']}  {started}  {entry['method']:<6} {entry['status']}  "
+                f"{entry['duration_ms']:>9.1f} ms  {entry['trigger']:<6}  {entry['route'] or entry['path']}"
+            )
+        durations = sorted(entry['duration_ms'] for entry in profiles)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(profiles)} profiles, median {durations[len(durations) // 2]:.1f} ms, max {durations[-1]:.1f} ms'
+        ))
+
+    def print_stats(self, paths, options):
+        stats = pstats.Stats(*[str(path) for path in paths], stream=self.stdout)
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQueryGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=32, unique=True)),
+                ('sql', models.TextField(help_text='Normalised SQL')),
+                ('occurrences', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-total_ms'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sql', models.TextField()),
+                ('params', models.TextField(blank=True)),
+                ('duration_ms', models.FloatField()),
+                ('database', models.CharField(max_length=32)),
+                ('route', models.CharField(blank=True, max_length=200)),
+                ('stack', models.TextField(blank=True)),
+                ('plan', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='samples', to='monitoring.slowquerygroup')),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
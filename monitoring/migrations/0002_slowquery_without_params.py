@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='slowquery',
+            name='params',
+        ),
+        migrations.AlterField(
+            model_name='slowquery',
+            name='sql',
+            field=models.TextField(help_text='Normalised SQL, without parameters'),
+        ),
+    ]
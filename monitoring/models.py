@@ -0,0 +1,41 @@
+from django.db import models
+
+
+class SlowQueryGroup(models.Model):
+    """Slow queries sharing a normalised SQL fingerprint"""
+    fingerprint = models.CharField(max_length=32, unique=True)
+    sql = models.TextField(help_text="Normalised SQL")
+    occurrences = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-total_ms']
+
+    def __str__(self):
+        return f"{self.sql[:80]} ({self.occurrences}x)"
+
+    @property
+    def average_ms(self):
+        return self.total_ms / self.occurrences if self.occurrences else 0
+
+
+class SlowQuery(models.Model):
+    """One captured slow query; the table is capped at SLOW_QUERY_MAX_ROWS"""
+    group = models.ForeignKey(SlowQueryGroup, on_delete=models.CASCADE, related_name='samples')
+    sql = models.TextField(help_text="Normalised SQL, without parameters")
+    duration_ms = models.FloatField()
+    database = models.CharField(max_length=32)
+    route = models.CharField(max_length=200, blank=True)
+    stack = models.TextField(blank=True)
+    plan = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'slow queries'
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms {self.route or '-'}"
@@ -0,0 +1,176 @@
+"""
+On-demand request profiling.
+
+A request is profiled with cProfile when it carries a valid signed
+``X-Profile`` token (issued to admins by ``profiling-token``) or is picked by
+``PROFILING_SAMPLE_RATE``. Profiles are written to ``PROFILING_DIR``, which
+keeps only the newest ``PROFILING_MAX_FILES``; inspect them with
+``manage.py profiles``.
+
+With ``PROFILING_ENABLED`` off the middleware removes itself from the stack at
+startup, so it costs nothing.
+
+Under ASGI an async request is profiled on the event loop thread: the profile
+also contains other tasks that ran while it awaited, and misses sync code it
+hands to worker threads. Each process profiles one request at a time.
+"""
+import cProfile
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+TOKEN_SALT = 'monitoring.profiling'
+HEADER = 'X-Profile'
+PROFILER_ROLES = ['admin', 'coordinator']
+
+# cProfile can't run two profiles on one thread, and from Python 3.12 not two
+# at once in a process; requests arriving meanwhile run unprofiled
+_profiling = threading.Lock()
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', '/tmp/agnovat-profiles'))
+
+
+def make_token(user):
+    return signing.dumps({'u': user.pk}, salt=TOKEN_SALT)
+
+
+def read_token(token):
+    """Return the issuing user's id, or None for a missing, forged or expired token"""
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600))
+    except signing.BadSignature:
+        return None
+    return payload.get('u')
+
+
+def token_requester(token):
+    """
+    The id of the user a token was issued to, if they may still profile.
+
+    Tokens live for PROFILING_TOKEN_MAX_AGE, so the role is checked again: a
+    token stops working as soon as its user is deactivated or demoted.
+    """
+    user_id = read_token(token)
+    if user_id is None:
+        return None
+    return get_user_model().objects.filter(
+        pk=user_id, is_active=True, role__in=PROFILER_ROLES,
+    ).values_list('pk', flat=True).first()
+
+
+def save_profile(profiler, meta):
+    """Write a profile and its metadata, then trim the ring buffer; returns the profile id"""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    route = (meta['route'] or 'unmatched').replace(':', '_').replace('/', '_')
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{random.randrange(16 ** 6):06x}-{route}"
+    profiler.dump_stats(directory / f'{profile_id}.prof')
+    (directory / f'{profile_id}.json').write_text(json.dumps(meta))
+    trim(directory, getattr(settings, 'PROFILING_MAX_FILES', 50))
+    return profile_id
+
+
+def trim(directory, keep):
+    profiles = sorted(directory.glob('*.prof'), key=lambda path: path.stat().st_mtime)
+    for path in profiles[:max(len(profiles) - keep, 0)]:
+        # Another worker may be trimming at the same time
+        path.unlink(missing_ok=True)
+        path.with_suffix('.json').unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first"""
+    entries = []
+    for path in profile_dir().glob('*.json'):
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if path.with_suffix('.prof').exists():
+            entries.append({'id': path.stem, **meta})
+    return sorted(entries, key=lambda entry: entry['started'], reverse=True)
+
+
+class ProfilingMiddleware:
+    """Profiles triggered or sampled requests; removed entirely when PROFILING_ENABLED is off"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _wanted(self, request):
+        """Whether to profile: ``(profile, requesting user id)``"""
+        # Only touch the database when a token is actually presented
+        user_id = token_requester(request.headers[HEADER]) if HEADER in request.headers else None
+        return user_id is not None or bool(self.sample_rate and random.random() < self.sample_rate), user_id
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        wanted, user_id = self._wanted(request)
+        if not wanted or not _profiling.acquire(blocking=False):
+            return self.get_response(request)
+
+        started = time.time()
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            _profiling.release()
+        return self.finish(request, response, profiler, started, user_id)
+
+    async def __acall__(self, request):
+        wanted, user_id = await sync_to_async(self._wanted)(request)
+        if not wanted or not _profiling.acquire(blocking=False):
+            return await self.get_response(request)
+
+        started = time.time()
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            _profiling.release()
+        return await sync_to_async(self.finish)(request, response, profiler, started, user_id)
+
+    def finish(self, request, response, profiler, started, user_id):
+        match = getattr(request, 'resolver_match', None)
+        profile_id = save_profile(profiler, {
+            'route': match.view_name if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round((time.time() - started) * 1000, 1),
+            'started': started,
+            'trigger': 'header' if user_id is not None else 'sample',
+            'requested_by': user_id,
+        })
+        if user_id is not None:
+            response['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,162 @@
+"""
+Slow-query log.
+
+Off unless ``SLOW_QUERY_THRESHOLD_MS`` is set. Every query taking at least
+that long is stored as a ``SlowQuery`` with its route, the application frames
+of its Python stack and, when ``SLOW_QUERY_EXPLAIN`` is on (dev/staging), its
+query plan. Samples are grouped by a fingerprint of the normalised SQL, so the
+admin shows a repeated query as one line with its count and total time.
+
+Only normalised SQL is stored, never the query parameters: they hold emails,
+names and password hashes. Postgres plans can quote parameter values in their
+filter lines, which is one more reason to keep ``SLOW_QUERY_EXPLAIN`` off in
+production.
+"""
+import hashlib
+import logging
+import re
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+
+from tavonga_system.instrumentation import current_metrics, untracked
+
+logger = logging.getLogger(__name__)
+
+# Set while a slow query is being explained or saved, so those queries
+# aren't recorded themselves
+_recording = ContextVar('slow_query_recording', default=False)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|NULL)\s*,?)+\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+@contextmanager
+def _own_queries():
+    """Queries issued by the recorder itself: neither recorded nor counted for the request"""
+    token = _recording.set(True)
+    try:
+        with untracked():
+            yield
+    finally:
+        _recording.reset(token)
+
+
+def normalize_sql(sql):
+    """SQL with literals and variable-length lists collapsed, for grouping"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub(r'\1, ...', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode()).hexdigest()
+
+
+def application_stack(limit=15):
+    """The innermost project frames of the current stack (no Django/library frames)"""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+        and not frame.filename.endswith(('monitoring/slow_queries.py', 'tavonga_system/instrumentation.py'))
+    ]
+    return ''.join(traceback.format_list(frames[-limit:]))
+
+
+def explain(connection, sql, params):
+    """Query plan for ``sql``, or '' when it can't be explained"""
+    if connection.vendor == 'postgresql':
+        # ANALYZE executes the statement, so only ever for reads
+        analyze = getattr(settings, 'SLOW_QUERY_EXPLAIN_ANALYZE', False) and sql.lstrip().upper().startswith('SELECT')
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        return ''
+    try:
+        # A savepoint keeps a failed EXPLAIN from aborting the caller's transaction
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError:
+        return ''
+
+
+def save_slow_query(sample, normalized, duration_ms):
+    from .models import SlowQuery, SlowQueryGroup
+
+    with _own_queries():
+        try:
+            group, _ = SlowQueryGroup.objects.get_or_create(
+                fingerprint=fingerprint(normalized),
+                defaults={'sql': normalized, 'last_seen': timezone.now()},
+            )
+            SlowQueryGroup.objects.filter(pk=group.pk).update(
+                occurrences=F('occurrences') + 1,
+                total_ms=F('total_ms') + duration_ms,
+                max_ms=Greatest('max_ms', duration_ms),
+                last_seen=timezone.now(),
+            )
+            query = SlowQuery.objects.create(group=group, duration_ms=duration_ms, **sample)
+            # Trim in batches rather than on every insert
+            cap = getattr(settings, 'SLOW_QUERY_MAX_ROWS', 1000)
+            if query.pk % 100 == 0:
+                SlowQuery.objects.filter(pk__lte=query.pk - cap).delete()
+        except DatabaseError:
+            logger.exception('Could not store slow query')
+
+
+def capture(connection, sql, params, duration_ms):
+    with _own_queries():
+        plan = explain(connection, sql, params) if getattr(settings, 'SLOW_QUERY_EXPLAIN', False) else ''
+
+    metrics = current_metrics()
+    normalized = normalize_sql(sql)
+    sample = {
+        'sql': normalized,
+        'database': connection.alias,
+        'route': (metrics.route if metrics else None) or '',
+        'stack': application_stack(),
+        'plan': plan,
+    }
+    if connection.in_atomic_block:
+        # Don't hold the group row lock for the rest of the caller's transaction
+        transaction.on_commit(lambda: save_slow_query(sample, normalized, duration_ms), using=connection.alias)
+    else:
+        save_slow_query(sample, normalized, duration_ms)
+
+
+def record_slow_query(execute, sql, params, many, context):
+    threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+    if threshold is None or many or _recording.get():
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms >= threshold:
+        capture(context['connection'], sql, params, duration_ms)
+    return result
+
+
+@receiver(connection_created)
+def install_slow_query_recorder(sender, connection, **kwargs):
+    if record_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_slow_query)
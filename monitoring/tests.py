@@ -0,0 +1,156 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import profiling
+from .models import SlowQuery, SlowQueryGroup
+from .slow_queries import fingerprint, normalize_sql, save_slow_query
+
+User = get_user_model()
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pass12345', role='admin'
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.admin).access_token}'}
+
+    def profiled_settings(self, **kwargs):
+        return override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory, **kwargs)
+
+    def test_disabled_middleware_is_removed(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            profiling.ProfilingMiddleware(lambda request: None)
+
+    def test_signed_header_triggers_profile(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        token = client.post(reverse('profiling-token')).data['token']
+
+        with self.profiled_settings():
+            response = self.client.get(reverse('document-types'), HTTP_X_PROFILE=token, **self.auth)
+            self.assertEqual(response.status_code, 200)
+            [entry] = profiling.list_profiles()
+            self.assertEqual(response['X-Profile-Id'], entry['id'])
+            self.assertEqual((entry['route'], entry['trigger'], entry['requested_by']), ('document-types', 'header', self.admin.pk))
+
+            out = StringIO()
+            call_command('profiles', '--show', entry['id'], '--limit', '5', stdout=out)
+            self.assertIn('function calls', out.getvalue())
+
+    def test_forged_header_is_ignored(self):
+        with self.profiled_settings():
+            response = self.client.get(reverse('document-types'), HTTP_X_PROFILE='forged:token', **self.auth)
+            self.assertNotIn('X-Profile-Id', response)
+            self.assertEqual(profiling.list_profiles(), [])
+
+    def test_sampled_profiles_are_kept_in_a_ring_buffer(self):
+        with self.profiled_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_MAX_FILES=2):
+            for _ in range(3):
+                self.client.get(reverse('document-types'), **self.auth)
+            profiles = profiling.list_profiles()
+            self.assertEqual(len(profiles), 2)
+            self.assertEqual({entry['trigger'] for entry in profiles}, {'sample'})
+
+            out = StringIO()
+            call_command('profiles', '--summary', '--route', 'document-types', stdout=out)
+            self.assertIn('Merged 2 profiles', out.getvalue())
+
+    def test_token_requires_admin(self):
+        worker = User.objects.create_user(
+            username='worker', email='worker@example.com', password='pass12345', role='worker'
+        )
+        client = APIClient()
+        client.force_authenticate(worker)
+        self.assertEqual(client.post(reverse('profiling-token')).status_code, 403)
+
+    def issue_token(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        return client.post(reverse('profiling-token')).data['token']
+
+    def test_token_stops_working_when_user_is_demoted(self):
+        token = self.issue_token()
+        self.admin.role = 'worker'
+        self.admin.save(update_fields=['role'])
+
+        with self.profiled_settings():
+            response = self.client.get(reverse('document-types'), HTTP_X_PROFILE=token, **self.auth)
+            self.assertNotIn('X-Profile-Id', response)
+            self.assertEqual(profiling.list_profiles(), [])
+
+    def test_async_requests_are_profiled(self):
+        token = self.issue_token()
+
+        async def view(request):
+            return HttpResponse('ok')
+
+        with self.profiled_settings():
+            middleware = profiling.ProfilingMiddleware(view)
+            request = RequestFactory().get('/async/', HTTP_X_PROFILE=token)
+            response = async_to_sync(middleware)(request)
+            [entry] = profiling.list_profiles()
+            self.assertEqual(response['X-Profile-Id'], entry['id'])
+            self.assertEqual((entry['path'], entry['requested_by']), ('/async/', self.admin.pk))
+
+
+class SlowQueryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pass12345', role='admin'
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.admin).access_token}'}
+
+    def test_fingerprint_ignores_literals_and_list_lengths(self):
+        first = normalize_sql('SELECT * FROM t WHERE id IN (%s, %s) AND name = \'a\' LIMIT 21')
+        second = normalize_sql('SELECT  *  FROM t WHERE id IN (%s, %s, %s) AND name = \'b\' LIMIT 5')
+        self.assertEqual(first, 'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?')
+        self.assertEqual(fingerprint(first), fingerprint(second))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN=True)
+    def test_records_route_stack_and_plan(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('document-types'), **self.auth)
+
+        query = SlowQuery.objects.filter(route='document-types', sql__contains='onboarding_documenttype').first()
+        self.assertIsNotNone(query)
+        self.assertIn('onboarding/', query.stack)
+        self.assertTrue(query.plan)
+        self.assertFalse(SlowQuery.objects.filter(sql__contains='monitoring_slowquery').exists())
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_parameters_are_not_stored(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(email='admin@example.com').exists()
+
+        query = SlowQuery.objects.get(sql__contains='users_user')
+        self.assertNotIn('admin@example.com', query.sql)
+        self.assertEqual(query.sql, normalize_sql(query.sql))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_disabled_by_default_threshold(self):
+        self.client.get(reverse('document-types'), **self.auth)
+        self.assertFalse(SlowQuery.objects.exists())
+
+    @override_settings(SLOW_QUERY_MAX_ROWS=10)
+    def test_groups_accumulate_and_samples_are_capped(self):
+        sample = {'sql': 'SELECT ?', 'database': 'default', 'route': '', 'stack': '', 'plan': ''}
+        for duration in range(1, 101):
+            save_slow_query(sample, 'SELECT ?', float(duration))
+
+        group = SlowQueryGroup.objects.get()
+        self.assertEqual((group.occurrences, group.max_ms, group.total_ms), (100, 100.0, 5050.0))
+        self.assertLess(SlowQuery.objects.count(), 100)
@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('profiling-token/', views.profiling_token, name='profiling-token'),
+]
@@ -0,0 +1,31 @@
+from django.conf import settings
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+from .profiling import HEADER, make_token
+
+
+@swagger_auto_schema(
+    method='post',
+    responses={200: openapi.Response('Signed profiling token', openapi.Schema(type=openapi.TYPE_OBJECT))}
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def profiling_token(request):
+    """Issue a token that profiles any request sending it in the X-Profile header"""
+    user = request.user
+    if user.role not in ['admin', 'coordinator']:
+        return Response(
+            {'error': 'Permission denied'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    return Response({
+        'header': HEADER,
+        'token': make_token(user),
+        'expires_in': getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600),
+        'enabled': getattr(settings, 'PROFILING_ENABLED', False),
+    })
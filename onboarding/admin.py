@@ -2,14 +2,17 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
-from .models import PersonalDetails, DocumentType, Document, OnboardingProgress
+from .models import PersonalDetails, DocumentType, Document, OnboardingProgress, SearchEntry
+from .admin_performance import ExpiryStatusFilter, PerformanceModeAdminMixin
+from .search import IndexedSearchAdminMixin
 
 
 @admin.register(PersonalDetails)
-class PersonalDetailsAdmin(admin.ModelAdmin):
+class PersonalDetailsAdmin(IndexedSearchAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'phone_number', 'suburb', 'state', 'is_complete', 'updated_at']
     list_filter = ['state', 'created_at']
     search_fields = ['user__username', 'user__email', 'user__first_name', 'user__last_name', 'phone_number']
+    search_index_lookup = 'user_id'
     readonly_fields = ['is_complete', 'created_at', 'updated_at']
     
     fieldsets = (
@@ -44,19 +47,20 @@ class DocumentTypeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Document)
-class DocumentAdmin(admin.ModelAdmin):
+class DocumentAdmin(PerformanceModeAdminMixin, IndexedSearchAdminMixin, admin.ModelAdmin):
     list_display = [
         'user', 'document_type', 'status', 'expiry_date', 
         'expiry_status', 'uploaded_at', 'reviewed_by'
     ]
     list_filter = [
-        'status', 'document_type', 'uploaded_at', 
+        'status', 'document_type', ExpiryStatusFilter, 'uploaded_at', 
         'expiry_date', 'reviewed_at'
     ]
     search_fields = [
         'user__username', 'user__email', 'user__first_name', 'user__last_name',
         'document_type__display_name', 'document_number', 'issuing_authority'
     ]
+    search_index_kind = 'document'
     readonly_fields = [
         'original_filename', 'file_size', 'uploaded_at', 'updated_at',
         'is_expired', 'is_expiring_soon', 'days_until_expiry'
@@ -87,19 +91,19 @@ class DocumentAdmin(admin.ModelAdmin):
         if not obj.expiry_date:
             return format_html('<span style="color: gray;">No expiry</span>')
         
-        if obj.is_expired:
+        days = obj.days_until_expiry
+        if days < 0:
             return format_html('<span style="color: red; font-weight: bold;">EXPIRED</span>')
-        elif obj.is_expiring_soon:
-            days = obj.days_until_expiry
+        elif days <= 30:
             return format_html(
                 '<span style="color: orange; font-weight: bold;">Expires in {} days</span>',
                 days
             )
         else:
-            days = obj.days_until_expiry
             return format_html('<span style="color: green;">Valid ({} days)</span>', days)
     
     expiry_status.short_description = 'Expiry Status'
+    expiry_status.admin_order_field = 'expiry_date'
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related(
@@ -136,13 +140,14 @@ class DocumentAdmin(admin.ModelAdmin):
 
 
 @admin.register(OnboardingProgress)
-class OnboardingProgressAdmin(admin.ModelAdmin):
+class OnboardingProgressAdmin(IndexedSearchAdminMixin, admin.ModelAdmin):
     list_display = [
         'user', 'current_stage', 'completion_percentage', 
         'completed_at', 'updated_at'
     ]
     list_filter = ['current_stage', 'completed_at', 'created_at']
     search_fields = ['user__username', 'user__email', 'user__first_name', 'user__last_name']
+    search_index_lookup = 'user_id'
     readonly_fields = [
         'completion_percentage', 'personal_details_completed_at',
         'documents_uploaded_at', 'admin_approved_at', 'completed_at',
@@ -177,9 +182,7 @@ class OnboardingProgressAdmin(admin.ModelAdmin):
     def recalculate_progress(self, request, queryset):
         count = 0
         for progress in queryset:
-            progress.update_stage()
-            progress.calculate_completion_percentage()
-            progress.save()
+            OnboardingProgress.objects.refresh_for(progress.user)
             count += 1
         
         self.message_user(request, f'{count} progress records recalculated successfully.')
@@ -192,13 +195,26 @@ class OnboardingProgressAdmin(admin.ModelAdmin):
                 progress.current_stage = 'completed'
                 progress.completed_at = timezone.now()
                 progress.completion_percentage = 100
-                progress.save()
+                progress.save(update_fields=['current_stage', 'completed_at', 'completion_percentage', 'updated_at'])
                 count += 1
         
         self.message_user(request, f'{count} onboarding processes marked as completed.')
     complete_onboarding.short_description = "Mark selected onboarding as completed"
 
 
+@admin.register(SearchEntry)
+class SearchEntryAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'object_id', 'user', 'updated_at']
+    list_filter = ['kind']
+    readonly_fields = ['kind', 'object_id', 'user', 'body', 'updated_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+    
+    def has_add_permission(self, request):
+        return False
+
+
 # Customize admin site
 admin.site.site_header = "Agnovat Support Worker Management"
 admin.site.site_title = "Agnovat Admin"
@@ -0,0 +1,205 @@
+"""
+Changelist helpers for large admin tables.
+
+Enabled with ``ADMIN_PERFORMANCE_MODE``; when it is off the admin falls back to
+Django's stock paginator, counts and date hierarchy.
+"""
+import hashlib
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def performance_mode_enabled():
+    return getattr(settings, 'ADMIN_PERFORMANCE_MODE', False)
+
+
+def _cache_timeout():
+    return getattr(settings, 'ADMIN_CHANGELIST_CACHE_TIMEOUT', 300)
+
+
+def _query_key(prefix, queryset, *extra):
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(repr((sql, params, extra)).encode()).hexdigest()
+    return f'admin:{prefix}:{queryset.model._meta.label_lower}:{digest}'
+
+
+def estimate_count(queryset):
+    """
+    Planner row estimate for a queryset, or None when the backend has no statistics.
+
+    PostgreSQL answers from table statistics via EXPLAIN without scanning rows.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts planner estimates once a result set is large"""
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        threshold = getattr(settings, 'ADMIN_EXACT_COUNT_THRESHOLD', 10000)
+        if estimate is None or estimate < threshold:
+            return super().count
+        return estimate
+
+
+class KeysetPaginator(EstimatedCountPaginator):
+    """
+    Paginator that seeks from the last row of the previous page instead of using OFFSET.
+
+    The boundary row of every rendered page is cached, so walking forward through a
+    changelist turns each page into an index range scan on ``(ordering field, pk)``.
+    Jumping straight to an unseen page falls back to OFFSET once.
+    """
+
+    @cached_property
+    def keyset_field(self):
+        ordering = list(self.object_list.query.order_by)
+        if len(ordering) != 2 or ordering[1].lstrip('-') not in ('pk', 'id'):
+            return None
+        name = ordering[0]
+        if not isinstance(name, str) or '__' in name.lstrip('-'):
+            return None
+        field = self.object_list.model._meta.get_field(name.lstrip('-'))
+        if field.null or ordering[0].startswith('-') != ordering[1].startswith('-'):
+            return None
+        return name
+
+    def _boundary_key(self, number):
+        return _query_key('keyset', self.object_list, self.per_page, number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.keyset_field is None:
+            return super().page(number)
+
+        descending = self.keyset_field.startswith('-')
+        name = self.keyset_field.lstrip('-')
+        boundary = cache.get(self._boundary_key(number - 1)) if number > 1 else None
+
+        if boundary is not None:
+            value, pk = boundary
+            op = 'lt' if descending else 'gt'
+            seek = Q(**{f'{name}__{op}': value}) | Q(**{name: value, f'pk__{op}': pk})
+            object_list = list(self.object_list.filter(seek)[:self.per_page])
+        else:
+            bottom = (number - 1) * self.per_page
+            object_list = list(self.object_list[bottom:bottom + self.per_page])
+
+        if object_list:
+            last = object_list[-1]
+            cache.set(self._boundary_key(number), (getattr(last, name), last.pk), _cache_timeout())
+        return Page(object_list, number, self)
+
+
+class CachedDateBucketsMixin:
+    """QuerySet mixin caching the aggregate/date queries the date hierarchy issues"""
+
+    def _cached(self, prefix, compute, *args, **kwargs):
+        key = _query_key(prefix, self, args, sorted(kwargs.items()))
+        result = cache.get(key)
+        if result is None:
+            result = compute(*args, **kwargs)
+            cache.set(key, result, _cache_timeout())
+        return result
+
+    def aggregate(self, *args, **kwargs):
+        return self._cached('aggregate', super().aggregate, *args, **kwargs)
+
+    def dates(self, *args, **kwargs):
+        return self._cached('dates', _evaluated(super().dates), *args, **kwargs)
+
+    def datetimes(self, *args, **kwargs):
+        return self._cached('datetimes', _evaluated(super().datetimes), *args, **kwargs)
+
+
+def _evaluated(method):
+    return lambda *args, **kwargs: list(method(*args, **kwargs))
+
+
+_cached_queryset_classes = {}
+
+
+def with_cached_date_buckets(queryset):
+    """Return a clone of ``queryset`` whose date hierarchy queries are cached"""
+    base = type(queryset)
+    if base not in _cached_queryset_classes:
+        _cached_queryset_classes[base] = type(f'CachedDateBuckets{base.__name__}', (CachedDateBucketsMixin, base), {})
+    queryset = queryset._chain()
+    queryset.__class__ = _cached_queryset_classes[base]
+    return queryset
+
+
+class PerformanceChangeList(ChangeList):
+    """ChangeList whose queryset caches date hierarchy buckets"""
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.date_hierarchy:
+            queryset = with_cached_date_buckets(queryset)
+        return queryset
+
+
+class PerformanceModeAdminMixin:
+    """
+    ModelAdmin mixin for large tables: estimated counts, keyset pagination and
+    cached date hierarchy buckets, switched on by ``ADMIN_PERFORMANCE_MODE``.
+    """
+
+    @property
+    def show_full_result_count(self):
+        # The unfiltered "(N total)" link costs a second full COUNT(*)
+        return not performance_mode_enabled()
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if performance_mode_enabled():
+            return KeysetPaginator(queryset, per_page, orphans, allow_empty_first_page)
+        return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+
+    def get_changelist(self, request, **kwargs):
+        if performance_mode_enabled():
+            return PerformanceChangeList
+        return super().get_changelist(request, **kwargs)
+
+
+class ExpiryStatusFilter(admin.SimpleListFilter):
+    """Filter on expiry status using range lookups against the expiry_date index"""
+    title = 'expiry status'
+    parameter_name = 'expiry_status'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('none', 'No expiry'),
+            ('expired', 'Expired'),
+            ('expiring_soon', 'Expiring within 30 days'),
+            ('valid', 'Valid'),
+        ]
+
+    def queryset(self, request, queryset):
+        today = date.today()
+        soon = today + timedelta(days=30)
+        if self.value() == 'none':
+            return queryset.filter(expiry_date__isnull=True)
+        if self.value() == 'expired':
+            return queryset.filter(expiry_date__lt=today)
+        if self.value() == 'expiring_soon':
+            return queryset.filter(expiry_date__gte=today, expiry_date__lte=soon)
+        if self.value() == 'valid':
+            return queryset.filter(expiry_date__gt=soon)
+        return queryset
@@ -0,0 +1,122 @@
+"""
+Async variants of the dashboard, progress and admin user-detail endpoints.
+
+Under ASGI these views don't hold a worker thread while waiting on the
+database, and the independent reads behind each response are issued together
+with ``asyncio.gather`` through the async ORM instead of one after another.
+Django currently runs async ORM calls on a single shared thread, so the reads
+overlap with other requests' work rather than with each other; they become
+truly parallel once an async database backend is available, without changes
+here. Authentication, permissions, errors and rendering go through DRF as in
+the sync views (see ``async_api_view``), including ETag/304 handling.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .conditional import aconditional_response
+from .models import Document, DocumentType, OnboardingProgress, PersonalDetails
+from .serializers import (
+    DocumentListSerializer, DocumentTypeSerializer, OnboardingProgressSerializer,
+    PersonalDetailsSerializer
+)
+
+User = get_user_model()
+
+
+async def _alist(queryset):
+    return [item async for item in queryset]
+
+
+def async_api_view(methods):
+    """
+    ``@api_view`` for a coroutine handler.
+
+    DRF's own request handling runs around the handler: the configured
+    authenticators, permission and throttle classes and content negotiation
+    (in a worker thread, since they may query the database), then the
+    exception handler and renderers, so errors and responses look exactly
+    like the sync views'. Only the handler itself runs on the event loop.
+    """
+    def decorator(handler):
+        view_class = type(handler.__name__, (APIView,), {
+            'http_method_names': [method.lower() for method in methods],
+            **{method.lower(): handler for method in methods},
+        })
+
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            self = view_class()
+            self.args, self.kwargs, self.headers = args, kwargs, self.default_response_headers
+            request = self.request = self.initialize_request(request, *args, **kwargs)
+            try:
+                await sync_to_async(self.initial)(request, *args, **kwargs)
+                if request.method.lower() not in self.http_method_names:
+                    self.http_method_not_allowed(request)
+                response = await handler(request, *args, **kwargs)
+            except Exception as exc:
+                response = self.handle_exception(exc)
+            # Rendered by Django once the view returns, as for any DRF response
+            return self.finalize_response(request, response, *args, **kwargs)
+        return view
+    return decorator
+
+
+async def build_dashboard(request, user_id):
+    """Dashboard payload for ``user_id`` with all reads issued concurrently"""
+    details, progress, documents, required_types = await asyncio.gather(
+        PersonalDetails.objects.filter(user_id=user_id).afirst(),
+        OnboardingProgress.objects.select_related('user').filter(user_id=user_id).afirst(),
+        _alist(DocumentListSerializer.values(Document.objects.filter(user_id=user_id))),
+        _alist(DocumentType.objects.filter(is_required=True)),
+    )
+    context = {'request': request}
+    uploaded_type_ids = {row['document_type_id'] for row in documents}
+    return {
+        'personal_details': PersonalDetailsSerializer(details, context=context).data if details else None,
+        'progress': OnboardingProgressSerializer(progress, context=context).data if progress else None,
+        'documents': DocumentListSerializer(documents, context=context).data,
+        'required_document_types': DocumentTypeSerializer(required_types, many=True).data,
+        'missing_documents': list(
+            {doc_type.name for doc_type in required_types if doc_type.id not in uploaded_type_ids}
+        ),
+    }
+
+
+@async_api_view(['GET'])
+async def onboarding_dashboard_async(request):
+    """Get complete onboarding dashboard data for authenticated user"""
+    async def respond():
+        return Response(await build_dashboard(request, request.user.pk))
+
+    return await aconditional_response(request, 'dashboard', respond)
+
+
+@async_api_view(['GET'])
+async def onboarding_progress_async(request):
+    """Get onboarding progress for authenticated user"""
+    async def respond():
+        progress = await OnboardingProgress.objects.acurrent_for(request.user)
+        return Response(OnboardingProgressSerializer(progress).data)
+
+    return await aconditional_response(request, 'progress', respond)
+
+
+@async_api_view(['GET'])
+async def user_onboarding_detail_async(request, user_id):
+    """Admin view to see specific user's onboarding details"""
+    if request.user.role not in ['admin', 'coordinator']:
+        raise PermissionDenied("Permission denied")
+
+    exists, data = await asyncio.gather(
+        User.objects.filter(id=user_id).aexists(),
+        build_dashboard(request, user_id),
+    )
+    if not exists:
+        raise NotFound('No User matches the given query.')
+    return Response(data)
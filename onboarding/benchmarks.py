@@ -0,0 +1,70 @@
+"""Synthetic fixtures and timing helpers shared by the benchmark management commands"""
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Document, DocumentType, OnboardingProgress
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def synthetic_documents(rows):
+    """
+    Create ``rows`` workers, each with one reviewed document and a progress record,
+    inside a transaction that is always rolled back.
+    
+    Yields ``(reviewer, documents_queryset)``.
+    """
+    try:
+        with transaction.atomic():
+            reviewer = User.objects.create(
+                username='bench-reviewer', email='bench-reviewer@example.com', role='admin'
+            )
+            doc_type, _ = DocumentType.objects.get_or_create(
+                name='police_check', defaults={'display_name': 'National Police Check'}
+            )
+            users = User.objects.bulk_create([
+                User(
+                    username=f'bench-{index}', email=f'bench-{index}@example.com',
+                    first_name='Bench', last_name=str(index)
+                )
+                for index in range(rows)
+            ], batch_size=500)
+            now = timezone.now()
+            Document.objects.bulk_create([
+                Document(
+                    user=user, document_type=doc_type, file=f'documents/bench/{user.username}.pdf',
+                    original_filename=f'{user.username}.pdf', file_size=1024,
+                    status='pending' if index % 2 else 'approved',
+                    reviewed_by=None if index % 2 else reviewer, reviewed_at=None if index % 2 else now,
+                    expiry_date=now.date(),
+                )
+                for index, user in enumerate(users)
+            ], batch_size=500)
+            OnboardingProgress.objects.bulk_create([
+                OnboardingProgress(user=user, current_stage='admin_review', completion_percentage=50)
+                for user in users
+            ], batch_size=500)
+            
+            yield reviewer, Document.objects.filter(user__in=users).order_by('id')
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def best_time(func, repeat):
+    """Best wall-clock time of ``repeat`` calls to ``func``, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
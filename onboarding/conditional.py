@@ -0,0 +1,129 @@
+"""
+Conditional GET support for the worker-facing onboarding endpoints.
+
+Each response carries an ETag derived from the user's onboarding state (latest
+``updated_at`` values and row counts), fetched in a single query. A poll whose
+``If-None-Match`` still matches gets a 304 before the view or any serializer runs.
+
+There is no ``Last-Modified``: every scope covers a collection, and deleting its
+newest row moves the latest ``updated_at`` backwards, so an ``If-Modified-Since``
+check could answer 304 for a response that has changed. The counts in the ETag
+catch deletions.
+"""
+import hashlib
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery, Value
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Document, DocumentType, OnboardingProgress, PersonalDetails
+
+User = get_user_model()
+
+
+def _aggregate(queryset, **aggregate):
+    """Single-value subquery aggregating a whole (correlated) queryset"""
+    name, expression = next(iter(aggregate.items()))
+    return Subquery(
+        queryset.order_by().annotate(_group=Value(1, output_field=IntegerField()))
+        .values('_group').annotate(**aggregate).values(name)
+    )
+
+
+def onboarding_state(user):
+    """Everything the onboarding responses for ``user`` depend on, in one query"""
+    documents = Document.objects.filter(user=OuterRef('pk'))
+    return User.objects.filter(pk=user.pk).annotate(
+        documents_updated=_aggregate(documents, value=Max('updated_at')),
+        documents_count=_aggregate(documents, value=Count('id')),
+        details_updated=Subquery(PersonalDetails.objects.filter(user=OuterRef('pk')).values('updated_at')),
+        progress_updated=Subquery(OnboardingProgress.objects.filter(user=OuterRef('pk')).values('updated_at')),
+        types_updated=_aggregate(DocumentType.objects.all(), value=Max('updated_at')),
+        types_count=_aggregate(DocumentType.objects.all(), value=Count('id')),
+    ).values(
+        'first_name', 'last_name', 'email', 'documents_updated', 'documents_count',
+        'details_updated', 'progress_updated', 'types_updated', 'types_count',
+    ).get()
+
+
+def _etag(request, scope):
+    state = onboarding_state(request.user)
+    # Expiry fields and filters are relative to today, so responses change at midnight
+    digest = hashlib.md5(
+        repr((scope, request.user.pk, request.get_full_path(), date.today(), sorted(state.items()))).encode()
+    ).hexdigest()
+    return quote_etag(digest)
+
+
+def _not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    etags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+    return '*' in etags or etag in etags
+
+
+def _set_etag(response, etag):
+    response['ETag'] = etag
+    # Responses are per user, so shared caches must not reuse them
+    patch_vary_headers(response, ['Authorization'])
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_response(request, scope, get_response):
+    """Answer with 304 when the client's ETag is current, else call ``get_response``"""
+    if request.method not in ('GET', 'HEAD'):
+        return get_response()
+
+    etag = _etag(request, scope)
+    if _not_modified(request, etag):
+        return _set_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+    response = get_response()
+    if response.status_code == status.HTTP_200_OK:
+        # The view may have recomputed and saved state (e.g. progress), so
+        # validate against what the client actually received
+        _set_etag(response, _etag(request, scope))
+    return response
+
+
+async def aconditional_response(request, scope, get_response):
+    """Async counterpart of ``conditional_response``; ``request.user`` must already be set"""
+    etag = await sync_to_async(_etag)(request, scope)
+    if _not_modified(request, etag):
+        return _set_etag(HttpResponseNotModified(), etag)
+
+    response = await get_response()
+    if response.status_code == status.HTTP_200_OK:
+        _set_etag(response, await sync_to_async(_etag)(request, scope))
+    return response
+
+
+def conditional_get(scope):
+    """Decorator for ``@api_view`` functions; apply it below ``@api_view``"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return conditional_response(request, scope, lambda: view(request, *args, **kwargs))
+        return wrapped
+    return decorator
+
+
+class ConditionalGetMixin:
+    """Generic view mixin adding ETag validation to ``get``"""
+    conditional_scope = None
+
+    def get(self, request, *args, **kwargs):
+        return conditional_response(
+            request, self.conditional_scope or type(self).__name__,
+            lambda: super(ConditionalGetMixin, self).get(request, *args, **kwargs)
+        )
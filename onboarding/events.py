@@ -0,0 +1,303 @@
+"""
+Transactional outbox for onboarding change events and the server-sent events
+stream that pushes them to connected admins.
+
+Events are inserted by model signals on the same database connection as the
+document/progress write, so they commit or roll back together with it.
+
+Under ASGI the stream is an async generator that waits on the event loop.
+Under WSGI each open stream holds a worker thread for up to
+SSE_MAX_STREAM_SECONDS, so it runs as a plain generator and only
+SSE_MAX_SYNC_STREAMS of them may be open in a process at once.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .models import OutboxEvent
+
+User = get_user_model()
+
+REVIEWED_STATUSES = {'approved', 'rejected'}
+
+
+def record_document_event(document, created, previous_status):
+    """Write the outbox event, if any, for a saved document"""
+    if created:
+        event_type = 'document.uploaded'
+    elif document.status == previous_status:
+        return None
+    elif document.status in REVIEWED_STATUSES:
+        event_type = 'document.reviewed'
+    elif document.status == 'expired':
+        event_type = 'document.expired'
+    else:
+        return None
+
+    return OutboxEvent.objects.create(
+        event_type=event_type,
+        user_id=document.user_id,
+        payload={
+            'document_id': document.pk,
+            'document_type': document.document_type_id,
+            'status': document.status,
+            'previous_status': previous_status,
+            'reviewed_by': document.reviewed_by_id,
+        }
+    )
+
+
+def record_progress_event(progress, previous_stage):
+    """Write an outbox event when a user's onboarding stage changes"""
+    if progress.current_stage == previous_stage:
+        return None
+    return OutboxEvent.objects.create(
+        event_type='progress.updated',
+        user_id=progress.user_id,
+        payload={
+            'progress_id': progress.pk,
+            'stage': progress.current_stage,
+            'previous_stage': previous_stage,
+            'completion_percentage': progress.completion_percentage,
+        }
+    )
+
+
+def prune_events():
+    """Delete outbox events older than OUTBOX_RETENTION_DAYS; returns the number removed"""
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'OUTBOX_RETENTION_DAYS', 7))
+    deleted, _ = OutboxEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def authenticate_jwt(request):
+    """Resolve the JWT user for a plain (non-DRF) Django view; None without a valid token"""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError):
+        return None
+
+
+STREAM_TICKET_SALT = 'onboarding.events.stream'
+
+
+def stream_ticket_max_age():
+    return getattr(settings, 'SSE_TICKET_MAX_AGE_SECONDS', 30)
+
+
+def issue_stream_ticket(user):
+    """
+    Short-lived ticket that opens the event stream as ``user``.
+
+    Browsers' EventSource cannot send headers, so the stream takes this in the
+    query string instead of the access token: URLs end up in access logs, and a
+    logged ticket is only good for opening the stream, and only for
+    SSE_TICKET_MAX_AGE_SECONDS.
+    """
+    return signing.dumps({'u': user.pk}, salt=STREAM_TICKET_SALT)
+
+
+def authenticate_stream_ticket(request):
+    """Resolve the user from ``?ticket=``; None when missing, expired or forged"""
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        return None
+    try:
+        payload = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=stream_ticket_max_age())
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=payload.get('u'), is_active=True).first()
+
+
+class StreamPosition:
+    """
+    How far a stream has read the outbox: the highest event id sent, plus the
+    lower ids it skipped over that may still commit.
+
+    Ids are allocated at insert but become visible at commit, so a slow
+    transaction's event can appear after one with a higher id was sent. Skipped
+    ids stay pending, and are polled for, until they show up or
+    SSE_PENDING_ID_SECONDS pass (a rolled-back insert never commits). The
+    position is the SSE ``id`` (``"<last>"`` or ``"<last>:<pending>,..."``), so
+    a reconnecting browser carries its pending ids back in ``Last-Event-ID``.
+    """
+    MAX_PENDING = 100
+
+    def __init__(self, last_id, pending=(), now=0):
+        self.last_id = last_id
+        # Pending id -> when it was first found missing
+        self.pending = {event_id: now for event_id in pending if event_id < last_id}
+
+    @classmethod
+    def parse(cls, value, now=0):
+        """Position from an SSE id written by this class; None if it isn't one"""
+        last_id, _, pending = str(value).partition(':')
+        try:
+            return cls(int(last_id), [int(event_id) for event_id in pending.split(',') if event_id], now)
+        except ValueError:
+            return None
+
+    def __str__(self):
+        if not self.pending:
+            return str(self.last_id)
+        return f'{self.last_id}:{",".join(map(str, sorted(self.pending)))}'
+
+    def filter(self):
+        return Q(id__gt=self.last_id) | Q(id__in=list(self.pending))
+
+    def advance(self, event_id, now):
+        """Record ``event_id`` as sent"""
+        if event_id in self.pending:
+            del self.pending[event_id]
+            return
+        for skipped in range(max(self.last_id + 1, event_id - self.MAX_PENDING), event_id):
+            self.pending[skipped] = now
+        self.last_id = max(self.last_id, event_id)
+        self._trim()
+
+    def expire(self, now, timeout):
+        self.pending = {
+            event_id: found for event_id, found in self.pending.items() if now - found < timeout
+        }
+
+    def _trim(self):
+        if len(self.pending) > self.MAX_PENDING:
+            keep = sorted(self.pending)[-self.MAX_PENDING:]
+            self.pending = {event_id: self.pending[event_id] for event_id in keep}
+
+
+def format_event(event, position):
+    data = json.dumps({
+        'id': event.pk,
+        'type': event.event_type,
+        'user': event.user_id,
+        'created_at': event.created_at.isoformat(),
+        **event.payload,
+    }, separators=(',', ':'))
+    return f'id: {position}\nevent: {event.event_type}\ndata: {data}\n\n'
+
+
+async def latest_event_id():
+    event = await OutboxEvent.objects.order_by('-id').only('id').afirst()
+    return event.pk if event else 0
+
+
+def _stream_settings():
+    """``(poll, pending timeout, heartbeat, max duration)`` in seconds"""
+    return (
+        getattr(settings, 'SSE_POLL_SECONDS', 1),
+        getattr(settings, 'SSE_PENDING_ID_SECONDS', 120),
+        getattr(settings, 'SSE_HEARTBEAT_SECONDS', 15),
+        getattr(settings, 'SSE_MAX_STREAM_SECONDS', 300),
+    )
+
+
+async def event_stream(position):
+    """
+    Yield SSE frames for events after ``position`` (a StreamPosition).
+
+    The stream ends after SSE_MAX_STREAM_SECONDS; the browser reconnects on its
+    own with ``Last-Event-ID`` and resumes where it left off.
+    """
+    poll_interval, pending_timeout, heartbeat_interval, max_duration = _stream_settings()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_duration
+    last_sent = loop.time()
+    # Ids carried over from a previous stream start waiting afresh
+    position.pending = dict.fromkeys(position.pending, loop.time())
+
+    yield f'retry: {poll_interval * 1000}\n\n'
+    while loop.time() < deadline:
+        position.expire(loop.time(), pending_timeout)
+        events = [
+            event async for event in OutboxEvent.objects.filter(position.filter()).order_by('id')[:100]
+        ]
+        for event in events:
+            position.advance(event.pk, loop.time())
+            yield format_event(event, position)
+
+        if events:
+            last_sent = loop.time()
+        else:
+            if loop.time() - last_sent >= heartbeat_interval:
+                last_sent = loop.time()
+                yield ': keepalive\n\n'
+            await asyncio.sleep(poll_interval)
+
+
+def sync_event_stream(position):
+    """``event_stream`` for WSGI: polls from the worker thread serving the request"""
+    poll_interval, pending_timeout, heartbeat_interval, max_duration = _stream_settings()
+    deadline = time.monotonic() + max_duration
+    last_sent = time.monotonic()
+    position.pending = dict.fromkeys(position.pending, time.monotonic())
+
+    yield f'retry: {poll_interval * 1000}\n\n'
+    while time.monotonic() < deadline:
+        position.expire(time.monotonic(), pending_timeout)
+        events = list(OutboxEvent.objects.filter(position.filter()).order_by('id')[:100])
+        for event in events:
+            position.advance(event.pk, time.monotonic())
+            yield format_event(event, position)
+
+        if events:
+            last_sent = time.monotonic()
+        else:
+            if time.monotonic() - last_sent >= heartbeat_interval:
+                last_sent = time.monotonic()
+                yield ': keepalive\n\n'
+            time.sleep(poll_interval)
+
+
+_sync_streams = {'open': 0}
+_sync_streams_lock = threading.Lock()
+
+
+class HeldStream:
+    """
+    A WSGI stream holding one of the process's SSE_MAX_SYNC_STREAMS slots.
+
+    The slot is given back when the response is closed, which Django does
+    whether or not the stream was ever iterated.
+    """
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.held = True
+
+    @classmethod
+    def open(cls, iterator):
+        """Wrap ``iterator`` if a slot is free, else return None"""
+        with _sync_streams_lock:
+            if _sync_streams['open'] >= getattr(settings, 'SSE_MAX_SYNC_STREAMS', 2):
+                return None
+            _sync_streams['open'] += 1
+        return cls(iterator)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.iterator)
+
+    def close(self):
+        self.iterator.close()
+        with _sync_streams_lock:
+            if self.held:
+                self.held = False
+                _sync_streams['open'] -= 1
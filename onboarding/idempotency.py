@@ -0,0 +1,195 @@
+"""
+Idempotency-Key support for the onboarding write endpoints.
+
+Mobile clients retry uploads and reviews when a request times out. A write
+sent with an ``Idempotency-Key`` header claims that key for the user before
+the view runs; once the view returns, its response is stored, and a retry
+with the same key gets the stored response back without the view, the file
+storage or the progress recompute running again.
+
+The key is bound to a fingerprint of the request (route, method, path and
+payload, with uploaded files hashed from the temporary upload rather than
+stored), so reusing a key for a different request is refused with 422. A
+retry that arrives while the first attempt is still running gets 409. Server
+errors are not stored, so the client can retry them with the same key.
+Keys expire after ``IDEMPOTENCY_KEY_TTL_HOURS``.
+
+The view runs in one transaction with the write of its stored response, so
+either both commit or neither does. A claim still without a response after
+``IDEMPOTENCY_LEASE_SECONDS`` belongs to a worker that was killed mid-request
+(timeout, OOM, deploy) and committed nothing; the next retry takes it over
+instead of getting 409 until the key expires.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+WRITE_METHODS = {'POST', 'PUT', 'PATCH'}
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def _lease():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LEASE_SECONDS', 60))
+
+
+def _file_digest(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    return {'name': upload.name, 'size': upload.size, 'sha256': digest.hexdigest()}
+
+
+def _canonical(value):
+    if isinstance(value, UploadedFile):
+        return _file_digest(value)
+    if hasattr(value, 'getlist'):
+        # Multipart/form data: keep repeated fields
+        return {key: [_canonical(item) for item in value.getlist(key)] for key in value}
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def request_fingerprint(request, scope):
+    """Digest of everything that makes a write request what it is"""
+    payload = [scope, request.method, request.path, _canonical(request.data)]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _claim(user, key, scope, fingerprint):
+    """
+    Insert the in-flight record for ``key``; returns ``(record, created)``.
+
+    An expired record with the same key is replaced rather than replayed, and
+    an abandoned claim for the same request is taken over (``created`` is then
+    True too). The record is ``None`` in the unlikely case it keeps vanishing
+    between attempts.
+    """
+    record = None
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=user, key=key, scope=scope, fingerprint=fingerprint,
+                    expires_at=timezone.now() + _ttl(),
+                ), True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is None:
+                continue
+            now = timezone.now()
+            if record.expires_at > now:
+                if (
+                    record.status_code is None and record.fingerprint == fingerprint
+                    and record.claimed_at <= now - _lease()
+                    and _in_flight(record).update(claimed_at=now)
+                ):
+                    record.claimed_at = now
+                    return record, True
+                return record, False
+            IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=timezone.now()).delete()
+    return record, False
+
+
+def _in_flight(record):
+    """``record``'s row, as long as this claim on it hasn't been taken over"""
+    return IdempotencyKey.objects.filter(pk=record.pk, claimed_at=record.claimed_at, status_code__isnull=True)
+
+
+def _replay(record, fingerprint):
+    if record is not None and record.fingerprint != fingerprint:
+        return Response(
+            {'error': f'{HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record is None or record.status_code is None:
+        response = Response(
+            {'error': f'A request with this {HEADER} is still being processed'},
+            status=status.HTTP_409_CONFLICT,
+        )
+        response['Retry-After'] = '1'
+        return response
+    response = Response(record.response, status=record.status_code)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent_response(request, scope, get_response):
+    """Run ``get_response`` at most once per Idempotency-Key, replaying its response to retries"""
+    key = request.headers.get(HEADER)
+    if not key or request.method not in WRITE_METHODS or not request.user.is_authenticated:
+        return get_response()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    fingerprint = request_fingerprint(request, scope)
+    record, created = _claim(request.user, key, scope, fingerprint)
+    if not created:
+        return _replay(record, fingerprint)
+
+    try:
+        with transaction.atomic():
+            response = get_response()
+            if response.status_code >= 500 or not hasattr(response, 'data'):
+                # Not worth replaying; let the retry run the view again
+                _in_flight(record).delete()
+                return response
+            if not _in_flight(record).update(status_code=response.status_code, response=response.data):
+                # Ran past the lease and a retry took over: undo this attempt
+                transaction.set_rollback(True)
+                return _replay(None, fingerprint)
+    except Exception:
+        _in_flight(record).delete()
+        raise
+    return response
+
+
+def prune_idempotency_keys():
+    """Delete expired idempotency keys; returns the number removed"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def idempotent(scope):
+    """Decorator for ``@api_view`` functions; apply it below ``@api_view`` and ``@permission_classes``"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return idempotent_response(request, scope, lambda: view(request, *args, **kwargs))
+        return wrapped
+    return decorator
+
+
+class IdempotentMixin:
+    """Generic view mixin adding Idempotency-Key support to ``create`` and ``update``"""
+    idempotency_scope = None
+
+    def _idempotent(self, request, get_response):
+        return idempotent_response(request, self.idempotency_scope or type(self).__name__, get_response)
+
+    def create(self, request, *args, **kwargs):
+        return self._idempotent(request, lambda: super(IdempotentMixin, self).create(request, *args, **kwargs))
+
+    def update(self, request, *args, **kwargs):
+        return self._idempotent(request, lambda: super(IdempotentMixin, self).update(request, *args, **kwargs))
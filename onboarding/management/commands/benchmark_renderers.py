@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from onboarding import views
+from onboarding.benchmarks import best_time, synthetic_documents
+from tavonga_system.renderers import FastJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = 'Compare render time of the stdlib JSONRenderer and FastJSONRenderer on the admin endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Number of synthetic workers/documents')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed renders per renderer (best is reported)')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; FastJSONRenderer uses the stdlib path'))
+
+        factory = APIRequestFactory()
+        endpoints = [
+            ('admin-onboarding-list', views.AdminOnboardingListView.as_view(), '/api/onboarding/admin/onboarding/'),
+            ('pending-documents', views.pending_documents, '/api/onboarding/admin/documents/pending/'),
+            ('expiring-documents', views.expiring_documents, '/api/onboarding/admin/documents/expiring/'),
+        ]
+
+        with synthetic_documents(options['rows']) as (reviewer, queryset):
+            for name, view, url in endpoints:
+                request = factory.get(url)
+                force_authenticate(request, user=reviewer)
+                data = view(request).data
+
+                stdlib = JSONRenderer().render(data)
+                fast = FastJSONRenderer().render(data)
+                if stdlib != fast:
+                    self.stdout.write(self.style.ERROR(f'{name}: renderer output differs'))
+
+                stdlib_time = best_time(lambda: JSONRenderer().render(data), options['repeat'])
+                fast_time = best_time(lambda: FastJSONRenderer().render(data), options['repeat'])
+                self.stdout.write(
+                    f'{name:<24} {len(stdlib) / 1024:8.0f} KiB  '
+                    f'stdlib {stdlib_time * 1000:8.2f} ms  fast {fast_time * 1000:8.2f} ms  '
+                    f'{stdlib_time / fast_time:5.1f}x'
+                )
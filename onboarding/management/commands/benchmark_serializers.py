@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from onboarding.benchmarks import best_time, synthetic_documents
+from onboarding.serializers import DocumentListSerializer, DocumentSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of DocumentSerializer against the lean DocumentListSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Number of synthetic documents')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per serializer (best is reported)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        request = Request(APIRequestFactory().get('/api/onboarding/admin/documents/pending/'))
+        context = {'request': request}
+
+        with synthetic_documents(rows) as (reviewer, queryset):
+            def model_serializer():
+                return DocumentSerializer(queryset.all(), many=True, context=context).data
+
+            def lean_serializer():
+                return DocumentListSerializer(DocumentListSerializer.values(queryset.all()), context=context).data
+
+            results = {}
+            for label, func in [('DocumentSerializer', model_serializer), ('DocumentListSerializer', lean_serializer)]:
+                best = best_time(func, options['repeat'])
+                results[label] = rows / best
+                self.stdout.write(f'{label:<24} {best * 1000:9.1f} ms  {results[label]:12,.0f} rows/sec')
+
+        speedup = results['DocumentListSerializer'] / results['DocumentSerializer']
+        self.stdout.write(self.style.SUCCESS(f'Lean serializer is {speedup:.1f}x faster'))
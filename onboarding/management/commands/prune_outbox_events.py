@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from onboarding.events import prune_events
+
+
+class Command(BaseCommand):
+    help = 'Delete outbox events older than OUTBOX_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        deleted = prune_events()
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} outbox events')
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from onboarding.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete document tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} tombstones')
+        )
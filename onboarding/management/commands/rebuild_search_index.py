@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from onboarding.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the worker and document search index'
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {count} search entries')
+        )
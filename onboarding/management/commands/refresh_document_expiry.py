@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from onboarding.models import Document
+
+
+class Command(BaseCommand):
+    help = 'Mark documents past or near their expiry date as expired/expiring soon; run daily'
+
+    def handle(self, *args, **options):
+        updated = Document.objects.refresh_expiry_statuses()
+        self.stdout.write(
+            self.style.SUCCESS(f'Updated {updated} document statuses')
+        )
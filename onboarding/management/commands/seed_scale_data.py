@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from onboarding.models import DocumentType
+from onboarding.seeding import ScaleSeeder, clear_seeded_data, seeded_users
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic workers, personal details, documents and progress for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1000, help='Number of workers to create')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Workers per bulk insert')
+        parser.add_argument('--password', default='scale123', help='Password shared by every seeded worker')
+        parser.add_argument('--no-files', action='store_true', help="Don't write placeholder files to storage")
+        parser.add_argument('--file-workers', type=int, default=8, help='Threads writing placeholder files')
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded workers first')
+
+    def handle(self, *args, **options):
+        if not DocumentType.objects.exists():
+            raise CommandError('No document types found; run setup_document_types first')
+
+        if options['clear']:
+            deleted = clear_seeded_data()
+            self.stdout.write(f'Deleted {deleted} previously seeded rows')
+        elif seeded_users().filter(role='worker').exists():
+            raise CommandError('Seeded workers already exist; pass --clear to replace them')
+
+        started = time.perf_counter()
+        seeder = ScaleSeeder(
+            seed=options['seed'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+            write_files=not options['no_files'],
+            file_workers=options['file_workers'],
+        )
+        result = seeder.run(options['workers'])
+        elapsed = time.perf_counter() - started
+
+        for label, counts in [('Stages', result.stages), ('Document statuses', result.statuses)]:
+            breakdown = ', '.join(f'{key}={value}' for key, value in sorted(counts.items()))
+            self.stdout.write(f'{label}: {breakdown}')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Created {result.workers} workers, {result.personal_details} personal details, '
+                f'{result.documents} documents and {result.files} files in {elapsed:.1f}s'
+            )
+        )
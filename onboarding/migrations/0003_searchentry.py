@@ -0,0 +1,118 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+FTS_TABLE = 'onboarding_searchentry_fts'
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        body, content='onboarding_searchentry', content_rowid='id'
+    )""",
+    f"""CREATE TRIGGER onboarding_searchentry_ai AFTER INSERT ON onboarding_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body);
+    END""",
+    f"""CREATE TRIGGER onboarding_searchentry_ad AFTER DELETE ON onboarding_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body);
+    END""",
+    f"""CREATE TRIGGER onboarding_searchentry_au AFTER UPDATE ON onboarding_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body);
+    END""",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS onboarding_searchentry_au',
+    'DROP TRIGGER IF EXISTS onboarding_searchentry_ad',
+    'DROP TRIGGER IF EXISTS onboarding_searchentry_ai',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX onboarding_searchentry_body_trgm ON onboarding_searchentry USING gin (body gin_trgm_ops)',
+    "CREATE INDEX onboarding_searchentry_body_tsv ON onboarding_searchentry USING gin (to_tsvector('simple', body))",
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS onboarding_searchentry_body_tsv',
+    'DROP INDEX IF EXISTS onboarding_searchentry_body_trgm',
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FORWARD)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+
+
+def populate_search_entries(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    PersonalDetails = apps.get_model('onboarding', 'PersonalDetails')
+    Document = apps.get_model('onboarding', 'Document')
+    SearchEntry = apps.get_model('onboarding', 'SearchEntry')
+    
+    phones = dict(PersonalDetails.objects.values_list('user_id', 'phone_number'))
+    entries = []
+    # Only workers are searchable (see onboarding/search.py)
+    for user in User.objects.filter(role='worker'):
+        parts = [user.username, user.first_name, user.last_name, user.email, phones.get(user.pk)]
+        entries.append(SearchEntry(
+            kind='worker', object_id=user.pk, user_id=user.pk,
+            body=' '.join(part for part in parts if part)
+        ))
+    for document in Document.objects.select_related('user', 'document_type'):
+        parts = [
+            document.user.username, document.user.first_name, document.user.last_name,
+            document.user.email, document.document_type.display_name, document.document_number,
+            document.issuing_authority, document.original_filename,
+        ]
+        entries.append(SearchEntry(
+            kind='document', object_id=document.pk, user_id=document.user_id,
+            body=' '.join(part for part in parts if part)
+        ))
+    SearchEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onboarding', '0002_alter_document_file_size_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('worker', 'Worker'), ('document', 'Document')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('body', models.TextField(help_text='Searchable text; indexed with FTS5 on SQLite and trigram/tsvector on PostgreSQL')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Search Entries',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+        migrations.RunPython(populate_search_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onboarding', '0003_searchentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uploaded_at', 'id'], name='onboarding_doc_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['expiry_date'], name='onboarding_doc_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['reviewed_at'], name='onboarding_doc_reviewed_idx'),
+        ),
+    ]
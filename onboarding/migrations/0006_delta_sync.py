@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onboarding', '0005_documenttype_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['user', 'updated_at'], name='onboarding_doc_user_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='documenttombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='documenttombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='onboarding_tomb_user_sync_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onboarding', '0007_outboxevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='onboardingprogress',
+            index=models.Index(fields=['current_stage', 'updated_at', 'id'], name='onboarding_prog_stage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='onboardingprogress',
+            index=models.Index(fields=['updated_at', 'id'], name='onboarding_prog_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='onboardingprogress',
+            index=models.Index(fields=['created_at', 'id'], name='onboarding_prog_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='onboardingprogress',
+            index=models.Index(fields=['completion_percentage', 'id'], name='onboarding_prog_complete_idx'),
+        ),
+    ]
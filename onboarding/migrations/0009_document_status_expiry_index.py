@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onboarding', '0008_progress_roster_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['status', 'expiry_date'], name='onboarding_doc_status_exp_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onboarding', '0010_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='documenttombstone',
+            name='onboarding_tomb_user_sync_idx',
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='sync_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='documenttombstone',
+            name='sync_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='onboardingprogress',
+            name='sync_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='personaldetails',
+            name='sync_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['user', 'sync_version'], name='onboarding_doc_user_ver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documenttombstone',
+            index=models.Index(fields=['user', 'sync_version'], name='onboarding_tomb_user_ver_idx'),
+        ),
+    ]
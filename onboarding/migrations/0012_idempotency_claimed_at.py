@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onboarding', '0011_sync_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='claimed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
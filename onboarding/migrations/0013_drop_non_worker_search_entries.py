@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def drop_non_worker_entries(apps, schema_editor):
+    # 0003 indexed every user; only workers are searchable
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    SearchEntry = apps.get_model('onboarding', 'SearchEntry')
+    SearchEntry.objects.filter(kind='worker').exclude(
+        object_id__in=User.objects.filter(role='worker').values('pk')
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onboarding', '0012_idempotency_claimed_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_non_worker_entries, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,56 @@
-from django.db import models
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, models, router, transaction
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
+from django.utils import timezone
 from datetime import date, timedelta
 
+logger = logging.getLogger(__name__)
+
 User = get_user_model()
 
 
-class PersonalDetails(models.Model):
+def next_sync_version(user_id, using=None):
+    """
+    Bump ``user_id``'s sync counter and return the new value.
+    
+    The counter lives on the user's progress row, so the bump locks that row
+    until the caller's transaction ends: one user's versions are handed out and
+    committed in increasing order, which is what delta sync cursors rely on.
+    """
+    progress = OnboardingProgress._base_manager.db_manager(using)
+    if not progress.filter(user_id=user_id).update(sync_version=models.F('sync_version') + 1):
+        try:
+            with transaction.atomic(using=using):
+                # No signals: the progress views fill the row in on their next refresh
+                progress.bulk_create([OnboardingProgress(user_id=user_id, sync_version=1)])
+            return 1
+        except IntegrityError:
+            # Created concurrently; bump that row instead
+            progress.filter(user_id=user_id).update(sync_version=models.F('sync_version') + 1)
+    return progress.filter(user_id=user_id).values_list('sync_version', flat=True).get()
+
+
+class SyncVersioned(models.Model):
+    """Row sent to offline clients by delta sync, stamped with its user's next sync version on save"""
+    sync_version = models.BigIntegerField(default=0, editable=False)
+    
+    class Meta:
+        abstract = True
+    
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'sync_version'}
+        with transaction.atomic(using=using, savepoint=False):
+            self.sync_version = next_sync_version(self.user_id, using)
+            super().save(*args, **kwargs)
+
+
+class PersonalDetails(SyncVersioned):
     """Extended personal details for support workers"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='personal_details')
     
@@ -90,6 +134,7 @@ class DocumentType(models.Model):
     )
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.display_name
@@ -98,7 +143,149 @@ class DocumentType(models.Model):
         ordering = ['display_name']
 
 
-class Document(models.Model):
+EXPIRING_SOON_DAYS = 30
+
+
+class DaysUntil(models.Func):
+    """Whole days from ``today`` until a date column; negative once it has passed"""
+    output_field = models.IntegerField()
+    template = '(%(expressions)s)'
+    arg_joiner = ' - '
+    
+    def __init__(self, expression, today, **extra):
+        super().__init__(expression, models.Value(today, output_field=models.DateField()), **extra)
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)', arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+
+class DocumentQuerySet(models.QuerySet):
+    """
+    Expiry checks in the database.
+    
+    ``with_expiry()`` adds ``days_to_expiry``, ``has_expired`` and ``expires_soon``,
+    the SQL counterparts of the ``days_until_expiry``, ``is_expired`` and
+    ``is_expiring_soon`` properties. The filters compare ``expiry_date`` with
+    constant dates, so they are range scans on its index.
+    """
+    
+    def with_expiry(self, today=None):
+        today = today or date.today()
+        soon = today + timedelta(days=EXPIRING_SOON_DAYS)
+        return self.annotate(
+            days_to_expiry=DaysUntil('expiry_date', today),
+            has_expired=models.Case(
+                models.When(expiry_date__lt=today, then=models.Value(True)),
+                default=models.Value(False), output_field=models.BooleanField(),
+            ),
+            expires_soon=models.Case(
+                models.When(expiry_date__lte=soon, then=models.Value(True)),
+                default=models.Value(False), output_field=models.BooleanField(),
+            ),
+        )
+    
+    def expired(self, today=None):
+        return self.filter(expiry_date__lt=today or date.today())
+    
+    def not_expired(self, today=None):
+        return self.filter(models.Q(expiry_date__isnull=True) | models.Q(expiry_date__gte=today or date.today()))
+    
+    def expiring_within(self, days, today=None):
+        """Documents expiring between today and ``days`` from now, inclusive"""
+        today = today or date.today()
+        return self.filter(expiry_date__gte=today, expiry_date__lte=today + timedelta(days=days))
+    
+    def stale_expiry_status(self, today=None):
+        """Documents whose stored status lags their expiry date, i.e. that ``Document.save()`` would change"""
+        today = today or date.today()
+        soon = today + timedelta(days=EXPIRING_SOON_DAYS)
+        return self.filter(
+            (models.Q(expiry_date__lt=today) & ~models.Q(status='expired'))
+            | models.Q(status='approved', expiry_date__gte=today, expiry_date__lte=soon)
+        )
+    
+    def refresh_expiry_statuses(self):
+        """
+        Move documents that have passed (or are nearing) their expiry date to
+        ``expired`` (or ``expiring_soon``); returns the number updated.
+        
+        ``Document.save()`` only applies the expiry rules when a document is
+        written, so this runs on a schedule. Each document is saved on its own,
+        with its owner's progress refreshed, so the outbox gets its
+        ``document.expired`` event and sync clients see the change.
+        """
+        count = 0
+        for document in self.stale_expiry_status().select_related('user').iterator():
+            with transaction.atomic(using=self.db):
+                document.save(update_fields=['status', 'updated_at'])
+                OnboardingProgress.objects.db_manager(self.db).refresh_for(document.user)
+            count += 1
+        return count
+    
+    def by_expiry(self, descending=False):
+        """Soonest expiry first (or last); documents without one always come last"""
+        expiry = models.F('expiry_date')
+        order = expiry.desc(nulls_last=True) if descending else expiry.asc(nulls_last=True)
+        return self.order_by(order, '-id' if descending else 'id')
+    
+    def replace_or_create(self, user, document_type, file, **details):
+        """
+        Store an upload as the user's document of ``document_type``.
+        
+        An existing document is updated in place (same row, new file, review
+        reset) under a row lock instead of being deleted and re-inserted, so
+        concurrent uploads of the same type serialise rather than collide on
+        the unique ``(user, document_type)`` index. The replaced file is deleted
+        once the transaction commits. Returns ``(document, created)``.
+        """
+        fields = {
+            'file': file,
+            'original_filename': file.name,
+            'file_size': file.size,
+            'issue_date': details.get('issue_date'),
+            'expiry_date': details.get('expiry_date'),
+            'document_number': details.get('document_number'),
+            'issuing_authority': details.get('issuing_authority'),
+        }
+        with transaction.atomic(using=self.db):
+            document = self.select_for_update().filter(user=user, document_type=document_type).first()
+            if document is None:
+                try:
+                    with transaction.atomic(using=self.db):
+                        return self.create(user=user, document_type=document_type, **fields), True
+                except IntegrityError:
+                    # A concurrent upload inserted it first; replace that row instead
+                    document = self.select_for_update().get(user=user, document_type=document_type)
+            
+            old_file = document.file.name
+            for name, value in fields.items():
+                setattr(document, name, value)
+            document.status = 'pending'
+            document.notes = None
+            document.reviewed_by = None
+            document.reviewed_at = None
+            document.uploaded_at = timezone.now()
+            document._replaced_upload = True
+            document.save()
+            if old_file and old_file != document.file.name:
+                storage = document.file.storage
+                transaction.on_commit(lambda: delete_replaced_file(storage, old_file), using=self.db)
+            return document, False
+
+
+def delete_replaced_file(storage, name):
+    try:
+        storage.delete(name)
+    except OSError:
+        # An orphaned file is harmless; a failed upload response is not
+        logger.warning('Could not delete replaced document file %s', name, exc_info=True)
+
+
+class Document(SyncVersioned):
     """Uploaded documents for compliance"""
     STATUS_CHOICES = [
         ('pending', 'Pending Review'),
@@ -138,6 +325,8 @@ class Document(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DocumentQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.document_type.display_name} - {self.user.get_full_name() or self.user.username}"
     
@@ -153,7 +342,7 @@ class Document(models.Model):
         """Check if document expires within 30 days"""
         if not self.expiry_date:
             return False
-        return self.expiry_date <= date.today() + timedelta(days=30)
+        return self.expiry_date <= date.today() + timedelta(days=EXPIRING_SOON_DAYS)
     
     @property
     def days_until_expiry(self):
@@ -182,6 +371,83 @@ class Document(models.Model):
     class Meta:
         ordering = ['-uploaded_at']
         unique_together = ['user', 'document_type']  # One document per type per user
+        indexes = [
+            # Keyset pagination and date hierarchy on the admin changelist
+            models.Index(fields=['uploaded_at', 'id'], name='onboarding_doc_uploaded_idx'),
+            models.Index(fields=['expiry_date'], name='onboarding_doc_expiry_idx'),
+            # Status filters ordered or bounded by expiry, e.g. approved documents expiring soon
+            models.Index(fields=['status', 'expiry_date'], name='onboarding_doc_status_exp_idx'),
+            models.Index(fields=['reviewed_at'], name='onboarding_doc_reviewed_idx'),
+            # Conditional GET: newest change per user
+            models.Index(fields=['user', 'updated_at'], name='onboarding_doc_user_sync_idx'),
+            # Delta sync: changed documents per user since a cursor
+            models.Index(fields=['user', 'sync_version'], name='onboarding_doc_user_ver_idx'),
+        ]
+
+
+class OnboardingProgressQuerySet(models.QuerySet):
+    # Columns a refresh can change
+    REFRESHED_FIELDS = ('current_stage', 'completion_percentage', 'personal_details_completed_at', 'completed_at')
+    
+    def refresh_for(self, user, details_completed=False):
+        """
+        Recalculate ``user``'s progress and save the columns that changed.
+        
+        The progress row is locked before the documents and personal details are
+        read, so concurrent uploads and reviews for one worker take turns and the
+        last one sees every committed change. Other workers' rows are unaffected.
+        ``details_completed`` stamps ``personal_details_completed_at`` if unset.
+        """
+        # No savepoint of its own: callers are usually already in a transaction
+        with transaction.atomic(using=self.db, savepoint=False):
+            progress = self.select_for_update().filter(user=user).first()
+            if progress is None:
+                progress = self.model(user=user)
+                self._apply(progress, details_completed)
+                try:
+                    with transaction.atomic(using=self.db):
+                        progress.save(force_insert=True)
+                    return progress
+                except IntegrityError:
+                    # Created concurrently; update that row instead
+                    progress = self.select_for_update().get(user=user)
+            
+            changed = self._recalculate(progress, user, details_completed)
+            if changed:
+                progress.save(update_fields=[*changed, 'updated_at'])
+            return progress
+    
+    async def arefresh_for(self, user, details_completed=False):
+        # Row locks need a transaction, which the async ORM can't hold open
+        return await sync_to_async(self.refresh_for)(user, details_completed)
+    
+    def current_for(self, user):
+        """
+        ``user``'s progress for a read, recalculated without locking.
+        
+        Polls only take the row lock (through ``refresh_for``) when the
+        recalculation would change a stored column, so they don't queue behind
+        uploads and reviews or rewrite an unchanged row.
+        """
+        progress = self.filter(user=user).first()
+        if progress is not None and not self._recalculate(progress, user):
+            return progress
+        return self.refresh_for(user)
+    
+    async def acurrent_for(self, user):
+        return await sync_to_async(self.current_for)(user)
+    
+    def _recalculate(self, progress, user, details_completed=False):
+        """Recalculate ``progress`` in memory; returns the names of the columns that changed"""
+        progress.user = user
+        before = {name: getattr(progress, name) for name in self.REFRESHED_FIELDS}
+        self._apply(progress, details_completed)
+        return [name for name in self.REFRESHED_FIELDS if getattr(progress, name) != before[name]]
+    
+    def _apply(self, progress, details_completed):
+        if details_completed and not progress.personal_details_completed_at:
+            progress.personal_details_completed_at = timezone.now()
+        progress.recalculate()
 
 
 class OnboardingProgress(models.Model):
@@ -212,62 +478,174 @@ class OnboardingProgress(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Delta sync counter for the user's rows (see next_sync_version), and this row's own version
+    sync_version = models.BigIntegerField(default=0, editable=False)
+    
+    objects = OnboardingProgressQuerySet.as_manager()
+    
     def __str__(self):
         return f"Onboarding Progress - {self.user.get_full_name() or self.user.username} ({self.get_current_stage_display()})"
     
-    def calculate_completion_percentage(self):
-        """Calculate completion percentage based on progress"""
-        total_steps = 0
-        completed_steps = 0
-        
-        # Personal details (25%)
-        total_steps += 1
-        if hasattr(self.user, 'personal_details') and self.user.personal_details.is_complete:
-            completed_steps += 1
-        
-        # Required documents (50%)
-        required_doc_types = DocumentType.objects.filter(is_required=True)
-        total_steps += len(required_doc_types)
-        approved_docs = self.user.documents.filter(
-            document_type__in=required_doc_types,
-            status='approved'
-        ).count()
-        completed_steps += approved_docs
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.sync_version = max(self.sync_version, 1)
+            return super().save(*args, **kwargs)
+        # Bumped in this row's own UPDATE, which locks it like next_sync_version
+        self.sync_version = models.F('sync_version') + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'sync_version'}
+        super().save(*args, **kwargs)
+        # Loaded again on first access
+        del self.sync_version
+    
+    def progress_inputs(self):
+        """
+        Load everything stage and completion depend on.
         
-        # Admin approval (25%)
-        total_steps += 1
+        Returns ``(personal_details_complete, required_type_ids, documents)`` where
+        ``documents`` is a list of ``(document_type_id, status)`` pairs.
+        """
+        try:
+            details_complete = self.user.personal_details.is_complete
+        except PersonalDetails.DoesNotExist:
+            details_complete = False
+        required_type_ids = set(DocumentType.objects.filter(is_required=True).values_list('id', flat=True))
+        documents = list(self.user.documents.values_list('document_type_id', 'status'))
+        return details_complete, required_type_ids, documents
+    
+    def apply_completion_percentage(self, details_complete, required_type_ids, documents):
+        """Calculate completion percentage from preloaded progress inputs"""
+        # Personal details, each required document, then admin approval
+        total_steps = 1 + len(required_type_ids) + 1
+        completed_steps = int(details_complete)
+        completed_steps += sum(
+            1 for type_id, status in documents
+            if type_id in required_type_ids and status == 'approved'
+        )
         if self.current_stage == 'completed':
             completed_steps += 1
         
-        if total_steps > 0:
-            self.completion_percentage = int((completed_steps / total_steps) * 100)
-        else:
-            self.completion_percentage = 0
-        
+        self.completion_percentage = int((completed_steps / total_steps) * 100)
         return self.completion_percentage
     
-    def update_stage(self):
-        """Auto-update current stage based on progress"""
-        if not hasattr(self.user, 'personal_details') or not self.user.personal_details.is_complete:
+    def apply_stage(self, details_complete, required_type_ids, documents):
+        """Update current stage from preloaded progress inputs"""
+        required_statuses = [status for type_id, status in documents if type_id in required_type_ids]
+        
+        if not details_complete:
             self.current_stage = 'personal_details'
-        elif self.user.documents.filter(document_type__is_required=True).count() == 0:
+        elif not required_statuses:
             self.current_stage = 'documents_upload'
-        elif self.user.documents.filter(document_type__is_required=True, status='pending').exists():
+        elif 'pending' in required_statuses:
             self.current_stage = 'admin_review'
-        elif self.user.documents.filter(document_type__is_required=True, status='rejected').exists():
+        elif 'rejected' in required_statuses:
             self.current_stage = 'rejected'
-        else:
-            required_docs = DocumentType.objects.filter(is_required=True).count()
-            approved_docs = self.user.documents.filter(
-                document_type__is_required=True,
-                status='approved'
-            ).count()
-            
-            if approved_docs >= required_docs:
-                self.current_stage = 'completed'
-                if not self.completed_at:
-                    from django.utils import timezone
-                    self.completed_at = timezone.now()
+        elif required_statuses.count('approved') >= len(required_type_ids):
+            self.current_stage = 'completed'
+            if not self.completed_at:
+                self.completed_at = timezone.now()
+    
+    def apply_progress(self, details_complete, required_type_ids, documents):
+        """Update stage, then completion percentage, from preloaded progress inputs"""
+        self.apply_stage(details_complete, required_type_ids, documents)
+        self.apply_completion_percentage(details_complete, required_type_ids, documents)
+    
+    def recalculate(self):
+        """Update stage and completion percentage with a single load of the inputs"""
+        self.apply_progress(*self.progress_inputs())
+    
+    def calculate_completion_percentage(self):
+        """Calculate completion percentage based on progress"""
+        return self.apply_completion_percentage(*self.progress_inputs())
+    
+    def update_stage(self):
+        """Auto-update current stage based on progress"""
+        self.apply_stage(*self.progress_inputs())
+    
+    class Meta:
+        verbose_name_plural = "Onboarding Progress"
+        indexes = [
+            # Admin roster: stage filters with the default ordering, and each ordering option
+            models.Index(fields=['current_stage', 'updated_at', 'id'], name='onboarding_prog_stage_idx'),
+            models.Index(fields=['updated_at', 'id'], name='onboarding_prog_updated_idx'),
+            models.Index(fields=['created_at', 'id'], name='onboarding_prog_created_idx'),
+            models.Index(fields=['completion_percentage', 'id'], name='onboarding_prog_complete_idx'),
+        ]
+
+
+class DocumentTombstone(SyncVersioned):
+    """Record of a deleted document so offline clients can drop it on their next sync"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='document_tombstones')
+    document_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Deleted document #{self.document_id}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sync_version'], name='onboarding_tomb_user_ver_idx'),
+        ]
+
+
+class OutboxEvent(models.Model):
+    """Change event written in the same transaction as the document/progress change it describes"""
+    EVENT_TYPES = [
+        ('document.uploaded', 'Document uploaded'),
+        ('document.reviewed', 'Document reviewed'),
+        ('document.expired', 'Document expired'),
+        ('progress.updated', 'Onboarding stage changed'),
+    ]
+    
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPES)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='outbox_events')
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"#{self.pk} {self.event_type}"
+    
+    class Meta:
+        ordering = ['id']
+
+
+class IdempotencyKey(models.Model):
+    """Response to a write request, replayed when the client retries with the same Idempotency-Key"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=50)
+    fingerprint = models.CharField(max_length=64)
+    # Both empty while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When the running request took the key; a retry may take it over once the lease runs out
+    claimed_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+    
+    class Meta:
+        unique_together = ['user', 'key']
+
+
+class SearchEntry(models.Model):
+    """Denormalised search text for workers and documents, kept in sync on write"""
+    KIND_CHOICES = [
+        ('worker', 'Worker'),
+        ('document', 'Document'),
+    ]
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_entries')
+    body = models.TextField(help_text="Searchable text; indexed with FTS5 on SQLite and trigram/tsvector on PostgreSQL")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id}"
     
     class Meta:
-        verbose_name_plural = "Onboarding Progress"
\ No newline at end of file
+        unique_together = ['kind', 'object_id']
+        verbose_name_plural = "Search Entries"
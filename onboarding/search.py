@@ -0,0 +1,216 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Document, PersonalDetails, SearchEntry
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+FTS_TABLE = 'onboarding_searchentry_fts'
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def worker_search_text(user):
+    """Searchable text for a worker: names, email and phone number"""
+    try:
+        phone_number = user.personal_details.phone_number
+    except PersonalDetails.DoesNotExist:
+        phone_number = None
+    return _join(user.username, user.first_name, user.last_name, user.email, phone_number)
+
+
+def document_search_text(document):
+    """Searchable text for a document: owner, type and document details"""
+    user = document.user
+    return _join(
+        user.username, user.first_name, user.last_name, user.email,
+        document.document_type.display_name, document.document_number,
+        document.issuing_authority, document.original_filename,
+    )
+
+
+def index_worker(user):
+    # Only workers are searchable; drop the entry of anyone whose role changed
+    if user.role != 'worker':
+        SearchEntry.objects.filter(kind='worker', object_id=user.pk).delete()
+        return
+    SearchEntry.objects.update_or_create(
+        kind='worker', object_id=user.pk,
+        defaults={'user': user, 'body': worker_search_text(user)}
+    )
+
+
+def index_document(document):
+    SearchEntry.objects.update_or_create(
+        kind='document', object_id=document.pk,
+        defaults={'user_id': document.user_id, 'body': document_search_text(document)}
+    )
+
+
+def remove_document(document_id):
+    SearchEntry.objects.filter(kind='document', object_id=document_id).delete()
+
+
+def _reindex_batch(documents, now):
+    entries = SearchEntry.objects.filter(kind='document', object_id__in=[document.pk for document in documents])
+    entries = {entry.object_id: entry for entry in entries}
+    changed, missing = [], []
+    for document in documents:
+        entry = entries.get(document.pk)
+        if entry is None:
+            missing.append(SearchEntry(
+                kind='document', object_id=document.pk, user_id=document.user_id, body=document_search_text(document)
+            ))
+        else:
+            entry.body, entry.updated_at = document_search_text(document), now
+            changed.append(entry)
+    SearchEntry.objects.bulk_update(changed, ['body', 'updated_at'])
+    SearchEntry.objects.bulk_create(missing)
+
+
+def reindex_documents(documents, batch_size=500):
+    """Refresh the entries of every document in ``documents`` (a queryset), a few queries per batch"""
+    from django.utils import timezone
+    
+    now = timezone.now()
+    batch = []
+    for document in documents.select_related('user', 'document_type').order_by('pk').iterator(chunk_size=batch_size):
+        batch.append(document)
+        if len(batch) == batch_size:
+            _reindex_batch(batch, now)
+            batch = []
+    if batch:
+        _reindex_batch(batch, now)
+
+
+def reindex_user(user):
+    """Refresh the worker entry and every document entry that embeds the user's names"""
+    index_worker(user)
+    reindex_documents(Document.objects.filter(user=user))
+
+
+def rebuild_index():
+    """Rebuild every search entry from scratch"""
+    from django.contrib.auth import get_user_model
+    
+    SearchEntry.objects.all().delete()
+    count = 0
+    for user in get_user_model().objects.filter(role='worker').select_related('personal_details'):
+        index_worker(user)
+        count += 1
+    for document in Document.objects.select_related('user', 'document_type'):
+        index_document(document)
+        count += 1
+    return count
+
+
+def _tokens(query):
+    return TOKEN_RE.findall(query.lower())[:10]
+
+
+def _postgres_match(tokens):
+    tsquery = ' & '.join(f'{token}:*' for token in tokens)
+    phrase = ' '.join(tokens)
+    where = "(to_tsvector('simple', e.body) @@ to_tsquery('simple', %s) OR e.body ILIKE %s)"
+    return tsquery, phrase, where, [tsquery, f'%{phrase}%']
+
+
+def _sqlite_match(tokens):
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def matching_entries(query, kind=None):
+    """
+    Every search entry matching ``query``, unranked and unlimited, as a queryset
+    that can be used as a subquery (e.g. ``.values('object_id')``)
+    """
+    tokens = _tokens(query)
+    queryset = SearchEntry.objects.all()
+    if kind:
+        queryset = queryset.filter(kind=kind)
+    if not tokens:
+        return queryset.none()
+    
+    if connection.vendor == 'postgresql':
+        _, _, where, params = _postgres_match(tokens)
+        return queryset.filter(id__in=RawSQL(f'SELECT e.id FROM onboarding_searchentry e WHERE {where}', params))
+    if connection.vendor == 'sqlite':
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_sqlite_match(tokens)])
+        )
+    for token in tokens:
+        queryset = queryset.filter(body__icontains=token)
+    return queryset
+
+
+def search(query, kind=None, limit=20):
+    """
+    Ranked search over the index.
+    
+    Returns a list of ``(kind, object_id, user_id, rank)`` tuples, best match first.
+    Uses FTS5 on SQLite and trigram/tsvector indexes on PostgreSQL, falling back
+    to a plain substring scan on other backends.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    
+    kind_sql = ' AND e.kind = %s' if kind else ''
+    kind_params = [kind] if kind else []
+    
+    if connection.vendor == 'postgresql':
+        tsquery, phrase, where, where_params = _postgres_match(tokens)
+        sql = (
+            "SELECT e.kind, e.object_id, e.user_id, "
+            "ts_rank(to_tsvector('simple', e.body), to_tsquery('simple', %s)) "
+            "+ word_similarity(%s, e.body) AS rank "
+            f"FROM onboarding_searchentry e WHERE {where}"
+            f"{kind_sql} ORDER BY rank DESC, e.object_id LIMIT %s"
+        )
+        params = [tsquery, phrase] + where_params + kind_params + [limit]
+    elif connection.vendor == 'sqlite':
+        match = _sqlite_match(tokens)
+        # bm25() is lower for better matches; negate it so rank sorts like PostgreSQL
+        sql = (
+            f"SELECT e.kind, e.object_id, e.user_id, -bm25({FTS_TABLE}) AS rank "
+            f"FROM {FTS_TABLE} JOIN onboarding_searchentry e ON e.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{kind_sql} ORDER BY rank DESC, e.object_id LIMIT %s"
+        )
+        params = [match] + kind_params + [limit]
+    else:
+        queryset = SearchEntry.objects.all()
+        for token in tokens:
+            queryset = queryset.filter(body__icontains=token)
+        if kind:
+            queryset = queryset.filter(kind=kind)
+        return [
+            (entry_kind, object_id, user_id, 1.0)
+            for entry_kind, object_id, user_id in queryset.values_list('kind', 'object_id', 'user_id')[:limit]
+        ]
+    
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+class IndexedSearchAdminMixin:
+    """
+    ModelAdmin mixin that answers the changelist search box from the search index.
+    
+    ``search_index_kind`` selects worker or document entries and
+    ``search_index_lookup`` is the queryset field the matching ids are applied to,
+    as a subquery so every match is kept. ``search_fields`` still needs to be set
+    so the admin renders the search box.
+    """
+    search_index_kind = 'worker'
+    search_index_lookup = 'pk'
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not _tokens(search_term):
+            return queryset, False
+        
+        matches = matching_entries(search_term, kind=self.search_index_kind).values('object_id')
+        return queryset.filter(**{f'{self.search_index_lookup}__in': matches}), False
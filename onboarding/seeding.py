@@ -0,0 +1,213 @@
+"""
+Synthetic workers at benchmark scale, used by the ``seed_scale_data`` command.
+
+Every seeded worker gets ``PersonalDetails`` (unless brand new), documents for
+some or all document types and an ``OnboardingProgress`` computed the same way
+the API computes it. The mix of stages, statuses and expiry dates depends only
+on the seed, so two databases seeded alike give comparable benchmark numbers.
+
+Rows are written with ``bulk_create``, which bypasses model signals: the admin
+stats cache is invalidated at the end, and the search index and outbox are left
+alone (rebuild the index with ``rebuild_search_index`` if search is measured).
+"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Document, DocumentType, OnboardingProgress, PersonalDetails
+from .stats import invalidate_admin_stats
+
+User = get_user_model()
+
+EMAIL_DOMAIN = 'scale.test'
+PLACEHOLDER = b'%PDF-1.4\n%seeded placeholder\n%%EOF\n'
+
+# Share of workers at each point of onboarding
+PROFILES = {
+    'new': 10,          # no personal details yet
+    'details': 10,      # personal details partly filled in
+    'uploading': 20,    # some documents uploaded
+    'review': 40,       # every document uploaded, mixed review outcomes
+    'complete': 20,     # every document approved
+}
+REVIEW_STATUSES = {'pending': 40, 'approved': 45, 'rejected': 15}
+# Days from today until expiry; Document.save() turns these into expired/expiring_soon
+EXPIRY_RANGES = {(-365, -1): 10, (0, 30): 15, (31, 1095): 75}
+
+STATES = ['NSW', 'VIC', 'QLD', 'WA', 'SA', 'TAS', 'ACT', 'NT']
+SUBURBS = ['Parramatta', 'Fitzroy', 'Fortitude Valley', 'Fremantle', 'Glenelg', 'Sandy Bay', 'Braddon', 'Fannie Bay']
+
+
+@dataclass
+class SeedResult:
+    workers: int = 0
+    personal_details: int = 0
+    documents: int = 0
+    files: int = 0
+    stages: dict = field(default_factory=dict)
+    statuses: dict = field(default_factory=dict)
+
+
+def _pick(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def seeded_users():
+    return User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+
+
+def clear_seeded_data():
+    """Delete every seeded user (and, by cascade, their onboarding rows)"""
+    deleted, _ = seeded_users().delete()
+    invalidate_admin_stats()
+    return deleted
+
+
+def document_path(index, document_type):
+    # A thousand workers per directory keeps directories listable
+    return f'documents/seed/{index // 1000:04d}/{index}-{document_type.name}.pdf'
+
+
+def write_placeholder(name, storage=default_storage):
+    if storage.exists(name):
+        return False
+    storage.save(name, ContentFile(PLACEHOLDER))
+    return True
+
+
+class ScaleSeeder:
+    """Writes synthetic workers in batches and tallies what was created"""
+
+    def __init__(self, seed=42, password='scale123', batch_size=1000, write_files=True, file_workers=8):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.write_files = write_files
+        self.file_workers = file_workers
+        # Hashing is deliberately slow; every seeded worker shares one hash
+        self.password_hash = make_password(password)
+        self.today = date.today()
+        self.document_types = list(DocumentType.objects.order_by('name'))
+        self.required_ids = {doc_type.id for doc_type in self.document_types if doc_type.is_required}
+        self.reviewer, _ = User.objects.get_or_create(
+            email=f'reviewer@{EMAIL_DOMAIN}',
+            defaults={'username': 'scale-reviewer', 'role': 'admin', 'password': self.password_hash},
+        )
+        self.result = SeedResult()
+
+    def run(self, count, start=0):
+        for batch_start in range(start, start + count, self.batch_size):
+            batch_end = min(batch_start + self.batch_size, start + count)
+            self.seed_batch(range(batch_start, batch_end))
+        invalidate_admin_stats()
+        return self.result
+
+    def seed_batch(self, indexes):
+        profiles = [_pick(self.rng, PROFILES) for _ in indexes]
+        with transaction.atomic():
+            users = User.objects.bulk_create([self.build_user(index) for index in indexes])
+
+            details, documents, progress, paths = [], [], [], []
+            for index, user, profile in zip(indexes, users, profiles):
+                detail = self.build_personal_details(user, profile)
+                if detail is not None:
+                    details.append(detail)
+                user_documents = self.build_documents(index, user, profile)
+                documents.extend(user_documents)
+                paths.extend(document.file.name for document in user_documents)
+                progress.append(self.build_progress(user, detail, user_documents))
+
+            PersonalDetails.objects.bulk_create(details)
+            Document.objects.bulk_create(documents)
+            OnboardingProgress.objects.bulk_create(progress)
+
+        if self.write_files:
+            with ThreadPoolExecutor(max_workers=self.file_workers) as pool:
+                self.result.files += sum(pool.map(write_placeholder, paths))
+
+        self.result.workers += len(users)
+        self.result.personal_details += len(details)
+        self.result.documents += len(documents)
+        for item in progress:
+            self.result.stages[item.current_stage] = self.result.stages.get(item.current_stage, 0) + 1
+        for document in documents:
+            self.result.statuses[document.status] = self.result.statuses.get(document.status, 0) + 1
+
+    def build_user(self, index):
+        return User(
+            username=f'scale-{index}',
+            email=f'worker{index}@{EMAIL_DOMAIN}',
+            password=self.password_hash,
+            first_name=self.rng.choice(['Alex', 'Sam', 'Jordan', 'Taylor', 'Casey', 'Riley', 'Jamie', 'Morgan']),
+            last_name=f'Worker{index}',
+            role='worker',
+        )
+
+    def build_personal_details(self, user, profile):
+        if profile == 'new':
+            return None
+        rng = self.rng
+        detail = PersonalDetails(
+            user=user,
+            phone_number=f'04{rng.randrange(10 ** 8):08d}',
+            suburb=rng.choice(SUBURBS),
+            state=rng.choice(STATES),
+        )
+        if profile != 'details':
+            detail.date_of_birth = self.today - timedelta(days=rng.randint(18 * 365, 65 * 365))
+            detail.address_line1 = f'{rng.randint(1, 400)} Example Street'
+            detail.postcode = f'{rng.randint(800, 7999):04d}'
+            detail.emergency_contact_name = 'Emergency Contact'
+            detail.emergency_contact_phone = f'04{rng.randrange(10 ** 8):08d}'
+            detail.emergency_contact_relationship = rng.choice(['Partner', 'Parent', 'Sibling', 'Friend'])
+        return detail
+
+    def build_documents(self, index, user, profile):
+        if profile in ('new', 'details'):
+            return []
+        document_types = self.document_types
+        if profile == 'uploading':
+            document_types = self.rng.sample(document_types, self.rng.randint(1, max(len(document_types) - 1, 1)))
+
+        documents = []
+        for document_type in document_types:
+            status = 'approved' if profile == 'complete' else _pick(self.rng, REVIEW_STATUSES)
+            expiry_date = None
+            if document_type.has_expiry:
+                low, high = (31, 1095) if profile == 'complete' else _pick(self.rng, EXPIRY_RANGES)
+                expiry_date = self.today + timedelta(days=self.rng.randint(low, high))
+            document = Document(
+                user=user,
+                document_type=document_type,
+                file=document_path(index, document_type),
+                original_filename=f'{document_type.name}.pdf',
+                file_size=len(PLACEHOLDER),
+                expiry_date=expiry_date,
+                status=status,
+            )
+            if status != 'pending':
+                document.reviewed_by = self.reviewer
+                document.reviewed_at = timezone.now()
+            # Same expiry rules Document.save() applies
+            if document.is_expired:
+                document.status = 'expired'
+            elif document.is_expiring_soon and document.status == 'approved':
+                document.status = 'expiring_soon'
+            documents.append(document)
+        return documents
+
+    def build_progress(self, user, detail, documents):
+        progress = OnboardingProgress(user=user)
+        progress.apply_progress(
+            detail is not None and detail.is_complete,
+            self.required_ids,
+            [(document.document_type_id, document.status) for document in documents],
+        )
+        return progress
@@ -1,11 +1,16 @@
+from datetime import date
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.utils.encoding import filepath_to_uri
+
+from tavonga_system.instrumentation import TimedSerializerMixin, timed
 from .models import PersonalDetails, Document, DocumentType, OnboardingProgress
 
 User = get_user_model()
 
 
-class PersonalDetailsSerializer(serializers.ModelSerializer):
+class PersonalDetailsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = PersonalDetails
         fields = [
@@ -24,7 +29,7 @@ class PersonalDetailsSerializer(serializers.ModelSerializer):
         return value
 
 
-class DocumentTypeSerializer(serializers.ModelSerializer):
+class DocumentTypeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = DocumentType
         fields = [
@@ -33,7 +38,7 @@ class DocumentTypeSerializer(serializers.ModelSerializer):
         ]
 
 
-class DocumentSerializer(serializers.ModelSerializer):
+class DocumentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     document_type_name = serializers.CharField(source='document_type.display_name', read_only=True)
     file_url = serializers.SerializerMethodField()
     days_until_expiry = serializers.ReadOnlyField()
@@ -102,6 +107,94 @@ class DocumentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class DocumentListSerializer:
+    """
+    Read-only fast path for document list responses.
+    
+    Produces the same output as ``DocumentSerializer(many=True)`` from ``values()``
+    rows: the expiry fields are computed by the database, the file URL prefix is
+    resolved once per request and the related names come from the same query
+    instead of lazy foreign key loads.
+    """
+    VALUE_FIELDS = (
+        'id', 'document_type_id', 'document_type__display_name', 'file',
+        'original_filename', 'file_size', 'issue_date', 'expiry_date',
+        'document_number', 'issuing_authority', 'status', 'notes',
+        'reviewed_by_id', 'reviewed_by__first_name', 'reviewed_by__last_name',
+        'reviewed_at', 'uploaded_at', 'updated_at',
+    )
+    
+    def __init__(self, rows, context=None):
+        self.rows = rows
+        self.context = context or {}
+    
+    @classmethod
+    def values(cls, queryset):
+        """Turn a Document queryset into the rows this serializer consumes"""
+        return queryset.with_expiry().values(*cls.VALUE_FIELDS, 'days_to_expiry', 'has_expired', 'expires_soon')
+    
+    def _url_builder(self):
+        storage = Document._meta.get_field('file').storage
+        request = self.context.get('request')
+        probe = storage.url('probe')
+        if not probe.endswith('probe') or not (probe.startswith('/') or '://' in probe):
+            # Storage builds URLs we can't prefix safely; resolve each one
+            if request:
+                return lambda name: request.build_absolute_uri(storage.url(name))
+            return storage.url
+        
+        prefix = probe[:-len('probe')]
+        if request:
+            prefix = request.build_absolute_uri(prefix)
+        return lambda name: prefix + filepath_to_uri(name)
+    
+    def to_representation(self, rows):
+        file_url = self._url_builder()
+        datetime_field = serializers.DateTimeField()
+        
+        def format_datetime(value):
+            return None if value is None else datetime_field.to_representation(value)
+        
+        data = []
+        for row in rows:
+            url = file_url(row['file']) if row['file'] else None
+            expiry_date = row['expiry_date']
+            item = {
+                'id': row['id'],
+                'document_type': row['document_type_id'],
+                'document_type_name': row['document_type__display_name'],
+                'file': url,
+                'file_url': url,
+                'original_filename': row['original_filename'],
+                'file_size': row['file_size'],
+                'issue_date': row['issue_date'].isoformat() if row['issue_date'] else None,
+                'expiry_date': expiry_date.isoformat() if expiry_date else None,
+                'document_number': row['document_number'],
+                'issuing_authority': row['issuing_authority'],
+                'status': row['status'],
+                'notes': row['notes'],
+                'reviewed_by': row['reviewed_by_id'],
+            }
+            # DocumentSerializer skips reviewed_by_name entirely for unreviewed documents
+            if row['reviewed_by_id'] is not None:
+                item['reviewed_by_name'] = (
+                    f"{row['reviewed_by__first_name']} {row['reviewed_by__last_name']}".strip()
+                )
+            item['reviewed_at'] = format_datetime(row['reviewed_at'])
+            item['uploaded_at'] = format_datetime(row['uploaded_at'])
+            item['updated_at'] = format_datetime(row['updated_at'])
+            item['days_until_expiry'] = row['days_to_expiry']
+            item['is_expired'] = row['has_expired']
+            item['is_expiring_soon'] = row['expires_soon']
+            data.append(item)
+        return data
+    
+    @property
+    def data(self):
+        with timed('serializer_time'):
+            return self.to_representation(self.rows)
+
+
 class DocumentUploadSerializer(serializers.Serializer):
     """Simplified serializer for document upload"""
     document_type = serializers.PrimaryKeyRelatedField(queryset=DocumentType.objects.all())
@@ -128,7 +221,7 @@ class DocumentUploadSerializer(serializers.Serializer):
         return value
 
 
-class OnboardingProgressSerializer(serializers.ModelSerializer):
+class OnboardingProgressSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     user_email = serializers.CharField(source='user.email', read_only=True)
     
@@ -147,7 +240,24 @@ class OnboardingProgressSerializer(serializers.ModelSerializer):
         ]
 
 
-class DocumentReviewSerializer(serializers.ModelSerializer):
+class AdminOnboardingRosterSerializer(OnboardingProgressSerializer):
+    """Roster row; ``document_summary`` is only present when the view supplies summaries"""
+    document_summary = serializers.SerializerMethodField()
+    
+    class Meta(OnboardingProgressSerializer.Meta):
+        fields = OnboardingProgressSerializer.Meta.fields + ['document_summary']
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        if 'document_summaries' not in self.context:
+            fields.pop('document_summary')
+        return fields
+    
+    def get_document_summary(self, obj):
+        return self.context['document_summaries'].get(obj.user_id)
+
+
+class DocumentReviewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for admin document review"""
     class Meta:
         model = Document
@@ -159,7 +269,7 @@ class DocumentReviewSerializer(serializers.ModelSerializer):
         return value
 
 
-class OnboardingDashboardSerializer(serializers.Serializer):
+class OnboardingDashboardSerializer(TimedSerializerMixin, serializers.Serializer):
     """Serializer for onboarding dashboard data"""
     personal_details = PersonalDetailsSerializer(read_only=True)
     progress = OnboardingProgressSerializer(read_only=True)
@@ -188,8 +298,8 @@ class OnboardingDashboardSerializer(serializers.Serializer):
             data['progress'] = None
         
         # Documents
-        data['documents'] = DocumentSerializer(
-            instance.documents.all(), many=True, context=self.context
+        data['documents'] = DocumentListSerializer(
+            DocumentListSerializer.values(instance.documents.all()), context=self.context
         ).data
         
         # Required document types
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import events, search
+from .models import Document, DocumentTombstone, DocumentType, OnboardingProgress, PersonalDetails
+from .stats import invalidate_admin_stats
+
+User = get_user_model()
+
+SEARCHABLE_USER_FIELDS = ('username', 'first_name', 'last_name', 'email', 'role')
+
+
+def _search_snapshot(user):
+    # __dict__ so deferred fields aren't loaded just to remember them
+    return tuple(user.__dict__.get(name) for name in SEARCHABLE_USER_FIELDS)
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=OnboardingProgress)
+@receiver(post_delete, sender=OnboardingProgress)
+def invalidate_stats_on_write(sender, **kwargs):
+    """Invalidate cached admin stats once the write is committed"""
+    transaction.on_commit(invalidate_admin_stats)
+
+
+@receiver(post_init, sender=User)
+def remember_search_fields(sender, instance, **kwargs):
+    instance._loaded_search_fields = _search_snapshot(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, created, **kwargs):
+    """Keep worker and document search entries in step with user names and role"""
+    snapshot = _search_snapshot(instance)
+    if created:
+        search.index_worker(instance)
+    elif snapshot != instance._loaded_search_fields:
+        # e.g. a password change or last_login update leaves the index alone
+        search.reindex_user(instance)
+    instance._loaded_search_fields = snapshot
+
+
+@receiver(post_save, sender=PersonalDetails)
+def index_personal_details(sender, instance, **kwargs):
+    search.index_worker(instance.user)
+
+
+@receiver(post_save, sender=Document)
+def index_document(sender, instance, **kwargs):
+    search.index_document(instance)
+
+
+@receiver(post_delete, sender=Document)
+def unindex_document(sender, instance, **kwargs):
+    search.remove_document(instance.pk)
+
+
+@receiver(post_save, sender=DocumentType)
+def reindex_document_type(sender, instance, created, **kwargs):
+    if created:
+        return
+    search.reindex_documents(instance.document_set.all())
+
+
+@receiver(post_delete, sender=Document)
+def record_document_tombstone(sender, instance, origin=None, **kwargs):
+    """
+    Leave a tombstone for delta sync unless the whole user is being deleted.
+
+    Any other origin, the documents themselves or a cascade from e.g. their
+    document type, removes them from a user who keeps syncing.
+    """
+    deleting_user = isinstance(origin, User) or (
+        isinstance(origin, QuerySet) and issubclass(origin.model, User)
+    )
+    if not deleting_user:
+        DocumentTombstone.objects.create(user_id=instance.user_id, document_id=instance.pk)
+
+
+@receiver(post_init, sender=Document)
+def remember_document_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.status if instance.pk else None
+
+
+@receiver(post_init, sender=OnboardingProgress)
+def remember_progress_stage(sender, instance, **kwargs):
+    instance._loaded_stage = instance.current_stage if instance.pk else None
+
+
+@receiver(post_save, sender=Document)
+def write_document_outbox_event(sender, instance, created, **kwargs):
+    # A re-upload replaces the row in place but is still a new upload to listeners
+    uploaded = created or getattr(instance, '_replaced_upload', False)
+    instance._replaced_upload = False
+    events.record_document_event(instance, uploaded, instance._loaded_status)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_save, sender=OnboardingProgress)
+def write_progress_outbox_event(sender, instance, created, **kwargs):
+    events.record_progress_event(instance, instance._loaded_stage)
+    instance._loaded_stage = instance.current_stage
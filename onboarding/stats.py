@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Document, OnboardingProgress
+
+STATS_CACHE_KEY = 'onboarding:admin-stats'
+APPROVED_STATUSES = ['approved', 'expiring_soon', 'expired']
+# Documents still in force; pending and rejected ones expiring don't need action
+VALID_STATUSES = ['approved', 'expiring_soon']
+
+
+def _stats_timeout():
+    return getattr(settings, 'ONBOARDING_STATS_CACHE_TIMEOUT', 60 * 60)
+
+
+def _series_days():
+    return getattr(settings, 'ONBOARDING_STATS_SERIES_DAYS', 90)
+
+
+def compute_admin_stats():
+    """Build the admin headline numbers from grouped aggregates"""
+    now = timezone.now()
+    today = timezone.localdate(now)
+
+    stages = dict.fromkeys([key for key, _ in OnboardingProgress.PROGRESS_STAGES], 0)
+    for row in OnboardingProgress.objects.order_by().values('current_stage').annotate(count=Count('id')):
+        stages[row['current_stage']] = row['count']
+
+    statuses = dict.fromkeys([key for key, _ in Document.STATUS_CHOICES], 0)
+    for row in Document.objects.order_by().values('status').annotate(count=Count('id')):
+        statuses[row['status']] = row['count']
+
+    expiring_this_week = Document.objects.filter(
+        status__in=VALID_STATUSES,
+        expiry_date__gte=today,
+        expiry_date__lte=today + timedelta(days=7)
+    ).count()
+
+    # Time between upload and approval for every reviewed, non-rejected document
+    approval_time = Document.objects.filter(
+        status__in=APPROVED_STATUSES,
+        reviewed_at__isnull=False
+    ).aggregate(
+        average=Avg(ExpressionWrapper(F('reviewed_at') - F('uploaded_at'), output_field=DurationField()))
+    )['average']
+
+    # Daily approvals over the rolling window, zero-filled for quiet days
+    days = _series_days()
+    start = today - timedelta(days=days - 1)
+    daily = {
+        row['day']: row['count']
+        for row in Document.objects.filter(
+            status__in=APPROVED_STATUSES,
+            reviewed_at__date__gte=start
+        ).order_by().annotate(day=TruncDate('reviewed_at')).values('day').annotate(count=Count('id'))
+    }
+    series = [
+        {'date': (start + timedelta(days=offset)).isoformat(), 'approvals': daily.get(start + timedelta(days=offset), 0)}
+        for offset in range(days)
+    ]
+
+    return {
+        'workers_by_stage': stages,
+        'total_workers': sum(stages.values()),
+        'documents_by_status': statuses,
+        'total_documents': sum(statuses.values()),
+        'expiring_this_week': expiring_this_week,
+        'average_approval_hours': round(approval_time.total_seconds() / 3600, 2) if approval_time else None,
+        'daily_approvals': series,
+        'generated_at': now.isoformat(),
+    }
+
+
+def get_admin_stats():
+    """Return cached admin stats, computing them on a cache miss"""
+    # The date is part of the key so day-relative numbers roll over at midnight
+    key = f'{STATS_CACHE_KEY}:{timezone.localdate().isoformat()}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_admin_stats()
+        cache.set(key, stats, _stats_timeout())
+    return stats
+
+
+def invalidate_admin_stats():
+    """Drop cached admin stats after a document or progress write"""
+    cache.delete(f'{STATS_CACHE_KEY}:{timezone.localdate().isoformat()}')
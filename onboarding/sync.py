@@ -0,0 +1,117 @@
+"""
+Delta sync for offline-capable clients.
+
+A client sends back the opaque cursor from its previous sync and receives only
+the documents, personal details and progress changed since then, plus the ids
+of documents deleted in the meantime. Without a usable cursor it receives a
+full snapshot.
+
+Every synced row carries a per-user ``sync_version`` (see
+``models.next_sync_version``) and the cursor records the highest version the
+client has seen.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Document, DocumentTombstone, OnboardingProgress, PersonalDetails
+from .serializers import DocumentListSerializer, OnboardingProgressSerializer, PersonalDetailsSerializer
+
+CURSOR_SALT = 'onboarding.sync'
+
+
+def _tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+
+
+def make_cursor(user, counter, moment):
+    """``counter`` is the user's ``(progress id, sync version)`` pair at the time of the sync"""
+    progress_id, version = counter
+    return signing.dumps(
+        {'u': user.pk, 'p': progress_id, 'v': version, 't': moment.isoformat()},
+        salt=CURSOR_SALT, compress=True,
+    )
+
+
+def read_cursor(user, token, counter):
+    """Return the sync version the cursor has seen, or None when a full sync is required"""
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    if payload.get('u') != user.pk or 'v' not in payload:
+        return None
+    moment = parse_datetime(payload.get('t', ''))
+    # Tombstones older than the retention window are pruned, so older cursors
+    # could miss deletions
+    if moment is None or moment < timezone.now() - _tombstone_retention():
+        return None
+    # A progress row deleted and created again restarts the counter
+    progress_id, version = counter
+    if payload.get('p') not in (None, progress_id) or payload['v'] > version:
+        return None
+    return payload['v']
+
+
+def sync_counter(user):
+    """The user's ``(progress id, sync version)``; ``(None, 0)`` before their first write"""
+    return OnboardingProgress.objects.filter(user=user).values_list('pk', 'sync_version').first() or (None, 0)
+
+
+def build_sync_payload(request, token):
+    """
+    Rows are selected by sync version, not by timestamp. Versions are taken under
+    a per-user lock and committed in order, so every row at or below the counter
+    read here is already visible, however long its transaction took, and the
+    next sync can start right after it.
+    """
+    user = request.user
+    counter = sync_counter(user)
+    since = read_cursor(user, token, counter)
+    full = since is None
+    payload = {
+        'cursor': make_cursor(user, counter, timezone.now()),
+        'full': full,
+        'documents': [],
+        'deleted_documents': [],
+        'personal_details': None,
+        'progress': None,
+    }
+    if since == counter[1]:
+        return payload
+
+    documents = Document.objects.filter(user=user)
+    details = PersonalDetails.objects.filter(user=user)
+    progress = OnboardingProgress.objects.filter(user=user).select_related('user')
+    if not full:
+        # Rows committed after the counter was read may come back again next
+        # time; clients upsert by id, so that is harmless
+        documents = documents.filter(sync_version__gt=since)
+        details = details.filter(sync_version__gt=since)
+        progress = progress.filter(sync_version__gt=since)
+        payload['deleted_documents'] = list(
+            DocumentTombstone.objects.filter(user=user, sync_version__gt=since)
+            .values_list('document_id', flat=True)
+        )
+
+    context = {'request': request}
+    payload['documents'] = DocumentListSerializer(DocumentListSerializer.values(documents), context=context).data
+    details = details.first()
+    if details is not None:
+        payload['personal_details'] = PersonalDetailsSerializer(details, context=context).data
+    progress = progress.first()
+    if progress is not None:
+        payload['progress'] = OnboardingProgressSerializer(progress, context=context).data
+    return payload
+
+
+def prune_tombstones():
+    """Delete tombstones older than the retention window; returns the number removed"""
+    cutoff = timezone.now() - _tombstone_retention()
+    deleted, _ = DocumentTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
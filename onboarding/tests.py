@@ -1,3 +1,1200 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from tavonga_system.instrumentation import query_budget
+
+from .admin_performance import KeysetPaginator
+from .idempotency import prune_idempotency_keys
+from .models import (
+    Document, DocumentTombstone, DocumentType, IdempotencyKey, OnboardingProgress, OnboardingProgressQuerySet,
+    OutboxEvent, PersonalDetails, SearchEntry,
+)
+from .serializers import DocumentListSerializer, DocumentSerializer
+
+User = get_user_model()
+
+
+class OnboardingTestMixin:
+    """Shared fixtures for onboarding API tests"""
+
+    def create_user(self, username, role='worker'):
+        return User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='testpass123',
+            first_name=username.title(),
+            last_name='Tester',
+            role=role,
+        )
+
+    def create_document_type(self, name='police_check', **kwargs):
+        kwargs.setdefault('display_name', name.replace('_', ' ').title())
+        return DocumentType.objects.create(name=name, **kwargs)
+
+    def create_document(self, user, document_type, **kwargs):
+        return Document.objects.create(
+            user=user,
+            document_type=document_type,
+            file=SimpleUploadedFile(f'{document_type.name}.pdf', b'%PDF-1.4'),
+            **kwargs
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class AdminStatsTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = self.create_user('admin', role='admin')
+        self.worker = self.create_user('worker')
+        self.doc_type = self.create_document_type()
+
+    def test_workers_cannot_read_stats(self):
+        response = self.client_for(self.worker).get(reverse('admin-stats'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_stats_are_grouped_and_cached(self):
+        OnboardingProgress.objects.create(user=self.worker, current_stage='admin_review')
+        self.create_document(
+            self.worker, self.doc_type,
+            status='approved',
+            reviewed_at=timezone.now(),
+            expiry_date=date.today() + timedelta(days=90),
+        )
+        client = self.client_for(self.admin)
+
+        response = client.get(reverse('admin-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['workers_by_stage']['admin_review'], 1)
+        self.assertEqual(response.data['documents_by_status']['approved'], 1)
+        self.assertEqual(response.data['expiring_this_week'], 0)
+        self.assertEqual(len(response.data['daily_approvals']), 90)
+        self.assertEqual(response.data['daily_approvals'][-1]['approvals'], 1)
+
+        with self.assertNumQueries(0):
+            client.get(reverse('admin-stats'))
+
+    def test_expiring_this_week_counts_only_valid_documents(self):
+        soon = date.today() + timedelta(days=3)
+        self.create_document(self.worker, self.doc_type, status='approved', expiry_date=soon)
+        other = self.create_user('otherworker')
+        self.create_document(other, self.doc_type, status='rejected', expiry_date=soon)
+        self.create_document(self.create_user('thirdworker'), self.doc_type, expiry_date=soon)
+
+        response = self.client_for(self.admin).get(reverse('admin-stats'))
+        self.assertEqual(response.data['expiring_this_week'], 1)
+
+    def test_document_write_invalidates_stats(self):
+        client = self.client_for(self.admin)
+        self.assertEqual(client.get(reverse('admin-stats')).data['total_documents'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_document(self.worker, self.doc_type)
+
+        self.assertEqual(client.get(reverse('admin-stats')).data['total_documents'], 1)
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class SearchTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.admin = self.create_user('admin', role='admin')
+        self.worker = self.create_user('jordan')
+        self.other = self.create_user('casey')
+        self.doc_type = self.create_document_type()
+        self.document = self.create_document(
+            self.worker, self.doc_type, document_number='NPC-44812', issuing_authority='AFP'
+        )
+
+    def test_search_ranks_workers_and_documents(self):
+        response = self.client_for(self.admin).get(reverse('admin-search'), {'q': 'jord'})
+        self.assertEqual(response.status_code, 200)
+        kinds = {(row['type'], row['id']) for row in response.data['results']}
+        self.assertIn(('worker', self.worker.id), kinds)
+        self.assertIn(('document', self.document.id), kinds)
+        self.assertNotIn(('worker', self.other.id), kinds)
+
+    def test_search_filters_by_type(self):
+        response = self.client_for(self.admin).get(
+            reverse('admin-search'), {'q': 'NPC-44812', 'type': 'document'}
+        )
+        self.assertEqual([row['id'] for row in response.data['results']], [self.document.id])
+
+    def test_index_follows_writes(self):
+        self.worker.last_name = 'Blackwood'
+        self.worker.save()
+        response = self.client_for(self.admin).get(reverse('admin-search'), {'q': 'blackwood'})
+        self.assertEqual(len(response.data['results']), 2)
+
+        self.document.delete()
+        response = self.client_for(self.admin).get(reverse('admin-search'), {'q': 'blackwood'})
+        self.assertEqual([row['type'] for row in response.data['results']], ['worker'])
+
+    def test_workers_cannot_search(self):
+        response = self.client_for(self.worker).get(reverse('admin-search'), {'q': 'casey'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_only_workers_are_indexed(self):
+        self.assertFalse(SearchEntry.objects.filter(kind='worker', object_id=self.admin.pk).exists())
+        self.other.role = 'coordinator'
+        self.other.save()
+        self.assertFalse(SearchEntry.objects.filter(kind='worker', object_id=self.other.pk).exists())
+
+    def test_unrelated_user_saves_skip_reindexing(self):
+        worker = User.objects.get(pk=self.worker.pk)
+        with mock.patch('onboarding.search.reindex_user') as reindex_user:
+            worker.set_password('anotherpass123')
+            worker.save()
+        reindex_user.assert_not_called()
+
+    def test_admin_changelist_keeps_every_match(self):
+        workers = [self.create_user(f'sharedname{index}') for index in range(5)]
+        PersonalDetails.objects.bulk_create([PersonalDetails(user=worker) for worker in workers])
+        # The ranked (and limited) search isn't used for changelists
+        with mock.patch('onboarding.search.search', side_effect=AssertionError):
+            queryset, _ = admin.site._registry[PersonalDetails].get_search_results(
+                None, PersonalDetails.objects.all(), 'sharedname'
+            )
+            self.assertEqual(queryset.count(), 5)
+
+    def test_document_type_rename_reindexes_in_batches(self):
+        def rename(display_name):
+            self.doc_type.display_name = display_name
+            with CaptureQueriesContext(connection) as queries:
+                self.doc_type.save()
+            return len(queries)
+
+        few = rename('National Police Check')
+        for index in range(4):
+            self.create_document(self.create_user(f'checked{index}'), self.doc_type)
+        self.assertEqual(rename('Federal Police Check'), few)
+        response = self.client_for(self.admin).get(reverse('admin-search'), {'q': 'federal', 'type': 'document'})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_user_changelist_finds_every_role(self):
+        superuser = User.objects.create_superuser('root', 'root@example.com', 'testpass123')
+        self.client.force_login(superuser)
+        response = self.client.get(reverse('admin:users_user_changelist'), {'q': self.admin.username})
+        self.assertEqual(list(response.context['cl'].result_list), [self.admin])
+
+    def test_admin_changelist_uses_index(self):
+        superuser = User.objects.create_superuser('root', 'root@example.com', 'testpass123')
+        self.client.force_login(superuser)
+        response = self.client.get(reverse('admin:onboarding_document_changelist'), {'q': 'NPC-44812'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [self.document])
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media', ADMIN_PERFORMANCE_MODE=True)
+class AdminPerformanceModeTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doc_types = [self.create_document_type(f'type_{index}') for index in range(5)]
+        worker = self.create_user('worker')
+        for doc_type in self.doc_types:
+            self.create_document(worker, doc_type)
+        self.superuser = User.objects.create_superuser('root', 'root@example.com', 'testpass123')
+
+    def test_keyset_pages_match_offset_pages(self):
+        queryset = Document.objects.order_by('-uploaded_at', '-pk')
+        expected = list(queryset)
+        paginator = KeysetPaginator(queryset, 2)
+        self.assertEqual(paginator.keyset_field, '-uploaded_at')
+
+        pages = [list(paginator.page(number).object_list) for number in paginator.page_range]
+        self.assertEqual(sum(pages, []), expected)
+
+        # Walking forward again seeks from the cached boundary row
+        with self.assertNumQueries(1):
+            self.assertEqual(list(paginator.page(3).object_list), expected[4:])
+
+    def test_changelist_caches_date_hierarchy(self):
+        self.client.force_login(self.superuser)
+        url = reverse('admin:onboarding_document_changelist')
+        first = self._count_queries(url)
+        second = self._count_queries(url)
+        self.assertLess(second, first)
+
+    def test_expiry_status_filter(self):
+        Document.objects.filter(document_type=self.doc_types[0]).update(expiry_date=date.today() - timedelta(days=1))
+        Document.objects.filter(document_type=self.doc_types[1]).update(expiry_date=date.today() + timedelta(days=10))
+        self.client.force_login(self.superuser)
+        url = reverse('admin:onboarding_document_changelist')
+        for value, expected in [('expired', 1), ('expiring_soon', 1), ('none', 3), ('valid', 0)]:
+            response = self.client.get(url, {'expiry_status': value})
+            self.assertEqual(response.context['cl'].result_count, expected, value)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(context.captured_queries)
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class DocumentListSerializerTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.reviewer = self.create_user('reviewer', role='admin')
+        worker = self.create_user('worker')
+        today = date.today()
+        self.create_document(worker, self.create_document_type('police_check'))
+        self.create_document(
+            worker, self.create_document_type('first_aid'),
+            status='approved', reviewed_by=self.reviewer, reviewed_at=timezone.now(),
+            issue_date=today - timedelta(days=300), expiry_date=today + timedelta(days=12),
+            document_number='FA 001', issuing_authority='St John', notes='Looks good',
+        )
+        self.create_document(
+            worker, self.create_document_type('yellow_card'),
+            expiry_date=today - timedelta(days=3), original_filename='carte jaune é.pdf',
+        )
+        self.queryset = Document.objects.order_by('id')
+
+    def render_both(self, request=None):
+        context = {'request': request} if request else {}
+        expected = JSONRenderer().render(DocumentSerializer(self.queryset, many=True, context=context).data)
+        actual = JSONRenderer().render(
+            DocumentListSerializer(DocumentListSerializer.values(self.queryset), context=context).data
+        )
+        return expected, actual
+
+    def test_output_matches_model_serializer(self):
+        request = Request(APIRequestFactory().get('/api/onboarding/documents/'))
+        expected, actual = self.render_both(request)
+        self.assertEqual(actual, expected)
+
+    def test_output_matches_without_request(self):
+        expected, actual = self.render_both()
+        self.assertEqual(actual, expected)
+
+    @override_settings(MEDIA_URL='/media/')
+    def test_output_matches_with_media_url(self):
+        request = Request(APIRequestFactory().get('/api/onboarding/documents/', HTTP_HOST='api.example.com'))
+        expected, actual = self.render_both(request)
+        self.assertEqual(actual, expected)
+
+    def test_pending_documents_use_single_query(self):
+        client = self.client_for(self.reviewer)
+        with self.assertNumQueries(1):
+            response = client.get(reverse('pending-documents'))
+        self.assertEqual(len(response.data), 1)
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class ConditionalGetTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.worker = self.create_user('worker')
+        self.doc_type = self.create_document_type()
+        self.client = self.client_for(self.worker)
+
+    def test_unchanged_poll_returns_304_with_one_query(self):
+        for name in ['onboarding-dashboard', 'onboarding-progress', 'documents', 'document-types']:
+            first = self.client.get(reverse(name))
+            self.assertEqual(first.status_code, 200, name)
+            self.assertIn('ETag', first)
+
+            with self.assertNumQueries(1):
+                second = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(second.status_code, 304, name)
+            self.assertEqual(second.content, b'')
+            self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_write_changes_etag(self):
+        first = self.client.get(reverse('documents'))
+        self.create_document(self.worker, self.doc_type)
+        second = self.client.get(reverse('documents'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+    def test_delete_changes_etag(self):
+        document = self.create_document(self.worker, self.doc_type)
+        first = self.client.get(reverse('onboarding-dashboard'))
+        self.client.delete(reverse('document-detail', args=[document.pk]))
+        second = self.client.get(reverse('onboarding-dashboard'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['documents'], [])
+
+    def test_deleting_newest_document_is_not_hidden_by_if_modified_since(self):
+        self.create_document(self.worker, self.doc_type)
+        newest = self.create_document(self.worker, self.create_document_type('police'))
+        first = self.client.get(reverse('onboarding-dashboard'))
+        self.assertNotIn('Last-Modified', first)
+        self.client.delete(reverse('document-detail', args=[newest.pk]))
+        second = self.client.get(reverse('onboarding-dashboard'), HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(second.data['documents']), 1)
+
+    def test_etags_are_per_user(self):
+        first = self.client.get(reverse('onboarding-dashboard'))
+        other = self.client_for(self.create_user('other'))
+        response = other.get(reverse('onboarding-dashboard'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class DeltaSyncTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.worker = self.create_user('worker')
+        self.doc_type = self.create_document_type()
+        self.client = self.client_for(self.worker)
+
+    def test_full_then_incremental_sync(self):
+        document = self.create_document(self.worker, self.doc_type)
+        first = self.client.get(reverse('onboarding-sync'))
+        self.assertTrue(first.data['full'])
+        self.assertEqual([row['id'] for row in first.data['documents']], [document.id])
+
+        self.client.delete(reverse('document-detail', args=[document.pk]))
+        second = self.client.get(reverse('onboarding-sync'), {'since': first.data['cursor']})
+        self.assertFalse(second.data['full'])
+        self.assertEqual(second.data['deleted_documents'], [document.id])
+        self.assertEqual(second.data['documents'], [])
+        self.assertIsNotNone(second.data['progress'])
+
+    def test_no_change_sync_is_one_query(self):
+        cursor = self.client.get(reverse('onboarding-sync')).data['cursor']
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('onboarding-sync'), {'since': cursor})
+        self.assertEqual(response.data['documents'], [])
+        self.assertIsNone(response.data['progress'])
+
+    def test_rows_with_old_timestamps_are_still_sent(self):
+        # e.g. a slow upload committing long after its updated_at was set
+        cursor = self.client.get(reverse('onboarding-sync')).data['cursor']
+        document = self.create_document(self.worker, self.doc_type)
+        Document.objects.filter(pk=document.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        response = self.client.get(reverse('onboarding-sync'), {'since': cursor})
+        self.assertFalse(response.data['full'])
+        self.assertEqual([row['id'] for row in response.data['documents']], [document.id])
+
+    def test_versions_increase_per_user(self):
+        document = self.create_document(self.worker, self.doc_type)
+        details = PersonalDetails.objects.create(user=self.worker)
+        document.notes = 'Checked'
+        document.save(update_fields=['notes'])
+        document.refresh_from_db()
+        self.assertLess(details.sync_version, document.sync_version)
+        self.assertEqual(OnboardingProgress.objects.get(user=self.worker).sync_version, document.sync_version)
+
+    def test_recreated_progress_forces_full_sync(self):
+        self.create_document(self.worker, self.doc_type)
+        cursor = self.client.get(reverse('onboarding-sync')).data['cursor']
+        OnboardingProgress.objects.filter(user=self.worker).delete()
+        self.create_document(self.worker, self.create_document_type(name='wwcc'))
+        self.assertTrue(self.client.get(reverse('onboarding-sync'), {'since': cursor}).data['full'])
+
+    def test_foreign_or_invalid_cursor_forces_full_sync(self):
+        other = self.client_for(self.create_user('other'))
+        cursor = other.get(reverse('onboarding-sync')).data['cursor']
+        for since in [cursor, 'not-a-cursor']:
+            self.assertTrue(self.client.get(reverse('onboarding-sync'), {'since': since}).data['full'])
+
+    def test_deleting_user_leaves_no_tombstones(self):
+        self.create_document(self.worker, self.doc_type)
+        self.worker.delete()
+        self.assertFalse(DocumentTombstone.objects.exists())
+
+    def test_deleting_document_type_tombstones_its_documents(self):
+        document = self.create_document(self.worker, self.doc_type)
+        cursor = self.client.get(reverse('onboarding-sync')).data['cursor']
+        self.doc_type.delete()
+        response = self.client.get(reverse('onboarding-sync'), {'since': cursor})
+        self.assertFalse(response.data['full'])
+        self.assertEqual(response.data['deleted_documents'], [document.pk])
+
+
+@override_settings(
+    MEDIA_ROOT='/tmp/agnovat-test-media',
+    SSE_POLL_SECONDS=0.01,
+    SSE_MAX_STREAM_SECONDS=0.05,
+)
+class OutboxEventTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.admin = self.create_user('admin', role='admin')
+        self.worker = self.create_user('worker')
+        self.doc_type = self.create_document_type()
+
+    def upload(self):
+        return self.client_for(self.worker).post(reverse('upload-document'), {
+            'document_type': self.doc_type.pk,
+            'file': SimpleUploadedFile('check.pdf', b'%PDF-1.4'),
+        }, format='multipart')
+
+    def test_upload_and_review_write_events(self):
+        document_id = self.upload().data['id']
+        self.client_for(self.admin).patch(
+            reverse('admin-document-review', args=[document_id]), {'status': 'approved'}, format='json'
+        )
+        document_events = list(
+            OutboxEvent.objects.filter(event_type__startswith='document.').values_list('event_type', 'payload__status')
+        )
+        self.assertEqual(document_events, [('document.uploaded', 'pending'), ('document.reviewed', 'approved')])
+        self.assertTrue(OutboxEvent.objects.filter(event_type='progress.updated').exists())
+
+    def test_stream_resumes_from_last_event_id(self):
+        self.upload()
+        first, *rest = OutboxEvent.objects.order_by('id')
+        token = str(RefreshToken.for_user(self.admin).access_token)
+
+        response = self.client.get(
+            reverse('admin-event-stream'),
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+            HTTP_LAST_EVENT_ID=str(first.pk),
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = self.collect(response).decode()
+        self.assertNotIn(f'id: {first.pk}\n', body)
+        for event in rest:
+            self.assertIn(f'id: {event.pk}\nevent: {event.event_type}\n', body)
+
+    def collect(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_late_committed_event_is_sent_after_higher_ids(self):
+        document_id = self.upload().data['id']
+        self.client_for(self.admin).patch(
+            reverse('admin-document-review', args=[document_id]), {'status': 'approved'}, format='json'
+        )
+        first, late, *rest = OutboxEvent.objects.order_by('id')
+        late_fields = {'pk': late.pk, 'event_type': late.event_type, 'user_id': late.user_id, 'payload': late.payload}
+        # Not committed yet when the stream first polls
+        late.delete()
+        token = str(RefreshToken.for_user(self.admin).access_token)
+
+        response = self.client.get(
+            reverse('admin-event-stream'), HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_LAST_EVENT_ID=str(first.pk),
+        )
+        body = self.collect(response).decode()
+        self.assertNotIn(f'"id":{late_fields["pk"]},', body)
+        position = body.split('id: ')[-1].split('\n')[0]
+        self.assertEqual(position, f'{rest[-1].pk}:{late_fields["pk"]}')
+
+        OutboxEvent.objects.create(**late_fields)
+        response = self.client.get(
+            reverse('admin-event-stream'), HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_LAST_EVENT_ID=position,
+        )
+        body = self.collect(response).decode()
+        self.assertIn(f'id: {rest[-1].pk}\nevent: {late.event_type}\n', body)
+
+    @override_settings(SSE_MAX_SYNC_STREAMS=1)
+    def test_wsgi_streams_are_capped_per_process(self):
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.admin).access_token}'}
+        first = self.client.get(reverse('admin-event-stream'), **auth)
+        self.assertFalse(first.is_async)
+        refused = self.client.get(reverse('admin-event-stream'), **auth)
+        self.assertEqual(refused.status_code, 503)
+        self.assertIn('Retry-After', refused)
+
+        self.collect(first)
+        self.assertEqual(self.client.get(reverse('admin-event-stream'), **auth).status_code, 200)
+
+    def test_asgi_stream_is_async(self):
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        response = async_to_sync(self.async_client.get)(
+            reverse('admin-event-stream'), headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertTrue(response.is_async)
+
+        async def collect():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        self.assertIn(b'retry: ', async_to_sync(collect)())
+
+    def test_stream_requires_admin_token(self):
+        self.assertEqual(self.client.get(reverse('admin-event-stream')).status_code, 401)
+        token = str(RefreshToken.for_user(self.worker).access_token)
+        response = self.client.get(reverse('admin-event-stream'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 403)
+
+    def test_stream_ticket_replaces_query_access_token(self):
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        self.assertEqual(self.client.get(reverse('admin-event-stream'), {'access_token': token}).status_code, 401)
+        self.assertEqual(self.client_for(self.worker).post(reverse('admin-event-stream-ticket')).status_code, 403)
+
+        ticket = self.client_for(self.admin).post(reverse('admin-event-stream-ticket')).data['ticket']
+        response = self.client.get(reverse('admin-event-stream'), {'ticket': ticket})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.collect(response)
+        with override_settings(SSE_TICKET_MAX_AGE_SECONDS=-1):
+            self.assertEqual(self.client.get(reverse('admin-event-stream'), {'ticket': ticket}).status_code, 401)
+
+    def test_scheduled_expiry_writes_expired_event(self):
+        document = self.create_document(
+            self.worker, self.doc_type, status='approved', expiry_date=date.today() + timedelta(days=90),
+        )
+        Document.objects.filter(pk=document.pk).update(expiry_date=date.today() - timedelta(days=1))
+        out = StringIO()
+        call_command('refresh_document_expiry', stdout=out)
+        self.assertIn('Updated 1 document statuses', out.getvalue())
+        document.refresh_from_db()
+        self.assertEqual(document.status, 'expired')
+        self.assertTrue(OutboxEvent.objects.filter(event_type='document.expired', payload__document_id=document.pk).exists())
+        self.assertEqual(Document.objects.refresh_expiry_statuses(), 0)
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class AsyncViewTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.admin = self.create_user('admin', role='admin')
+        self.worker = self.create_user('worker')
+        self.create_document(self.worker, self.create_document_type('Police Check'))
+        self.create_document_type('First Aid')
+        token = str(RefreshToken.for_user(self.worker).access_token)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def test_dashboard_matches_sync_view(self):
+        expected = self.client_for(self.worker).get(reverse('onboarding-dashboard')).json()
+        response = self.client.get(reverse('onboarding-dashboard-async'), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected)
+
+        cached = self.client.get(reverse('onboarding-dashboard-async'), HTTP_IF_NONE_MATCH=response['ETag'], **self.auth)
+        self.assertEqual(cached.status_code, 304)
+
+    def test_progress_matches_sync_view(self):
+        response = self.client.get(reverse('onboarding-progress-async'), **self.auth).json()
+        expected = self.client_for(self.worker).get(reverse('onboarding-progress')).json()
+        # Both views read through current_for; whichever runs first may
+        # refresh the row, so updated_at is left out of the comparison
+        response.pop('updated_at')
+        expected.pop('updated_at')
+        self.assertEqual(response, expected)
+
+    def test_user_detail_requires_admin(self):
+        url = reverse('user-onboarding-detail-async', args=[self.worker.pk])
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 403)
+
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(len(response.json()['documents']), 1)
+        missing = self.client.get(reverse('user-onboarding-detail-async', args=[0]), HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(missing.status_code, 404)
+
+    def test_errors_match_sync_views(self):
+        for name in ['onboarding-progress', 'onboarding-dashboard']:
+            sync, asynchronous = self.client.get(reverse(name)), self.client.get(reverse(f'{name}-async'))
+            self.assertEqual((asynchronous.status_code, asynchronous.json()), (sync.status_code, sync.json()))
+            self.assertEqual(asynchronous['WWW-Authenticate'], sync['WWW-Authenticate'])
+
+        response = self.client.post(reverse('onboarding-progress-async'), **self.auth)
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response.json(), {'detail': 'Method "POST" not allowed.'})
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class SeedScaleDataTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.create_document_type('police_check')
+        self.create_document_type('first_aid')
+        self.create_document_type('resume', is_required=False, has_expiry=False)
+
+    def seed(self, **options):
+        call_command('seed_scale_data', workers=60, batch_size=25, no_files=True, stdout=StringIO(), **options)
+        return sorted(Document.objects.values_list('user__username', 'document_type__name', 'status', 'expiry_date'))
+
+    def test_same_seed_gives_same_data(self):
+        first = self.seed(seed=3)
+        self.assertEqual(self.seed(seed=3, clear=True), first)
+        self.assertNotEqual(self.seed(seed=4, clear=True), first)
+
+    def test_progress_matches_recalculation(self):
+        self.seed()
+        self.assertEqual(OnboardingProgress.objects.filter(user__username__startswith='scale-').count(), 60)
+        for progress in OnboardingProgress.objects.select_related('user')[:20]:
+            seeded = (progress.current_stage, progress.completion_percentage)
+            progress.recalculate()
+            self.assertEqual((progress.current_stage, progress.completion_percentage), seeded)
+
+    def test_workers_share_one_password_hash(self):
+        self.seed()
+        workers = User.objects.filter(username__startswith='scale-')
+        self.assertEqual(workers.values('password').distinct().count(), 1)
+        self.assertTrue(workers.first().check_password('scale123'))
+
+    def test_refuses_to_seed_twice_without_clear(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    def test_writes_placeholder_files(self):
+        call_command('seed_scale_data', workers=5, file_workers=2, stdout=StringIO())
+        document = Document.objects.first()
+        self.assertTrue(document.file.storage.exists(document.file.name))
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class QueryBudgetTests(OnboardingTestMixin, TestCase):
+    """
+    Every route, with each of its write methods, runs the same number of queries
+    with one document and one worker as with 50 documents and 500 workers, and
+    stays within its entry in ``REQUEST_QUERY_BUDGETS``. A per-row query (an N+1)
+    fails both checks.
+    """
+    LARGE_DOCUMENTS = 50
+    LARGE_WORKERS = 500
+
+    def setUp(self):
+        self.admin = self.create_user('budgetadmin', role='admin')
+        self.worker = self.create_user('budgetworker')
+        self.document_type = self.create_document_type('police_check', has_expiry=True)
+        # Upload and review both run in every pass, leaving this document as it started
+        self.create_document(
+            self.worker, self.document_type, expiry_date=date.today() + timedelta(days=60),
+            status='approved', reviewed_by=self.admin, reviewed_at=timezone.now(),
+        )
+        self.create_personal_details(self.worker)
+        OnboardingProgress.objects.refresh_for(self.worker)
+        # Uploaded through documents/ and deleted again in every pass
+        self.extra_type = self.create_document_type('first_aid', is_required=False)
+        # A worker's first upload (no progress row yet), with a key as mobile
+        # clients send; deleted again in every pass
+        self.keyed_type = self.create_document_type('wwcc', is_required=False)
+
+    def personal_details_payload(self):
+        return {
+            'date_of_birth': '1990-01-01', 'phone_number': '0400000000',
+            'address_line1': '1 Example Street', 'suburb': 'Fitzroy', 'state': 'VIC', 'postcode': '3065',
+            'emergency_contact_name': 'Contact', 'emergency_contact_phone': '0400000001',
+        }
+
+    def create_personal_details(self, user):
+        return PersonalDetails.objects.create(user=user, **self.personal_details_payload())
+
+    def grow(self):
+        """Scale the fixtures up to the large case"""
+        from .search import rebuild_index
+        reviewers = User.objects.bulk_create([
+            User(username=f'reviewer{index}', email=f'reviewer{index}@example.com', role='admin',
+                 first_name='Reviewer', last_name=str(index))
+            for index in range(5)
+        ])
+        types = DocumentType.objects.bulk_create([
+            DocumentType(name=f'type_{index}', display_name=f'Type {index}', is_required=index % 2 == 0)
+            for index in range(self.LARGE_DOCUMENTS - 1)
+        ])
+        now = timezone.now()
+        Document.objects.bulk_create([
+            # All approved, so the worker's stage moves exactly as in the small case
+            Document(
+                user=self.worker, document_type=doc_type, file=f'documents/budget/{index}.pdf',
+                status='approved', reviewed_by=reviewers[index % len(reviewers)], reviewed_at=now,
+                expiry_date=date.today() + timedelta(days=index),
+            )
+            for index, doc_type in enumerate(types)
+        ])
+        workers = User.objects.bulk_create([
+            User(username=f'worker{index}', email=f'worker{index}@example.com', role='worker',
+                 first_name='Worker', last_name=str(index))
+            for index in range(self.LARGE_WORKERS - 1)
+        ])
+        OnboardingProgress.objects.bulk_create([OnboardingProgress(user=worker) for worker in workers])
+        Document.objects.bulk_create([
+            Document(
+                user=worker, document_type=self.document_type, file=f'documents/budget/w{index}.pdf',
+                status='approved' if index % 2 else 'pending',
+                reviewed_by=reviewers[index % len(reviewers)] if index % 2 else None,
+                reviewed_at=now if index % 2 else None,
+                expiry_date=date.today() + timedelta(days=index % 40),
+            )
+            for index, worker in enumerate(workers)
+        ])
+        rebuild_index()
+
+    def client_with_token(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def route_calls(self):
+        # admin-event-stream is an open-ended SSE response and is left out
+        worker, admin = self.client_with_token(self.worker), self.client_with_token(self.admin)
+        detail = {'user_id': self.worker.pk}
+        return [
+            ('personal-details', lambda: worker.get(reverse('personal-details'))),
+            ('personal-details', lambda: worker.patch(reverse('personal-details'), {'suburb': 'Carlton'}, format='json')),
+            ('personal-details', lambda: worker.put(reverse('personal-details'), self.personal_details_payload(), format='json')),
+            ('onboarding-dashboard', lambda: worker.get(reverse('onboarding-dashboard'))),
+            ('onboarding-dashboard-async', lambda: worker.get(reverse('onboarding-dashboard-async'))),
+            ('onboarding-progress', lambda: worker.get(reverse('onboarding-progress'))),
+            ('onboarding-progress-async', lambda: worker.get(reverse('onboarding-progress-async'))),
+            ('onboarding-sync', lambda: worker.get(reverse('onboarding-sync'))),
+            ('document-types', lambda: worker.get(reverse('document-types'))),
+            ('documents', lambda: worker.get(reverse('documents'))),
+            ('documents', lambda: worker.post(reverse('documents'), {
+                'document_type': self.extra_type.pk,
+                'file': SimpleUploadedFile('first_aid.pdf', b'%PDF-1.4', content_type='application/pdf'),
+            }, format='multipart')),
+            ('document-detail', lambda: worker.get(reverse('document-detail', args=[self.uploaded_document().pk]))),
+            ('document-detail', lambda: worker.patch(
+                reverse('document-detail', args=[self.uploaded_document().pk]), {'document_number': 'PC-1'}, format='json'
+            )),
+            ('document-detail', lambda: worker.delete(
+                reverse('document-detail', args=[self.uploaded_document(self.extra_type).pk])
+            )),
+            ('upload-document', lambda: worker.post(reverse('upload-document'), {
+                'document_type': self.document_type.pk,
+                'file': SimpleUploadedFile('police_check.pdf', b'%PDF-1.4', content_type='application/pdf'),
+            }, format='multipart', HTTP_IDEMPOTENCY_KEY=str(uuid4()))),
+            ('upload-document', lambda: worker.post(reverse('upload-document'), {
+                'document_type': self.keyed_type.pk,
+                'file': SimpleUploadedFile('wwcc.pdf', b'%PDF-1.4', content_type='application/pdf'),
+            }, format='multipart', HTTP_IDEMPOTENCY_KEY=str(uuid4())),
+             lambda: OnboardingProgress.objects.filter(user=self.worker).delete()),
+            ('document-detail', lambda: worker.delete(
+                reverse('document-detail', args=[self.uploaded_document(self.keyed_type).pk])
+            )),
+            # Without a key the view runs directly; the budget covers both
+            ('upload-document', lambda: worker.post(reverse('upload-document'), {
+                'document_type': self.document_type.pk,
+                'file': SimpleUploadedFile('police_check.pdf', b'%PDF-1.4', content_type='application/pdf'),
+            }, format='multipart')),
+            ('admin-onboarding-list', lambda: admin.get(reverse('admin-onboarding-list'))),
+            ('admin-onboarding-list', lambda: admin.get(reverse('admin-onboarding-list'), {
+                'status': 'admin_review,completed', 'min_completion': 0, 'ordering': '-completion_percentage',
+                'include': 'documents',
+            })),
+            ('admin-document-review', lambda: admin.patch(
+                reverse('admin-document-review', args=[self.uploaded_document().pk]), {'status': 'approved'},
+                format='json', HTTP_IDEMPOTENCY_KEY=str(uuid4()),
+            )),
+            ('pending-documents', lambda: admin.get(reverse('pending-documents'))),
+            ('expiring-documents', lambda: admin.get(reverse('expiring-documents'))),
+            ('admin-search', lambda: admin.get(reverse('admin-search'), {'q': 'tester'})),
+            ('admin-stats', lambda: admin.get(reverse('admin-stats'))),
+            ('user-onboarding-detail', lambda: admin.get(reverse('user-onboarding-detail', kwargs=detail))),
+            ('user-onboarding-detail-async', lambda: admin.get(reverse('user-onboarding-detail-async', kwargs=detail))),
+        ]
+
+    def uploaded_document(self, document_type=None):
+        # Replaced by every upload, so look it up each time
+        return Document.objects.get(user=self.worker, document_type=document_type or self.document_type)
+
+    def measure(self):
+        counts = {}
+        for index, (route, call, *prepare) in enumerate(self.route_calls()):
+            for step in prepare:
+                step()
+            # Start cold: cached stats or ETags would hide the queries
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = call()
+            method = response.request['REQUEST_METHOD']
+            self.assertLess(response.status_code, 400, f'{method} {route}: {response.status_code}')
+            counts[f'{method} {route}#{index}'] = len(queries)
+        return counts
+
+    def test_routes_run_constant_queries_within_budget(self):
+        # The first pass creates rows later passes only update
+        self.measure()
+        small = self.measure()
+        self.grow()
+        large = self.measure()
+        for key, count in large.items():
+            method, route = key.split('#')[0].split(' ')
+            with self.subTest(route=route, method=method):
+                self.assertEqual(count, small[key], f'{method} {route} scales with data: {small[key]} -> {count} queries')
+                budget = query_budget(route, method)
+                self.assertIsNotNone(budget, f'{method} {route} has no query budget')
+                self.assertLessEqual(count, budget)
+
+
+class AdminRosterTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.coordinator = self.create_user('coordinator', role='coordinator')
+        self.police = self.create_document_type('police_check')
+        self.first_aid = self.create_document_type('first_aid')
+        self.workers = {}
+        for name, stage, completion in [('ana', 'admin_review', 40), ('ben', 'rejected', 20), ('cy', 'completed', 100)]:
+            worker = self.create_user(name)
+            OnboardingProgress.objects.create(user=worker, current_stage=stage, completion_percentage=completion)
+            self.workers[name] = worker
+        self.create_document(self.workers['ana'], self.police)
+        self.create_document(self.workers['ana'], self.first_aid, status='approved')
+        self.client = self.client_for(self.coordinator)
+
+    def roster(self, **params):
+        response = self.client.get(reverse('admin-onboarding-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_filters_by_several_stages(self):
+        rows = self.roster(status='admin_review,rejected')
+        self.assertEqual({row['user_email'] for row in rows}, {'ana@example.com', 'ben@example.com'})
+        self.assertEqual(len(self.roster(status=['admin_review', 'completed'])), 2)
+
+    def test_completion_range_and_ordering(self):
+        rows = self.roster(min_completion=20, max_completion=40, ordering='-completion_percentage')
+        self.assertEqual([row['completion_percentage'] for row in rows], [40, 20])
+        rows = self.roster(ordering='completion_percentage')
+        self.assertEqual([row['user_name'] for row in rows], ['Ben Tester', 'Ana Tester', 'Cy Tester'])
+
+    def test_document_summary_is_opt_in(self):
+        self.assertNotIn('document_summary', self.roster()[0])
+        rows = {row['user_email']: row for row in self.roster(include='documents')}
+        self.assertEqual(rows['ana@example.com']['document_summary']['total'], 2)
+        self.assertEqual(rows['ana@example.com']['document_summary']['pending'], 1)
+        self.assertEqual(rows['ana@example.com']['document_summary']['approved'], 1)
+        self.assertEqual(rows['cy@example.com']['document_summary']['total'], 0)
+
+    def test_rejects_invalid_parameters(self):
+        url = reverse('admin-onboarding-list')
+        self.assertEqual(self.client.get(url, {'status': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'min_completion': '101'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ordering': 'password'}).status_code, 400)
+
+    def test_workers_get_an_empty_roster(self):
+        response = self.client_for(self.workers['ana']).get(reverse('admin-onboarding-list'), {'status': 'bogus'})
+        self.assertEqual(response.json()['results'], [])
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class DocumentExpiryFilterTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.worker = self.create_user('expiring')
+        self.admin = self.create_user('expiryadmin', role='admin')
+        today = date.today()
+        self.documents = {}
+        for name, days, status in [
+            ('police_check', -5, 'approved'), ('first_aid', 3, 'approved'),
+            ('cpr_certificate', 20, 'pending'), ('resume', None, 'pending'),
+        ]:
+            document_type = self.create_document_type(name)
+            expiry_date = today + timedelta(days=days) if days is not None else None
+            self.documents[name] = self.create_document(self.worker, document_type, expiry_date=expiry_date, status=status)
+
+    def test_annotations_match_properties(self):
+        for document in Document.objects.with_expiry():
+            self.assertEqual(document.days_to_expiry, document.days_until_expiry)
+            self.assertEqual(document.has_expired, document.is_expired)
+            self.assertEqual(document.expires_soon, document.is_expiring_soon)
+
+    def list_names(self, url_name='documents', client=None, **params):
+        response = (client or self.client_for(self.worker)).get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        rows = body['results'] if isinstance(body, dict) else body
+        return [row['original_filename'].removesuffix('.pdf') for row in rows]
+
+    def test_filters(self):
+        self.assertEqual(set(self.list_names(status='pending')), {'cpr_certificate', 'resume'})
+        first_aid = self.documents['first_aid'].document_type
+        self.assertEqual(self.list_names(document_type=f'{first_aid.pk},resume'), ['resume', 'first_aid'])
+        self.assertEqual(set(self.list_names(expires_within=20)), {'first_aid', 'cpr_certificate'})
+        self.assertEqual(self.list_names(expired='true'), ['police_check'])
+        self.assertNotIn('police_check', self.list_names(expired='false'))
+
+    def test_ordering_by_days_until_expiry(self):
+        self.assertEqual(
+            self.list_names(ordering='days_until_expiry'),
+            ['police_check', 'first_aid', 'cpr_certificate', 'resume'],
+        )
+        self.assertEqual(self.list_names(ordering='-days_until_expiry')[0], 'cpr_certificate')
+
+    def test_admin_endpoints_accept_filters(self):
+        admin = self.client_for(self.admin)
+        self.assertEqual(self.list_names('pending-documents', admin, expires_within=30), ['cpr_certificate'])
+        self.assertEqual(self.list_names('expiring-documents', admin), ['police_check', 'first_aid'])
+        self.assertEqual(self.list_names('expiring-documents', admin, expired='false'), ['first_aid'])
+
+    def test_rejects_invalid_parameters(self):
+        client = self.client_for(self.worker)
+        invalid = [
+            {'status': 'lost'}, {'expires_within': 'soon'}, {'expires_within': '²'},
+            {'expired': 'maybe'}, {'ordering': 'file'},
+        ]
+        for params in invalid:
+            self.assertEqual(client.get(reverse('documents'), params).status_code, 400, params)
+
+    def test_superscript_document_type_is_treated_as_a_name(self):
+        self.assertEqual(self.list_names(document_type='²'), [])
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class DocumentReplacementTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.worker = self.create_user('replacer')
+        self.admin = self.create_user('replaceadmin', role='admin')
+        self.document_type = self.create_document_type('police_check')
+        self.document = self.create_document(
+            self.worker, self.document_type, status='approved', notes='Looks good',
+            reviewed_by=self.admin, reviewed_at=timezone.now(), document_number='OLD-1',
+        )
+        self.old_file = self.document.file.name
+
+    def upload(self, url_name='upload-document', **extra):
+        return self.client_for(self.worker).post(reverse(url_name), {
+            'document_type': self.document_type.pk,
+            'file': SimpleUploadedFile('renewed.pdf', b'%PDF-1.4 renewed', content_type='application/pdf'),
+            **extra,
+        }, format='multipart')
+
+    def test_reupload_updates_the_row_in_place(self):
+        storage = self.document.file.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload(document_number='NEW-2')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['id'], self.document.pk)
+
+        document = Document.objects.get()
+        self.assertEqual(
+            (document.status, document.notes, document.reviewed_by, document.reviewed_at),
+            ('pending', None, None, None),
+        )
+        self.assertEqual((document.original_filename, document.document_number), ('renewed.pdf', 'NEW-2'))
+        self.assertGreater(document.uploaded_at, self.document.uploaded_at)
+        self.assertTrue(storage.exists(document.file.name))
+        self.assertFalse(storage.exists(self.old_file))
+        self.assertFalse(DocumentTombstone.objects.exists())
+        self.assertTrue(OutboxEvent.objects.filter(event_type='document.uploaded', payload__document_id=self.document.pk).exists())
+
+    def test_documents_endpoint_replaces_too(self):
+        response = self.upload('documents')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Document.objects.get().pk, self.document.pk)
+
+    def test_old_file_survives_a_rolled_back_upload(self):
+        with mock.patch.object(OnboardingProgress, 'recalculate', side_effect=RuntimeError):
+            with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+                self.upload()
+        self.assertTrue(self.document.file.storage.exists(self.old_file))
+        self.assertEqual(Document.objects.get().status, 'approved')
+
+    def test_concurrent_insert_falls_back_to_replacing(self):
+        # Simulate losing the race: the row appears between the lookup and the insert
+        with mock.patch('django.db.models.query.QuerySet.first', return_value=None):
+            document, created = Document.objects.replace_or_create(
+                self.worker, self.document_type, SimpleUploadedFile('late.pdf', b'%PDF-1.4')
+            )
+        self.assertFalse(created)
+        self.assertEqual(document.pk, self.document.pk)
+        self.assertEqual(Document.objects.get().original_filename, 'late.pdf')
+
+
+class ProgressRefreshTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.worker = self.create_user('refresher')
+        self.document_type = self.create_document_type('police_check', is_required=True)
+
+    def test_creates_progress_once(self):
+        progress = OnboardingProgress.objects.refresh_for(self.worker)
+        self.assertEqual(OnboardingProgress.objects.get(), progress)
+        self.assertEqual(progress.current_stage, 'personal_details')
+
+    def test_saves_only_changed_columns(self):
+        progress = OnboardingProgress.objects.refresh_for(self.worker)
+        # A stale percentage, and a note written by someone else meanwhile
+        OnboardingProgress.objects.filter(pk=progress.pk).update(completion_percentage=99, admin_notes='Set elsewhere')
+
+        with CaptureQueriesContext(connection) as queries:
+            refreshed = OnboardingProgress.objects.refresh_for(self.worker)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"completion_percentage"', updates[0])
+        self.assertNotIn('"current_stage"', updates[0])
+        self.assertNotIn('"admin_notes"', updates[0])
+        stored = OnboardingProgress.objects.get()
+        self.assertEqual((stored.completion_percentage, stored.admin_notes), (progress.completion_percentage, 'Set elsewhere'))
+        self.assertEqual(refreshed.completion_percentage, progress.completion_percentage)
+
+    def test_unchanged_progress_is_not_written(self):
+        OnboardingProgress.objects.refresh_for(self.worker)
+        with CaptureQueriesContext(connection) as queries:
+            OnboardingProgress.objects.refresh_for(self.worker)
+        self.assertFalse([query for query in queries if query['sql'].startswith(('UPDATE', 'INSERT'))])
+
+    def test_reads_lock_only_to_write_a_change(self):
+        progress = OnboardingProgress.objects.refresh_for(self.worker)
+        with mock.patch.object(OnboardingProgressQuerySet, 'refresh_for') as refresh:
+            self.assertEqual(OnboardingProgress.objects.current_for(self.worker), progress)
+        refresh.assert_not_called()
+
+        OnboardingProgress.objects.filter(pk=progress.pk).update(completion_percentage=99)
+        self.assertEqual(OnboardingProgress.objects.current_for(self.worker).completion_percentage, progress.completion_percentage)
+        self.assertEqual(OnboardingProgress.objects.get().completion_percentage, progress.completion_percentage)
+
+    def test_concurrent_create_falls_back_to_updating(self):
+        existing = OnboardingProgress.objects.create(user=self.worker)
+        with mock.patch('django.db.models.query.QuerySet.first', return_value=None):
+            progress = OnboardingProgress.objects.refresh_for(self.worker, details_completed=True)
+        self.assertEqual(progress.pk, existing.pk)
+        self.assertIsNotNone(OnboardingProgress.objects.get().personal_details_completed_at)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class ProgressContentionTests(OnboardingTestMixin, TransactionTestCase):
+    """Uploads and reviews for one worker racing each other (needs real row locks, so not SQLite)"""
+    ROUNDS = 5
+
+    def setUp(self):
+        self.worker = self.create_user('contended')
+        self.admin = self.create_user('contendadmin', role='admin')
+        self.document_types = [self.create_document_type(f'type_{index}', is_required=True) for index in range(4)]
+
+    def upload(self, document_type):
+        response = self.client_for(self.worker).post(reverse('upload-document'), {
+            'document_type': document_type.pk,
+            'file': SimpleUploadedFile(f'{document_type.name}.pdf', b'%PDF-1.4', content_type='application/pdf'),
+        }, format='multipart')
+        return response.status_code
+
+    def review(self, document_type):
+        document = Document.objects.filter(user=self.worker, document_type=document_type).first()
+        if document is None:
+            return 404
+        response = self.client_for(self.admin).patch(
+            reverse('admin-document-review', args=[document.pk]), {'status': 'approved'}, format='json'
+        )
+        return response.status_code
+
+    def run_in_threads(self, calls):
+        def run(call):
+            try:
+                return call()
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+            return list(pool.map(run, calls))
+
+    def test_final_progress_matches_a_fresh_recalculation(self):
+        for _ in range(self.ROUNDS):
+            calls = []
+            for document_type in self.document_types:
+                calls.append(lambda document_type=document_type: self.upload(document_type))
+                calls.append(lambda document_type=document_type: self.review(document_type))
+            for status_code in self.run_in_threads(calls):
+                self.assertIn(status_code, (200, 201, 404))
+
+        stored = OnboardingProgress.objects.get(user=self.worker)
+        expected = OnboardingProgress(user=self.worker)
+        expected.recalculate()
+        self.assertEqual(
+            (stored.current_stage, stored.completion_percentage),
+            (expected.current_stage, expected.completion_percentage),
+        )
+        self.assertEqual(OnboardingProgress.objects.filter(user=self.worker).count(), 1)
+
+
+@override_settings(MEDIA_ROOT='/tmp/agnovat-test-media')
+class IdempotencyKeyTests(OnboardingTestMixin, TestCase):
+    def setUp(self):
+        self.worker = self.create_user('retrier')
+        self.admin = self.create_user('retryadmin', role='admin')
+        self.document_type = self.create_document_type('police_check')
+
+    def upload(self, key='upload-1', content=b'%PDF-1.4 retried', client=None):
+        return (client or self.client_for(self.worker)).post(reverse('upload-document'), {
+            'document_type': self.document_type.pk,
+            'file': SimpleUploadedFile('retried.pdf', content, content_type='application/pdf'),
+        }, format='multipart', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.upload()
+        self.assertEqual(first.status_code, 201)
+        with mock.patch('onboarding.views.Document.objects.replace_or_create') as replace_or_create:
+            retry = self.upload()
+        replace_or_create.assert_not_called()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_key_reused_for_a_different_payload_is_rejected(self):
+        self.upload()
+        response = self.upload(content=b'%PDF-1.4 something else')
+        self.assertEqual(response.status_code, 422)
+
+    def test_keys_are_per_user(self):
+        self.upload()
+        other = self.create_user('otherretrier')
+        response = self.upload(client=self.client_for(other))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Document.objects.filter(user=other).count(), 1)
+
+    def test_in_flight_key_gets_conflict(self):
+        IdempotencyKey.objects.create(
+            user=self.worker, key='upload-1', scope='upload',
+            fingerprint='same', expires_at=timezone.now() + timedelta(hours=1),
+        )
+        with mock.patch('onboarding.idempotency.request_fingerprint', return_value='same'):
+            response = self.upload()
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('Retry-After', response)
+
+    def test_abandoned_claim_is_taken_over(self):
+        # Left behind by a worker killed before it stored a response
+        IdempotencyKey.objects.create(
+            user=self.worker, key='upload-1', scope='upload', fingerprint='same',
+            expires_at=timezone.now() + timedelta(hours=1), claimed_at=timezone.now() - timedelta(minutes=5),
+        )
+        with mock.patch('onboarding.idempotency.request_fingerprint', return_value='same'):
+            response = self.upload()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_attempt_that_lost_its_claim_is_rolled_back(self):
+        replace_or_create = Document.objects.replace_or_create
+
+        def taken_over(*args, **kwargs):
+            # A retry takes the key over while this attempt is still running
+            IdempotencyKey.objects.update(claimed_at=timezone.now() + timedelta(seconds=1))
+            return replace_or_create(*args, **kwargs)
+
+        with mock.patch('onboarding.views.Document.objects.replace_or_create', side_effect=taken_over):
+            response = self.upload()
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Document.objects.exists())
+        self.assertIsNone(IdempotencyKey.objects.get().status_code)
+
+    def test_server_errors_are_not_stored(self):
+        with mock.patch.object(OnboardingProgress.objects, 'refresh_for', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.upload()
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.upload().status_code, 201)
+
+    def test_expired_key_runs_the_request_again(self):
+        self.upload()
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.upload(content=b'%PDF-1.4 a week later')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(prune_idempotency_keys(), 0)
+
+    def test_review_retry_is_replayed(self):
+        document = self.create_document(self.worker, self.document_type)
+        client = self.client_for(self.admin)
+        url = reverse('admin-document-review', args=[document.pk])
+        first = client.patch(url, {'status': 'approved'}, format='json', HTTP_IDEMPOTENCY_KEY='review-1')
+        self.assertEqual(first.status_code, 200)
+        Document.objects.filter(pk=document.pk).update(status='pending')
+
+        retry = client.patch(url, {'status': 'approved'}, format='json', HTTP_IDEMPOTENCY_KEY='review-1')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Document.objects.get(pk=document.pk).status, 'pending')
+
+    def test_requests_without_a_key_are_untouched(self):
+        self.assertEqual(self.upload(key='').status_code, 201)
+        self.assertFalse(IdempotencyKey.objects.exists())
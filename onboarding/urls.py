@@ -1,11 +1,14 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     # User onboarding endpoints
     path('personal-details/', views.PersonalDetailsView.as_view(), name='personal-details'),
     path('dashboard/', views.onboarding_dashboard, name='onboarding-dashboard'),
     path('progress/', views.OnboardingProgressView.as_view(), name='onboarding-progress'),
+    path('dashboard/async/', async_views.onboarding_dashboard_async, name='onboarding-dashboard-async'),
+    path('progress/async/', async_views.onboarding_progress_async, name='onboarding-progress-async'),
+    path('sync/', views.onboarding_sync, name='onboarding-sync'),
     
     # Document management
     path('document-types/', views.DocumentTypeListView.as_view(), name='document-types'),
@@ -18,5 +21,10 @@ urlpatterns = [
     path('admin/documents/<int:pk>/review/', views.AdminDocumentReviewView.as_view(), name='admin-document-review'),
     path('admin/documents/pending/', views.pending_documents, name='pending-documents'),
     path('admin/documents/expiring/', views.expiring_documents, name='expiring-documents'),
+    path('admin/events/', views.admin_event_stream, name='admin-event-stream'),
+    path('admin/events/ticket/', views.admin_event_stream_ticket, name='admin-event-stream-ticket'),
+    path('admin/search/', views.search_onboarding, name='admin-search'),
+    path('admin/stats/', views.admin_stats, name='admin-stats'),
     path('admin/users/<int:user_id>/onboarding/', views.UserOnboardingDetailView.as_view(), name='user-onboarding-detail'),
+    path('admin/users/<int:user_id>/onboarding/async/', async_views.user_onboarding_detail_async, name='user-onboarding-detail-async'),
 ]
@@ -1,25 +1,117 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import Count, F, Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from tavonga_system.throttling import TokenBucketThrottle
 
 from .models import PersonalDetails, Document, DocumentType, OnboardingProgress
 from .serializers import (
-    PersonalDetailsSerializer, DocumentSerializer, DocumentTypeSerializer,
-    OnboardingProgressSerializer, DocumentReviewSerializer, 
+    PersonalDetailsSerializer, DocumentSerializer, DocumentListSerializer, DocumentTypeSerializer,
+    OnboardingProgressSerializer, AdminOnboardingRosterSerializer, DocumentReviewSerializer, 
     DocumentUploadSerializer, OnboardingDashboardSerializer
 )
+from .conditional import ConditionalGetMixin, conditional_get
+from .idempotency import IdempotentMixin, idempotent
+from .events import (
+    HeldStream, StreamPosition, authenticate_jwt, authenticate_stream_ticket, event_stream, issue_stream_ticket,
+    latest_event_id, stream_ticket_max_age, sync_event_stream,
+)
+from .search import search
+from .stats import get_admin_stats
+from .sync import build_sync_payload
 
 User = get_user_model()
 
 
-class PersonalDetailsView(generics.RetrieveUpdateAPIView):
+def _query_list(request, name):
+    """Values of a query parameter given repeated and/or comma separated"""
+    return [value for raw in request.query_params.getlist(name) for value in raw.split(',') if value]
+
+
+DOCUMENT_ORDERINGS = ('days_until_expiry', '-days_until_expiry', 'uploaded_at', '-uploaded_at')
+
+DOCUMENT_FILTER_PARAMETERS = [
+    openapi.Parameter('status', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Comma separated statuses'),
+    openapi.Parameter(
+        'document_type', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+        description='Comma separated document type ids or names'
+    ),
+    openapi.Parameter(
+        'expires_within', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+        description='Only documents expiring between today and this many days from now'
+    ),
+    openapi.Parameter('expired', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+    openapi.Parameter('ordering', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(DOCUMENT_ORDERINGS)),
+]
+
+UploadThrottle = TokenBucketThrottle.for_scope('upload')
+
+IDEMPOTENCY_KEY_PARAMETER = openapi.Parameter(
+    'Idempotency-Key', openapi.IN_HEADER, type=openapi.TYPE_STRING,
+    description='Retries with the same key replay the first response instead of repeating the write'
+)
+
+
+def filter_documents(request, queryset):
+    """
+    Apply the document list query parameters to ``queryset``.
+    
+    Expiry filters and ``ordering=days_until_expiry`` work on ``expiry_date``
+    directly, so the database answers them from its index.
+    """
+    statuses = _query_list(request, 'status')
+    if statuses:
+        unknown = sorted(set(statuses) - {key for key, _ in Document.STATUS_CHOICES})
+        if unknown:
+            raise ValidationError({'status': f"Unknown status(es): {', '.join(unknown)}"})
+        queryset = queryset.filter(status__in=statuses)
+    
+    document_types = _query_list(request, 'document_type')
+    if document_types:
+        # isdecimal, not isdigit: int() rejects digits like '²'
+        ids = [int(value) for value in document_types if value.isdecimal()]
+        names = [value for value in document_types if not value.isdecimal()]
+        queryset = queryset.filter(Q(document_type_id__in=ids) | Q(document_type__name__in=names))
+    
+    expires_within = request.query_params.get('expires_within')
+    if expires_within not in (None, ''):
+        if not expires_within.isdecimal():
+            raise ValidationError({'expires_within': 'Must be a whole number of days.'})
+        queryset = queryset.expiring_within(int(expires_within))
+    
+    expired = request.query_params.get('expired', '').lower()
+    if expired in ('true', '1'):
+        queryset = queryset.expired()
+    elif expired in ('false', '0'):
+        queryset = queryset.not_expired()
+    elif expired:
+        raise ValidationError({'expired': "Must be 'true' or 'false'."})
+    
+    ordering = request.query_params.get('ordering')
+    if ordering:
+        if ordering not in DOCUMENT_ORDERINGS:
+            raise ValidationError({'ordering': f"Must be one of {', '.join(DOCUMENT_ORDERINGS)}."})
+        if ordering.endswith('days_until_expiry'):
+            queryset = queryset.by_expiry(descending=ordering.startswith('-'))
+        else:
+            queryset = queryset.order_by(ordering, ordering.replace('uploaded_at', 'id'))
+    return queryset
+
+
+class PersonalDetailsView(IdempotentMixin, generics.RetrieveUpdateAPIView):
     """Get or update personal details for the authenticated user"""
+    idempotency_scope = 'personal-details'
     serializer_class = PersonalDetailsSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -29,30 +121,28 @@ class PersonalDetailsView(generics.RetrieveUpdateAPIView):
         )
         return personal_details
     
+    @transaction.atomic
     def perform_update(self, serializer):
         serializer.save(user=self.request.user)
         
         # Update onboarding progress
-        progress, created = OnboardingProgress.objects.get_or_create(
-            user=self.request.user
+        OnboardingProgress.objects.refresh_for(
+            self.request.user, details_completed=serializer.instance.is_complete
         )
-        if serializer.instance.is_complete and not progress.personal_details_completed_at:
-            progress.personal_details_completed_at = timezone.now()
-        
-        progress.update_stage()
-        progress.calculate_completion_percentage()
-        progress.save()
 
 
-class DocumentTypeListView(generics.ListAPIView):
+class DocumentTypeListView(ConditionalGetMixin, generics.ListAPIView):
     """List all document types"""
+    conditional_scope = 'document-types'
     queryset = DocumentType.objects.all()
     serializer_class = DocumentTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class DocumentListCreateView(generics.ListCreateAPIView):
+class DocumentListCreateView(ConditionalGetMixin, IdempotentMixin, generics.ListCreateAPIView):
     """List user's documents or upload a new document"""
+    conditional_scope = 'documents'
+    idempotency_scope = 'documents'
     serializer_class = DocumentSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
@@ -60,30 +150,39 @@ class DocumentListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         return Document.objects.filter(user=self.request.user)
     
-    def perform_create(self, serializer):
-        # Check if document of this type already exists
-        doc_type = serializer.validated_data['document_type']
-        existing_doc = Document.objects.filter(
-            user=self.request.user,
-            document_type=doc_type
-        ).first()
-        
-        if existing_doc:
-            # Delete the old document file
-            if existing_doc.file:
-                existing_doc.file.delete()
-            existing_doc.delete()
+    def filter_queryset(self, queryset):
+        return filter_documents(self.request, queryset)
+    
+    def get_throttles(self):
+        # Uploads here share the upload/ buckets; listing isn't throttled
+        if self.request.method == 'POST':
+            return [UploadThrottle()]
+        return super().get_throttles()
+    
+    @swagger_auto_schema(manual_parameters=DOCUMENT_FILTER_PARAMETERS)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
+    def list(self, request, *args, **kwargs):
+        rows = DocumentListSerializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            serializer = DocumentListSerializer(page, context=self.get_serializer_context())
+            return self.get_paginated_response(serializer.data)
         
-        # Save new document
-        serializer.save(user=self.request.user)
+        serializer = DocumentListSerializer(rows, context=self.get_serializer_context())
+        return Response(serializer.data)
+    
+    @transaction.atomic
+    def perform_create(self, serializer):
+        # Replaces an existing document of this type in place
+        data = dict(serializer.validated_data)
+        serializer.instance, created = Document.objects.replace_or_create(
+            self.request.user, data.pop('document_type'), data.pop('file'), **data
+        )
         
         # Update onboarding progress
-        progress, created = OnboardingProgress.objects.get_or_create(
-            user=self.request.user
-        )
-        progress.update_stage()
-        progress.calculate_completion_percentage()
-        progress.save()
+        OnboardingProgress.objects.refresh_for(self.request.user)
 
 
 class DocumentDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -94,57 +193,41 @@ class DocumentDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return Document.objects.filter(user=self.request.user)
     
+    @transaction.atomic
     def perform_destroy(self, instance):
         # Delete the file
         if instance.file:
             instance.file.delete()
         instance.delete()
+        
+        # Update onboarding progress
+        OnboardingProgress.objects.refresh_for(self.request.user)
 
 
 @swagger_auto_schema(
     method='post',
     request_body=DocumentUploadSerializer,
+    manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
     responses={201: DocumentSerializer}
 )
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes([UploadThrottle])
+@idempotent('upload')
 def upload_document(request):
     """Upload a document with simplified payload"""
     serializer = DocumentUploadSerializer(data=request.data)
     
     if serializer.is_valid():
-        # Check if document of this type already exists
-        doc_type = serializer.validated_data['document_type']
-        existing_doc = Document.objects.filter(
-            user=request.user,
-            document_type=doc_type
-        ).first()
-        
-        if existing_doc:
-            # Delete the old document
-            if existing_doc.file:
-                existing_doc.file.delete()
-            existing_doc.delete()
-        
-        # Create new document
-        file = serializer.validated_data['file']
-        document = Document.objects.create(
-            user=request.user,
-            document_type=doc_type,
-            file=file,
-            original_filename=file.name,
-            file_size=file.size,
-            issue_date=serializer.validated_data.get('issue_date'),
-            expiry_date=serializer.validated_data.get('expiry_date'),
-            document_number=serializer.validated_data.get('document_number'),
-            issuing_authority=serializer.validated_data.get('issuing_authority'),
-        )
-        
-        # Update onboarding progress
-        progress, created = OnboardingProgress.objects.get_or_create(user=request.user)
-        progress.update_stage()
-        progress.calculate_completion_percentage()
-        progress.save()
+        with transaction.atomic():
+            # Replaces an existing document of this type in place
+            data = dict(serializer.validated_data)
+            document, created = Document.objects.replace_or_create(
+                request.user, data.pop('document_type'), data.pop('file'), **data
+            )
+            
+            # Update onboarding progress
+            OnboardingProgress.objects.refresh_for(request.user)
         
         return Response(
             DocumentSerializer(document, context={'request': request}).data,
@@ -154,19 +237,14 @@ def upload_document(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class OnboardingProgressView(generics.RetrieveAPIView):
+class OnboardingProgressView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Get onboarding progress for authenticated user"""
+    conditional_scope = 'progress'
     serializer_class = OnboardingProgressSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        progress, created = OnboardingProgress.objects.get_or_create(
-            user=self.request.user
-        )
-        progress.update_stage()
-        progress.calculate_completion_percentage()
-        progress.save()
-        return progress
+        return OnboardingProgress.objects.current_for(self.request.user)
 
 
 @swagger_auto_schema(
@@ -175,6 +253,7 @@ class OnboardingProgressView(generics.RetrieveAPIView):
 )
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@conditional_get('dashboard')
 def onboarding_dashboard(request):
     """Get complete onboarding dashboard data for authenticated user"""
     serializer = OnboardingDashboardSerializer(
@@ -184,29 +263,138 @@ def onboarding_dashboard(request):
     return Response(serializer.data)
 
 
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter(
+            'since', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+            description='Cursor returned by the previous sync; omit for a full snapshot'
+        ),
+    ],
+    responses={200: openapi.Response('Changes since the cursor', openapi.Schema(type=openapi.TYPE_OBJECT))}
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def onboarding_sync(request):
+    """Get onboarding records changed since the given sync cursor"""
+    return Response(build_sync_payload(request, request.query_params.get('since')))
+
+
 # Admin Views
+ROSTER_ORDERINGS = {
+    # Each is backed by an index on OnboardingProgress; id keeps pages stable
+    'updated_at': ('updated_at', 'id'),
+    'created_at': ('created_at', 'id'),
+    'completion_percentage': ('completion_percentage', 'id'),
+}
+
+
+def _query_percentage(request, name):
+    raw = request.query_params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        value = -1
+    if not 0 <= value <= 100:
+        raise ValidationError({name: 'Must be a whole number from 0 to 100.'})
+    return value
+
+
+def document_summaries(user_ids):
+    """Document counts by status for each user, from one grouped query"""
+    statuses = [key for key, _ in Document.STATUS_CHOICES]
+    summaries = {user_id: dict.fromkeys(['total', *statuses], 0) for user_id in user_ids}
+    rows = Document.objects.filter(user_id__in=user_ids).order_by().values('user_id', 'status').annotate(count=Count('id'))
+    for row in rows:
+        summary = summaries[row['user_id']]
+        summary[row['status']] = row['count']
+        summary['total'] += row['count']
+    return summaries
+
+
 class AdminOnboardingListView(generics.ListAPIView):
-    """List all users' onboarding progress (Admin/Coordinator only)"""
-    serializer_class = OnboardingProgressSerializer
+    """
+    Onboarding roster of all workers (Admin/Coordinator only).
+    
+    Filters by one or more stages (``status=admin_review,rejected`` or repeated),
+    a completion range (``min_completion``/``max_completion``), orders by
+    ``ordering`` (see ROSTER_ORDERINGS, ``-`` for descending) and, with
+    ``include=documents``, adds each worker's document counts by status.
+    """
+    serializer_class = AdminOnboardingRosterSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                'status', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                description='Comma separated stages, e.g. admin_review,rejected'
+            ),
+            openapi.Parameter('min_completion', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('max_completion', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter(
+                'ordering', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                enum=[prefix + key for key in ROSTER_ORDERINGS for prefix in ('', '-')],
+                description='Defaults to -updated_at'
+            ),
+            openapi.Parameter('include', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['documents']),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
     def get_queryset(self):
         user = self.request.user
         if user.role not in ['admin', 'coordinator']:
             return OnboardingProgress.objects.none()
         
-        # Filter by status if provided
-        status_filter = self.request.query_params.get('status')
-        queryset = OnboardingProgress.objects.all()
+        params = self.request.query_params
+        queryset = OnboardingProgress.objects.select_related('user')
+        
+        stages = _query_list(self.request, 'status')
+        if stages:
+            valid = {key for key, _ in OnboardingProgress.PROGRESS_STAGES}
+            unknown = sorted(set(stages) - valid)
+            if unknown:
+                raise ValidationError({'status': f"Unknown stage(s): {', '.join(unknown)}"})
+            queryset = queryset.filter(current_stage__in=stages)
         
-        if status_filter:
-            queryset = queryset.filter(current_stage=status_filter)
+        min_completion = _query_percentage(self.request, 'min_completion')
+        if min_completion is not None:
+            queryset = queryset.filter(completion_percentage__gte=min_completion)
+        max_completion = _query_percentage(self.request, 'max_completion')
+        if max_completion is not None:
+            queryset = queryset.filter(completion_percentage__lte=max_completion)
         
-        return queryset.order_by('-updated_at')
+        ordering = params.get('ordering', '-updated_at')
+        descending = ordering.startswith('-')
+        fields = ROSTER_ORDERINGS.get(ordering.lstrip('-'))
+        if fields is None:
+            raise ValidationError({'ordering': f"Must be one of {', '.join(ROSTER_ORDERINGS)}, optionally prefixed with '-'."})
+        return queryset.order_by(*[f'-{field}' if descending else field for field in fields])
+    
+    def include_documents(self):
+        return 'documents' in _query_list(self.request, 'include')
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if self.include_documents():
+            rows = page if page is not None else queryset
+            self.document_summaries = document_summaries([progress.user_id for progress in rows])
+        return page
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if hasattr(self, 'document_summaries'):
+            context['document_summaries'] = self.document_summaries
+        return context
 
 
-class AdminDocumentReviewView(generics.UpdateAPIView):
+class AdminDocumentReviewView(IdempotentMixin, generics.UpdateAPIView):
     """Admin view to approve/reject documents"""
+    idempotency_scope = 'document-review'
     serializer_class = DocumentReviewSerializer
     permission_classes = [permissions.IsAuthenticated]
     queryset = Document.objects.all()
@@ -217,6 +405,7 @@ class AdminDocumentReviewView(generics.UpdateAPIView):
             return Document.objects.none()
         return Document.objects.all()
     
+    @transaction.atomic
     def perform_update(self, serializer):
         serializer.save(
             reviewed_by=self.request.user,
@@ -224,17 +413,12 @@ class AdminDocumentReviewView(generics.UpdateAPIView):
         )
         
         # Update user's onboarding progress
-        document = serializer.instance
-        progress, created = OnboardingProgress.objects.get_or_create(
-            user=document.user
-        )
-        progress.update_stage()
-        progress.calculate_completion_percentage()
-        progress.save()
+        OnboardingProgress.objects.refresh_for(serializer.instance.user)
 
 
 @swagger_auto_schema(
     method='get',
+    manual_parameters=DOCUMENT_FILTER_PARAMETERS,
     responses={200: openapi.Response('Pending documents', DocumentSerializer(many=True))}
 )
 @api_view(['GET'])
@@ -248,13 +432,14 @@ def pending_documents(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    documents = Document.objects.filter(status='pending').order_by('-uploaded_at')
-    serializer = DocumentSerializer(documents, many=True, context={'request': request})
+    documents = filter_documents(request, Document.objects.filter(status='pending').order_by('-uploaded_at'))
+    serializer = DocumentListSerializer(DocumentListSerializer.values(documents), context={'request': request})
     return Response(serializer.data)
 
 
 @swagger_auto_schema(
     method='get',
+    manual_parameters=DOCUMENT_FILTER_PARAMETERS,
     responses={200: openapi.Response('Expiring documents', DocumentSerializer(many=True))}
 )
 @api_view(['GET'])
@@ -271,15 +456,151 @@ def expiring_documents(request):
     from datetime import date, timedelta
     expiry_threshold = date.today() + timedelta(days=30)
     
+    # Document.save() moves approved documents to expiring_soon/expired as the date nears
     documents = Document.objects.filter(
         expiry_date__lte=expiry_threshold,
-        status='approved'
+        status__in=['approved', 'expiring_soon', 'expired']
     ).order_by('expiry_date')
+    documents = filter_documents(request, documents)
     
-    serializer = DocumentSerializer(documents, many=True, context={'request': request})
+    serializer = DocumentListSerializer(DocumentListSerializer.values(documents), context={'request': request})
     return Response(serializer.data)
 
 
+@swagger_auto_schema(
+    method='get',
+    responses={200: openapi.Response('Onboarding statistics', openapi.Schema(type=openapi.TYPE_OBJECT))}
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def admin_stats(request):
+    """Get cached headline onboarding statistics for the admin home"""
+    user = request.user
+    if user.role not in ['admin', 'coordinator']:
+        return Response(
+            {'error': 'Permission denied'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    return Response(get_admin_stats())
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter('type', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['worker', 'document']),
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    ],
+    responses={200: openapi.Response('Ranked search results', openapi.Schema(type=openapi.TYPE_OBJECT))}
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search_onboarding(request):
+    """Ranked search across workers and documents (Admin/Coordinator only)"""
+    user = request.user
+    if user.role not in ['admin', 'coordinator']:
+        return Response(
+            {'error': 'Permission denied'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    kind = request.query_params.get('type')
+    if kind not in (None, 'worker', 'document'):
+        return Response(
+            {'error': "type must be 'worker' or 'document'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
+    
+    matches = search(request.query_params.get('q', ''), kind=kind, limit=limit)
+    
+    # Hydrate each kind with one query, then restore rank order
+    worker_ids = [object_id for entry_kind, object_id, _, _ in matches if entry_kind == 'worker']
+    document_ids = [object_id for entry_kind, object_id, _, _ in matches if entry_kind == 'document']
+    workers = {
+        row['id']: row for row in User.objects.filter(id__in=worker_ids).values(
+            'id', 'username', 'email', 'first_name', 'last_name', 'role'
+        )
+    }
+    documents = {
+        row['id']: row for row in Document.objects.filter(id__in=document_ids).values(
+            'id', 'user', 'document_type', 'document_number', 'issuing_authority',
+            'status', 'expiry_date', document_type_name=F('document_type__display_name'),
+            user_email=F('user__email'),
+        )
+    }
+    
+    results = []
+    for entry_kind, object_id, _, rank in matches:
+        record = (workers if entry_kind == 'worker' else documents).get(object_id)
+        if record is not None:
+            results.append({'type': entry_kind, 'rank': round(float(rank), 4), **record})
+    
+    return Response({'count': len(results), 'results': results})
+
+
+@swagger_auto_schema(
+    method='post',
+    responses={200: openapi.Response('Ticket for ?ticket= on the admin event stream', openapi.Schema(type=openapi.TYPE_OBJECT))}
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def admin_event_stream_ticket(request):
+    """Get a short-lived ticket for opening the admin event stream from a browser"""
+    user = request.user
+    if user.role not in ['admin', 'coordinator']:
+        return Response(
+            {'error': 'Permission denied'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    return Response({'ticket': issue_stream_ticket(user), 'expires_in': stream_ticket_max_age()})
+
+
+async def admin_event_stream(request):
+    """
+    Server-sent events stream of document and progress changes (Admin/Coordinator only).
+    
+    Authenticates with the ``Authorization`` header or, for EventSource, with
+    ``?ticket=`` from ``admin-event-stream-ticket``; a reconnect after the ticket
+    expires gets 401 and should fetch a new one. Resumes after the
+    ``Last-Event-ID`` header (or ``?last_event_id=``); new connections start from
+    the latest event. Under WSGI an open stream holds a worker thread, so only
+    SSE_MAX_SYNC_STREAMS are served per process and further ones get 503.
+    """
+    user = await sync_to_async(authenticate_jwt)(request)
+    if user is None:
+        user = await sync_to_async(authenticate_stream_ticket)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if user.role not in ['admin', 'coordinator']:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    position = StreamPosition.parse(
+        request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or ''
+    )
+    if position is None:
+        position = StreamPosition(await latest_event_id())
+    
+    if isinstance(request, WSGIRequest):
+        # An async generator would be drained completely before WSGI sent a byte
+        stream = HeldStream.open(sync_event_stream(position))
+        if stream is None:
+            response = JsonResponse({'error': 'Too many open event streams, please retry shortly'}, status=503)
+            response['Retry-After'] = '5'
+            return response
+    else:
+        stream = event_stream(position)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 class UserOnboardingDetailView(generics.RetrieveAPIView):
     """Admin view to see specific user's onboarding details"""
     serializer_class = OnboardingDashboardSerializer
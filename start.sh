@@ -0,0 +1,14 @@
+#!/usr/bin/env bash
+# exit on error
+set -o errexit
+
+# SERVER_MODE=asgi serves the async views without tying up a worker per
+# in-flight request; wsgi runs threaded sync workers (GUNICORN_THREADS)
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec gunicorn tavonga_system.asgi:application \
+        --config gunicorn.conf.py \
+        --worker-class uvicorn_worker.UvicornWorker
+else
+    exec gunicorn tavonga_system.wsgi:application \
+        --config gunicorn.conf.py
+fi
@@ -0,0 +1,249 @@
+"""
+Admission control: per-process caps on in-flight requests by route class.
+
+Requests are sorted into the classes in ``ADMISSION_ROUTE_CLASSES`` by URL
+name (optionally per method), everything else falls into ``default``. Each
+class admits up to ``concurrency`` requests at once in a process; further
+requests wait in a queue of at most ``queue`` entries for up to ``timeout``
+seconds, first come first served. A request that finds the queue full, or
+waits too long, is shed with 503 and ``Retry-After``.
+
+Heavy classes (uploads) get small limits of their own, so a rush of uploads
+queues behind itself instead of taking every worker thread, and cheap routes
+in ``default`` keep flowing. Sync (WSGI threads) and async (ASGI) requests in
+one process share the same counters. Long-lived responses such as the admin
+event stream are listed in ``ADMISSION_EXEMPT_ROUTES``.
+
+The limits are per process, so they only matter where a process serves
+several requests at once: under ASGI, or WSGI with gunicorn's threaded
+workers (``GUNICORN_THREADS`` above 1). A plain sync worker handles one
+request at a time and never reaches them.
+
+In-flight and queued requests per class are exported as Prometheus gauges,
+with counters for shed requests and a histogram of queue waits (metrics.py).
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+from .db import pool_max_size
+from .metrics import observe_admission, observe_admission_wait, observe_shed
+
+DEFAULT_CLASS = 'default'
+
+
+class _Waiter:
+    """A queued request; ``granted`` is only changed under the gate's lock"""
+
+    def __init__(self):
+        self.granted = False
+
+    def wake(self):
+        self.granted = True
+        return True
+
+
+class _ThreadWaiter(_Waiter):
+    def __init__(self):
+        super().__init__()
+        self.event = threading.Event()
+
+    def wake(self):
+        super().wake()
+        self.event.set()
+        return True
+
+
+class _AsyncWaiter(_Waiter):
+    def __init__(self):
+        super().__init__()
+        self.future = asyncio.get_running_loop().create_future()
+
+    def wake(self):
+        try:
+            self.future.get_loop().call_soon_threadsafe(self._resolve)
+        except RuntimeError:
+            # Its event loop is gone; hand the slot to the next waiter
+            return False
+        return super().wake()
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class Gate:
+    """Concurrency limit with a bounded FIFO queue for one route class"""
+
+    def __init__(self, name, concurrency, queue=0, timeout=0, retry_after=1):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _enter(self, make_waiter):
+        """Take a free slot (returns None), join the queue (returns the waiter) or refuse (returns False)"""
+        with self._lock:
+            if self.active < self.concurrency and not self._waiters:
+                self.active += 1
+                waiter = None
+            elif len(self._waiters) >= self.queue_size:
+                waiter = False
+            else:
+                waiter = make_waiter()
+                self._waiters.append(waiter)
+        self._observe()
+        if waiter is False:
+            observe_shed(self.name, 'queue_full')
+        return waiter
+
+    def _leave_queue(self, waiter, reason='timeout'):
+        """Give up waiting; returns True if the slot was handed over in the meantime"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+        self._observe()
+        observe_shed(self.name, reason)
+        return False
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                # The slot passes straight to the next waiter, so active stays put
+                if self._waiters.popleft().wake():
+                    break
+            else:
+                self.active -= 1
+        self._observe()
+
+    def acquire(self):
+        waiter = self._enter(_ThreadWaiter)
+        if not waiter:
+            return waiter is None
+        started = time.perf_counter()
+        admitted = waiter.event.wait(self.timeout) or self._leave_queue(waiter)
+        observe_admission_wait(self.name, time.perf_counter() - started)
+        return admitted
+
+    async def aacquire(self):
+        waiter = self._enter(_AsyncWaiter)
+        if not waiter:
+            return waiter is None
+        started = time.perf_counter()
+        try:
+            # asyncio.wait leaves the future alone on timeout, unlike wait_for
+            await asyncio.wait([waiter.future], timeout=self.timeout)
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if self._leave_queue(waiter, 'cancelled'):
+                self.release()
+            raise
+        admitted = waiter.future.done() or self._leave_queue(waiter)
+        observe_admission_wait(self.name, time.perf_counter() - started)
+        return admitted
+
+    def _observe(self):
+        observe_admission(self.name, self.active, self.queued)
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def route_classes():
+    classes = dict(getattr(settings, 'ADMISSION_ROUTE_CLASSES', {}))
+    classes.setdefault(DEFAULT_CLASS, {'concurrency': pool_max_size(), 'queue': 64, 'timeout': 5})
+    return classes
+
+
+def get_gate(name):
+    """The process-wide gate for route class ``name``, rebuilt if its settings change"""
+    config = route_classes()[name]
+    limits = {key: value for key, value in config.items() if key != 'routes'}
+    with _gates_lock:
+        current = _gates.get(name)
+        if current is None or current[0] != limits:
+            current = _gates[name] = (limits, Gate(name, **limits))
+        return current[1]
+
+
+def classify(request):
+    """Route class for ``request``, or None if it is exempt"""
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return DEFAULT_CLASS
+    # Lets the request metrics label shed requests with their route
+    request.resolver_match = match
+    name = match.view_name
+    if name in getattr(settings, 'ADMISSION_EXEMPT_ROUTES', ()):
+        return None
+    for class_name, config in route_classes().items():
+        routes = config.get('routes', ())
+        if name in routes or f'{request.method} {name}' in routes:
+            return class_name
+    return DEFAULT_CLASS
+
+
+def shed(gate):
+    response = JsonResponse(
+        {'error': 'Server is busy, please retry shortly'}, status=503,
+    )
+    response['Retry-After'] = str(gate.retry_after)
+    return response
+
+
+class AdmissionControlMiddleware:
+    """Caps concurrent requests per route class and sheds the overflow with 503"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _gate(self, request):
+        if not getattr(settings, 'ADMISSION_CONTROL_ENABLED', True):
+            return None
+        class_name = classify(request)
+        return get_gate(class_name) if class_name else None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        gate = self._gate(request)
+        if gate is None:
+            return self.get_response(request)
+        if not gate.acquire():
+            return shed(gate)
+        try:
+            return self.get_response(request)
+        finally:
+            gate.release()
+
+    async def __acall__(self, request):
+        gate = self._gate(request)
+        if gate is None:
+            return await self.get_response(request)
+        if not await gate.aacquire():
+            return shed(gate)
+        try:
+            return await self.get_response(request)
+        finally:
+            gate.release()
@@ -0,0 +1,141 @@
+"""
+Database connection settings and pool metrics.
+
+``DB_POOL_MODE`` picks how PostgreSQL connections are reused:
+
+- ``pool``: psycopg 3 connection pool (needs ``psycopg[pool]``)
+- ``persistent``: one connection per worker thread kept for ``DB_CONN_MAX_AGE`` seconds
+- ``off``: a new connection per request
+- ``auto`` (default): ``pool`` when psycopg 3 and psycopg_pool are installed, else ``persistent``
+
+Both reuse modes health-check a connection before handing it out and
+recycle it after a maximum lifetime.
+
+Under ``SERVER_MODE=asgi`` sync ORM calls run on executor threads that come
+and go, so persistent connections pile up without being closed at the end of
+a request; there ``persistent`` (and ``auto`` without a pool) becomes ``off``.
+"""
+import importlib.util
+import os
+from collections import Counter
+
+import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+POOL_MODES = ('auto', 'pool', 'persistent', 'off')
+
+
+def pool_driver_available():
+    return all(importlib.util.find_spec(name) for name in ('psycopg', 'psycopg_pool'))
+
+
+def _env_int(env, name, default):
+    return int(env.get(name, default))
+
+
+def pool_max_size(env=None):
+    """Most database connections one worker process may hold (``DB_POOL_MAX_SIZE``)"""
+    return _env_int(os.environ if env is None else env, 'DB_POOL_MAX_SIZE', 10)
+
+
+def database_config(url, env=None):
+    """Build a DATABASES entry for ``url`` with the configured connection reuse"""
+    env = os.environ if env is None else env
+    config = dj_database_url.parse(url)
+    mode = env.get('DB_POOL_MODE', 'auto').lower()
+    if mode not in POOL_MODES:
+        raise ImproperlyConfigured(f"DB_POOL_MODE must be one of {', '.join(POOL_MODES)}, not {mode!r}")
+    if 'postgresql' not in config['ENGINE']:
+        return config
+
+    if mode == 'auto':
+        mode = 'pool' if pool_driver_available() else 'persistent'
+    if mode == 'pool' and not pool_driver_available():
+        raise ImproperlyConfigured("DB_POOL_MODE=pool requires psycopg 3 with psycopg_pool (pip install 'psycopg[pool]')")
+    if mode == 'persistent' and env.get('SERVER_MODE', 'wsgi').lower() == 'asgi':
+        mode = 'off'
+
+    max_lifetime = _env_int(env, 'DB_CONN_MAX_AGE', 600)
+    if mode == 'pool':
+        # Pooled connections are returned to the pool at the end of each
+        # request, so Django itself must not keep them
+        config['CONN_MAX_AGE'] = 0
+        config['CONN_HEALTH_CHECKS'] = True
+        config.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': _env_int(env, 'DB_POOL_MIN_SIZE', 2),
+            'max_size': pool_max_size(env),
+            'max_lifetime': max_lifetime,
+            'max_idle': _env_int(env, 'DB_POOL_MAX_IDLE', 300),
+            'timeout': _env_int(env, 'DB_POOL_TIMEOUT', 10),
+        }
+    elif mode == 'persistent':
+        config['CONN_MAX_AGE'] = max_lifetime
+        config['CONN_HEALTH_CHECKS'] = True
+    else:
+        config['CONN_MAX_AGE'] = 0
+    return config
+
+
+# Connections opened by this process, per alias; with pooling these are
+# checkouts from the pool rather than new server connections
+_opened = Counter()
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    _opened[connection.alias] += 1
+
+
+def connection_mode(connection):
+    if connection.settings_dict.get('OPTIONS', {}).get('pool'):
+        return 'pool'
+    if connection.settings_dict.get('CONN_MAX_AGE'):
+        return 'persistent'
+    return 'off'
+
+
+def pool_metrics():
+    """Per-alias connection statistics for this worker process"""
+    from django.db import connections
+
+    metrics = {}
+    for connection in connections.all():
+        mode = connection_mode(connection)
+        entry = {
+            'vendor': connection.vendor,
+            'mode': mode,
+            'opened': _opened[connection.alias],
+        }
+        # Only a pool has meaningful in-use/waiting figures; without one,
+        # connections belong to request threads and just the counter is reported
+        pool = getattr(type(connection), '_connection_pools', {}).get(connection.alias)
+        if mode == 'pool' and pool is not None:
+            stats = pool.get_stats()
+            entry.update({
+                'size': stats.get('pool_size', 0),
+                'in_use': stats.get('pool_size', 0) - stats.get('pool_available', 0),
+                'idle': stats.get('pool_available', 0),
+                'waiting': stats.get('requests_waiting', 0),
+                'created': stats.get('connections_num', 0),
+                'max_size': stats.get('pool_max'),
+            })
+        metrics[connection.alias] = entry
+    return metrics
+
+
+def close_connections():
+    """
+    Close this process's database connections and pools.
+
+    Gunicorn calls this after forking a worker, so nothing opened in the master
+    is shared between processes, and when a worker exits, so recycled workers
+    disconnect cleanly instead of leaving Postgres to time the sockets out.
+    """
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
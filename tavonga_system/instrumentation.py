@@ -0,0 +1,219 @@
+"""
+Per-request cost accounting.
+
+``RequestMetricsMiddleware`` collects, for every request:
+
+- the number of queries and total time spent in the database (an execute
+  wrapper installed on every connection)
+- time spent turning objects into response data (``TimedSerializerMixin``)
+- time spent reading and writing uploaded files (``TimedFileSystemStorage``)
+
+and reports them as one structured log line per request tagged with the
+resolved URL name, Prometheus samples (see metrics.py) and, with
+``REQUEST_METRICS_SERVER_TIMING`` on (development), a ``Server-Timing``
+header. Routes listed in ``REQUEST_QUERY_BUDGETS`` log a warning when
+they run more queries than allowed; a ``"METHOD name"`` entry, as in
+``ADMISSION_ROUTE_CLASSES``, takes precedence over the bare URL name, so writes
+get budgets of their own.
+
+Serializer and file I/O times exclude database time spent inside them, so the
+buckets don't double count.
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import observe_request, observe_upload
+
+logger = logging.getLogger('tavonga_system.requests')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self, request=None):
+        self.request = request
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.io_time = 0.0
+        self._depth = 0
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def route(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else None
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def untracked():
+    """Leave the block's queries and timings out of the request metrics"""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(bucket):
+    """Add the time spent in the block, minus database time, to ``bucket``"""
+    metrics = _current.get()
+    # Nested blocks (e.g. a serializer field using another serializer) are
+    # already covered by the outermost one
+    if metrics is None or metrics._depth:
+        yield
+        return
+
+    metrics._depth += 1
+    started, db_before = time.perf_counter(), metrics.db_time
+    try:
+        yield
+    finally:
+        metrics._depth -= 1
+        elapsed = time.perf_counter() - started - (metrics.db_time - db_before)
+        setattr(metrics, bucket, getattr(metrics, bucket) + max(elapsed, 0.0))
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+class TimedSerializerMixin:
+    """Serializer mixin counting ``to_representation`` towards serializer time"""
+
+    def to_representation(self, instance):
+        with timed('serializer_time'):
+            return super().to_representation(instance)
+
+
+class TimedFileSystemStorage(FileSystemStorage):
+    """FileSystemStorage counting file reads, writes and deletes towards I/O time"""
+
+    def _open(self, name, mode='rb'):
+        with timed('io_time'):
+            return super()._open(name, mode)
+
+    def _save(self, name, content):
+        with timed('io_time'):
+            name = super()._save(name, content)
+        observe_upload(content.size)
+        return name
+
+    def delete(self, name):
+        with timed('io_time'):
+            return super().delete(name)
+
+    def exists(self, name):
+        with timed('io_time'):
+            return super().exists(name)
+
+
+def server_timing(metrics, total):
+    return ', '.join([
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+        f'serializer;dur={metrics.serializer_time * 1000:.1f}',
+        f'io;dur={metrics.io_time * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ])
+
+
+def query_budget(route, method):
+    budgets = getattr(settings, 'REQUEST_QUERY_BUDGETS', {})
+    return budgets.get(f'{method} {route}', budgets.get(route))
+
+
+class RequestMetricsMiddleware:
+    """Logs a structured line for every response, adding Server-Timing when enabled"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        metrics = RequestMetrics(request)
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(request)
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = metrics.total_time
+        route = metrics.route
+        if getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', False):
+            response['Server-Timing'] = server_timing(metrics, total)
+
+        fields = {
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'serializer_ms': round(metrics.serializer_time * 1000, 1),
+            'io_ms': round(metrics.io_time * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+        }
+        logger.info(json.dumps(fields, separators=(',', ':')), extra={'request_metrics': fields})
+        observe_request(route, request.method, response.status_code, total, metrics.queries)
+
+        budget = query_budget(route, request.method)
+        if budget is not None and metrics.queries > budget:
+            logger.warning(
+                'Query budget exceeded for %s %s: %d queries (budget %d)', request.method, route, metrics.queries, budget,
+                extra={'request_metrics': fields},
+            )
+        return response
@@ -0,0 +1,116 @@
+"""
+Prometheus metrics for the API.
+
+Request metrics are recorded by ``RequestMetricsMiddleware``. Under gunicorn,
+``PROMETHEUS_MULTIPROC_DIR`` (set in gunicorn.conf.py) makes every worker write
+its samples to shared files, and a scrape of any worker aggregates all of them.
+
+Onboarding gauges are read from the cached admin stats at scrape time rather
+than stored per process, so they are reported once and cost a cache hit.
+"""
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time to produce a response, by route, method and status',
+    ['route', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries',
+    'Database queries per request, by route',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+UPLOAD_BYTES = Counter(
+    'onboarding_upload_bytes',
+    'Bytes of uploaded files written to storage',
+)
+# Admission control (see admission.py); gauges are summed over live workers
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight_requests',
+    'Requests admitted and not yet finished, by route class',
+    ['route_class'],
+    multiprocess_mode='livesum',
+)
+ADMISSION_QUEUED = Gauge(
+    'admission_queued_requests',
+    'Requests waiting for admission, by route class',
+    ['route_class'],
+    multiprocess_mode='livesum',
+)
+ADMISSION_WAIT = Histogram(
+    'admission_queue_wait_seconds',
+    'Time queued requests waited for admission, by route class',
+    ['route_class'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+ADMISSION_SHED = Counter(
+    'admission_shed_requests',
+    'Requests refused with 503, by route class and reason (queue_full, timeout, cancelled)',
+    ['route_class', 'reason'],
+)
+
+
+def observe_request(route, method, status, duration, queries):
+    # 404s and other unrouted requests share a label to keep cardinality bounded
+    route = route or 'unmatched'
+    REQUEST_LATENCY.labels(route, method, str(status)).observe(duration)
+    REQUEST_QUERIES.labels(route).observe(queries)
+
+
+def observe_upload(size):
+    UPLOAD_BYTES.inc(size)
+
+
+def observe_admission(route_class, in_flight, queued):
+    ADMISSION_IN_FLIGHT.labels(route_class).set(in_flight)
+    ADMISSION_QUEUED.labels(route_class).set(queued)
+
+
+def observe_admission_wait(route_class, seconds):
+    ADMISSION_WAIT.labels(route_class).observe(seconds)
+
+
+def observe_shed(route_class, reason):
+    ADMISSION_SHED.labels(route_class, reason).inc()
+
+
+class OnboardingStatsCollector:
+    """Stage and document status gauges from the cached admin stats"""
+
+    def collect(self):
+        from onboarding.stats import get_admin_stats
+
+        stats = get_admin_stats()
+        stages = GaugeMetricFamily('onboarding_workers_by_stage', 'Workers at each onboarding stage', labels=['stage'])
+        for stage, count in stats['workers_by_stage'].items():
+            stages.add_metric([stage], count)
+        yield stages
+
+        statuses = GaugeMetricFamily('onboarding_documents_by_status', 'Documents in each status', labels=['status'])
+        for document_status, count in stats['documents_by_status'].items():
+            statuses.add_metric([document_status], count)
+        yield statuses
+
+        yield GaugeMetricFamily(
+            'onboarding_documents_expiring_this_week', 'Documents expiring within 7 days',
+            value=stats['expiring_this_week'],
+        )
+
+
+_stats_registry = CollectorRegistry(auto_describe=False)
+_stats_registry.register(OnboardingStatsCollector())
+
+
+def render_metrics():
+    """Text exposition of all metrics, aggregated across processes when in multiprocess mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_stats_registry), CONTENT_TYPE_LATEST
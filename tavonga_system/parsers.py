@@ -0,0 +1,31 @@
+"""
+Fast JSON parsing for the API.
+
+Uses orjson when it is installed and falls back to DRF's stdlib parser otherwise.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """
+    Drop-in replacement for ``JSONParser`` backed by orjson.
+
+    Like the strict stdlib parser it rejects ``NaN`` and ``Infinity``; bodies in
+    a charset other than UTF-8 go through the stdlib path.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8' or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
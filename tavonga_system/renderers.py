@@ -0,0 +1,71 @@
+"""
+Fast JSON rendering for the API.
+
+Uses orjson when it is installed and falls back to DRF's stdlib renderer
+otherwise, so the setting can point here unconditionally.
+"""
+import math
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised when orjson isn't installed
+    orjson = None
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+
+def _has_non_finite_float(data):
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for ``JSONRenderer`` backed by orjson.
+
+    Output matches the stdlib renderer for API payloads: compact separators,
+    unescaped unicode, dates and datetimes formatted by DRF's encoder, and
+    U+2028/U+2029 escaped. Indented responses (``; indent=N``), non-default
+    JSON settings and anything orjson rejects (e.g. integers wider than 64 bits)
+    go through the stdlib path. orjson writes NaN and infinities as ``null``, so
+    payloads holding them also go through the stdlib path, which rejects them
+    (``STRICT_JSON``) just as ``JSONRenderer`` does. Floats in exponent form are
+    written without the ``+``/leading zero stdlib adds (``1e16`` rather than
+    ``1e+16``).
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # NaN/Infinity only ever show up as null; check the data only then
+        if b'null' in ret and _has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escape \u2028 and \u2029 like the stdlib renderer so output stays a JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
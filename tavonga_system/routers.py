@@ -0,0 +1,168 @@
+"""
+Read-replica routing for admin listings and reports.
+
+``ReplicaRoutingMiddleware`` marks GET requests to the routes in
+``REPLICA_ROUTES`` (and Django admin changelists) as replica-eligible, and
+``ReplicaRouter`` sends their reads to ``REPLICA_DATABASE``. Everything else,
+and every write, uses ``default``.
+
+Reads stay on the primary when:
+
+- the request has already written, or is inside a transaction on the primary
+- the same client wrote within the last ``REPLICA_PIN_SECONDS`` (read-your-writes,
+  e.g. an admin reviewing a document and then refetching the pending list);
+  the pin is kept in the default cache, so settings refuse a replica without
+  the shared Redis cache
+- the replica failed its last health check
+"""
+import hashlib
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_request_state = ContextVar('replica_routing', default=None)
+
+# alias -> monotonic time until which the replica is treated as down
+_unhealthy_until = {}
+# alias -> monotonic time of the last successful health check
+_checked_at = {}
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        self.eligible = False
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_alias():
+    return getattr(settings, 'REPLICA_DATABASE', None)
+
+
+def replica_available(alias):
+    """Health-check ``alias`` at most once per REPLICA_HEALTH_CHECK_SECONDS"""
+    interval = getattr(settings, 'REPLICA_HEALTH_CHECK_SECONDS', 30)
+    now = time.monotonic()
+    if _unhealthy_until.get(alias, 0) > now:
+        return False
+    if now - _checked_at.get(alias, float('-inf')) < interval:
+        return True
+
+    connection = connections[alias]
+    try:
+        connection.ensure_connection()
+        healthy = connection.is_usable()
+    except DatabaseError:
+        healthy = False
+    if healthy:
+        _checked_at[alias] = now
+        return True
+
+    logger.warning('Replica %r failed its health check; reading from the primary for %ss', alias, interval)
+    _unhealthy_until[alias] = now + interval
+    _checked_at.pop(alias, None)
+    connection.close()
+    return False
+
+
+def use_replica():
+    """Should reads in the current context go to the replica?"""
+    alias = replica_alias()
+    state = _request_state.get()
+    if not alias or state is None or not state.eligible or state.pinned or state.wrote:
+        return False
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return False
+    return replica_available(alias)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if use_replica():
+            return replica_alias()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _client_key(request):
+    credential = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return 'replica:pin:' + hashlib.sha256(credential.encode()).hexdigest()
+
+
+def is_replica_route(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return False
+    if 'admin' in match.namespaces and (match.url_name or '').endswith('_changelist'):
+        return True
+    return match.url_name in getattr(settings, 'REPLICA_ROUTES', [])
+
+
+class ReplicaRoutingMiddleware:
+    """Marks replica-eligible requests and pins clients to the primary after writes"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request, pinned):
+        state = RoutingState(pinned=pinned)
+        state.eligible = bool(replica_alias()) and is_replica_route(request)
+        return state, _request_state.set(state)
+
+    def _should_pin(self, request, state):
+        return state.wrote or request.method not in SAFE_METHODS
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = _client_key(request) if replica_alias() else None
+        state, token = self._start(request, bool(key and cache.get(key)))
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if key and self._should_pin(request, state):
+            cache.set(key, True, getattr(settings, 'REPLICA_PIN_SECONDS', 10))
+        return response
+
+    async def __acall__(self, request):
+        key = _client_key(request) if replica_alias() else None
+        state, token = self._start(request, bool(key and await cache.aget(key)))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if key and self._should_pin(request, state):
+            await cache.aset(key, True, getattr(settings, 'REPLICA_PIN_SECONDS', 10))
+        return response
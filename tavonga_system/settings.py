@@ -11,11 +11,15 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
-import dj_database_url
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
+from .db import database_config, pool_max_size
+
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,6 +35,8 @@ SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-v(8hv)jth79-xw%xyo7#uzym=_
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG', 'True') == 'True'
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 # ALLOWED_HOSTS configuration
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
@@ -63,16 +69,22 @@ INSTALLED_APPS = [
     'users',
     'authentication',
     'onboarding',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    'tavonga_system.instrumentation.RequestMetricsMiddleware',
+    # Above admission so shed 503s carry CORS headers and browsers can read them
     'corsheaders.middleware.CorsMiddleware',
+    'tavonga_system.admission.AdmissionControlMiddleware',
+    'monitoring.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tavonga_system.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -104,9 +116,10 @@ WSGI_APPLICATION = 'tavonga_system.wsgi.application'
 DATABASE_URL = os.getenv('DATABASE_URL')
 
 if DATABASE_URL:
-    # Production database (Render PostgreSQL)
+    # Production database (Render PostgreSQL); connection reuse is configured
+    # with DB_POOL_MODE, DB_CONN_MAX_AGE and DB_POOL_* (see tavonga_system/db.py)
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL)
+        'default': database_config(DATABASE_URL)
     }
 else:
     # Development database (SQLite)
@@ -117,6 +130,106 @@ else:
         }
     }
 
+# Read replica for admin listings and reports (see tavonga_system/routers.py)
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = database_config(DATABASE_REPLICA_URL)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+elif not DATABASE_URL:
+    # Locally a second connection to the SQLite file stands in for a replica,
+    # so routing can be exercised; it is only used when REPLICA_DATABASE is set
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+REPLICA_DATABASE = 'replica' if DATABASE_REPLICA_URL else None
+DATABASE_ROUTERS = ['tavonga_system.routers.ReplicaRouter']
+
+# URL names whose GET requests may read from the replica; Django admin
+# changelists are always eligible
+REPLICA_ROUTES = [
+    'admin-onboarding-list',
+    'pending-documents',
+    'expiring-documents',
+    'admin-search',
+]
+# After a write, the same client reads from the primary for this long
+REPLICA_PIN_SECONDS = 10
+# A replica that fails its health check is skipped for this long
+REPLICA_HEALTH_CHECK_SECONDS = 30
+
+
+# Cache
+# A shared Redis cache keeps cached aggregates consistent across gunicorn workers;
+# without REDIS_URL each process falls back to its own local memory cache.
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'throttle',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'agnovat-default',
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'agnovat-throttle',
+        },
+    }
+
+if DATABASE_REPLICA_URL and not REDIS_URL:
+    # The read-your-writes pin (see tavonga_system/routers.py) is kept in the
+    # cache; per-process caches would only pin the worker that took the write
+    raise ImproperlyConfigured('DATABASE_REPLICA_URL requires REDIS_URL, so every worker sees the replica pin')
+
+# Admin stats are invalidated on every document/progress write. With Redis the
+# timeout only bounds staleness from bulk updates that bypass model signals;
+# with per-process caches an invalidation only reaches the worker that made the
+# write, so the others may serve stats up to this old.
+ONBOARDING_STATS_CACHE_TIMEOUT = int(os.getenv('ONBOARDING_STATS_CACHE_TIMEOUT', 60 * 60 if REDIS_URL else 60))
+ONBOARDING_STATS_SERIES_DAYS = 90
+
+# Delta sync: how long deleted-document tombstones are kept; clients with an
+# older cursor get a full snapshot instead
+SYNC_TOMBSTONE_RETENTION_DAYS = 90
+
+# Stored responses for write requests sent with an Idempotency-Key header;
+# retries after this long run the request again
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+# A key still in flight after this long is taken over by the next retry; kept
+# above the gunicorn worker timeout so only killed requests are taken over
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv('GUNICORN_TIMEOUT', '30')) * 2
+
+# Outbox events and the admin server-sent events stream
+OUTBOX_RETENTION_DAYS = 7
+SSE_POLL_SECONDS = 1
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_STREAM_SECONDS = 300
+# Under WSGI each open stream holds a worker thread; more than this many per
+# process get 503 so streams can't take every thread
+SSE_MAX_SYNC_STREAMS = 2
+# How long an EventSource ticket from admin/events/ticket/ can open the stream
+SSE_TICKET_MAX_AGE_SECONDS = 30
+# How long a stream keeps polling for a skipped event id before assuming its
+# insert rolled back; longer than any write request can take
+SSE_PENDING_ID_SECONDS = 120
+
+# Admin performance mode for large tables: planner-estimated counts above
+# ADMIN_EXACT_COUNT_THRESHOLD rows, keyset pagination and cached date buckets
+ADMIN_PERFORMANCE_MODE = os.getenv('ADMIN_PERFORMANCE_MODE', 'True') == 'True'
+ADMIN_EXACT_COUNT_THRESHOLD = 10000
+ADMIN_CHANGELIST_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -155,6 +268,16 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+STORAGES = {
+    # Filesystem storage that reports upload/download time to the request metrics
+    'default': {
+        'BACKEND': 'tavonga_system.instrumentation.TimedFileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -172,10 +295,40 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'tavonga_system.renderers.FastJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'tavonga_system.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20
+    'PAGE_SIZE': 20,
+    # Proxies in front of the app (1 on Render), so throttles see the client IP
+    # in X-Forwarded-For rather than the proxy's
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES')) if os.getenv('NUM_PROXIES') else None,
+}
+
+# Token-bucket throttles (see tavonga_system/throttling.py), by route scope and
+# client key: each bucket holds up to 'burst' requests and refills at 'rate'.
+# Best-effort: without REDIS_URL every worker process has its own buckets.
+# Off while running tests so suites aren't throttled; the throttle tests turn it on.
+THROTTLING_ENABLED = os.getenv('THROTTLING_ENABLED', str(not TESTING)) == 'True'
+THROTTLE_CACHE = 'throttle'
+THROTTLE_BUCKETS = {
+    'login': {
+        'ip': {'rate': '10/min', 'burst': 20},
+        # Failed sign-ins per account, whichever addresses they come from;
+        # successful ones don't count
+        'username': {'rate': '10/hour', 'burst': 10, 'failures_only': True},
+    },
+    'register': {
+        'ip': {'rate': '10/hour', 'burst': 5},
+    },
+    'upload': {
+        'user': {'rate': '60/hour', 'burst': 20},
+        'ip': {'rate': '300/hour', 'burst': 60},
+    },
 }
 
 # JWT Settings
@@ -228,3 +381,125 @@ SWAGGER_SETTINGS = {
         }
     }
 }
+
+# Request instrumentation (see tavonga_system/instrumentation.py). Server-Timing
+# shows any client the DB time and query count, so it is off unless DEBUG is on
+REQUEST_METRICS_SERVER_TIMING = os.getenv('REQUEST_METRICS_SERVER_TIMING', str(DEBUG)) == 'True'
+# Maximum queries per request, by URL name or "METHOD name" (which wins) so
+# writes get budgets of their own; exceeding one logs a warning
+REQUEST_QUERY_BUDGETS = {
+    'personal-details': 3,
+    'PUT personal-details': 16,
+    'PATCH personal-details': 16,
+    'onboarding-dashboard': 10,
+    'onboarding-dashboard-async': 8,
+    # Both read through OnboardingProgress.objects.current_for
+    'onboarding-progress': 12,
+    'onboarding-progress-async': 12,
+    'onboarding-sync': 6,
+    'documents': 6,
+    'POST documents': 26,
+    'document-detail': 6,
+    'PUT document-detail': 14,
+    'PATCH document-detail': 14,
+    'DELETE document-detail': 24,
+    'document-types': 6,
+    # A worker's first upload, which also creates their progress row, sent with
+    # an Idempotency-Key as mobile clients do and retried after its first
+    # attempt's worker died; replacing a document without a key takes 21
+    'POST upload-document': 34,
+    'admin-onboarding-list': 6,
+    'PUT admin-document-review': 27,
+    'PATCH admin-document-review': 27,
+    'pending-documents': 3,
+    'expiring-documents': 3,
+    'admin-search': 4,
+    'admin-stats': 6,
+    'POST admin-event-stream-ticket': 1,
+    'user-onboarding-detail': 10,
+    'user-onboarding-detail-async': 6,
+    'POST register': 10,
+    'POST login': 2,
+    'POST token_refresh': 1,
+    'profile': 1,
+    'PUT update_profile': 10,
+    'PATCH update_profile': 10,
+    'PUT change_password': 2,
+    'PATCH change_password': 2,
+}
+
+# Admission control (see tavonga_system/admission.py): in-flight requests per
+# route class in each worker process. Requests over 'concurrency' wait in a
+# queue of 'queue' entries for up to 'timeout' seconds, then get 503 with
+# 'retry_after'. Unlisted routes share the default class, which admits no more
+# requests than a process has database connections (DB_POOL_MAX_SIZE); more
+# would only wait for a connection while holding a thread. Under WSGI the
+# gates need threaded workers (GUNICORN_THREADS, see gunicorn.conf.py).
+ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'True') == 'True'
+ADMISSION_ROUTE_CLASSES = {
+    'uploads': {
+        'routes': ['upload-document', 'POST documents'],
+        'concurrency': int(os.getenv('ADMISSION_UPLOAD_CONCURRENCY', 4)),
+        'queue': 8, 'timeout': 10, 'retry_after': 5,
+    },
+    # Admin reports that aggregate or scan across all workers
+    'admin_reports': {
+        'routes': ['admin-onboarding-list', 'pending-documents', 'expiring-documents', 'admin-search', 'admin-stats'],
+        'concurrency': 4, 'queue': 16, 'timeout': 5, 'retry_after': 2,
+    },
+    'default': {
+        'concurrency': int(os.getenv('ADMISSION_DEFAULT_CONCURRENCY', pool_max_size())),
+        'queue': 64, 'timeout': 5, 'retry_after': 1,
+    },
+}
+# Open-ended streams, and the metrics scrape that has to work under load
+ADMISSION_EXEMPT_ROUTES = ['admin-event-stream', 'metrics']
+
+# Bearer token Prometheus must send to /metrics; unset, the endpoint is only
+# open with DEBUG on
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# On-demand profiling (see monitoring/profiling.py); the middleware is removed
+# from the stack entirely unless PROFILING_ENABLED is set
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_DIR = os.getenv('PROFILING_DIR', '/tmp/agnovat-profiles')
+PROFILING_MAX_FILES = 50
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
+# Slow-query log (see monitoring/slow_queries.py); off unless a threshold is set
+SLOW_QUERY_THRESHOLD_MS = os.getenv('SLOW_QUERY_THRESHOLD_MS')
+SLOW_QUERY_THRESHOLD_MS = float(SLOW_QUERY_THRESHOLD_MS) if SLOW_QUERY_THRESHOLD_MS else None
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', str(DEBUG)) == 'True'
+SLOW_QUERY_EXPLAIN_ANALYZE = os.getenv('SLOW_QUERY_EXPLAIN_ANALYZE', 'False') == 'True'
+SLOW_QUERY_MAX_ROWS = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '{asctime} {levelname} {name} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'tavonga_system': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # One line per request; only budget warnings while running tests
+        'tavonga_system.requests': {
+            'handlers': ['console'],
+            'level': 'WARNING' if TESTING else os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
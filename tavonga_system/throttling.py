@@ -0,0 +1,141 @@
+"""
+Token-bucket rate limits for expensive endpoints.
+
+Login and registration spend most of their time in password hashing and
+uploads in file I/O, so a burst against either can tie up every worker.
+Each throttled route (its scope) has buckets in ``THROTTLE_BUCKETS`` keyed by
+client IP, for authenticated requests by user and, for login, by the account
+being signed in to, so credential stuffing spread over many addresses is
+limited too. A bucket holds up to ``burst`` tokens and refills at ``rate``; a
+request takes one token from every bucket it falls in, or is refused with 429
+and ``Retry-After`` when any of them is empty.
+
+A bucket marked ``failures_only`` is checked on every request but only spent
+by the view, through ``record_failure``, when the request fails (a wrong
+password). The account's own successful sign-ins, from however many devices,
+never use it up, and nobody can lock an account with requests that would
+succeed.
+
+DRF checks throttles right after authentication, before ``request.data`` is
+first read, so a refused request never parses (or spools) its body; only
+scopes with a ``username`` bucket read the (small) body to find the account.
+
+The limits are best-effort. Buckets live in the ``THROTTLE_CACHE`` cache,
+which is Redis when ``REDIS_URL`` is set and so shared by all workers. Without
+it each worker process keeps its own buckets, and a client gets the limits
+once per process. Tokens are read and written back without a lock, so
+requests racing on one bucket can each spend the same token.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """Tokens per second for a DRF-style rate such as ``'10/min'``"""
+    count, period = rate.split('/')
+    return int(count) / PERIODS[period[0]]
+
+
+def _refill(state, burst, per_second, now):
+    if state is None:
+        return float(burst)
+    tokens, updated = state
+    return min(float(burst), tokens + (now - updated) * per_second)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle for the scope in ``throttle_scope`` on the view, or ``scope`` on
+    the class (function views use ``TokenBucketThrottle.for_scope(...)``)
+    """
+    scope = None
+
+    @classmethod
+    def for_scope(cls, scope):
+        return type(f'{scope.title()}TokenBucketThrottle', (cls,), {'scope': scope})
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scope', None) or self.scope
+
+    def get_identities(self, request, kinds):
+        identities = {'ip': self.get_ident(request)}
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            identities['user'] = user.pk
+        if 'username' in kinds:
+            username = self.get_username(request)
+            if username:
+                identities['username'] = username
+        return identities
+
+    def get_username(self, request):
+        """Digest of the email or username a request signs in with, or None"""
+        data = request.data
+        value = (data.get('email') or data.get('username')) if hasattr(data, 'get') else None
+        if not isinstance(value, str) or not value.strip():
+            return None
+        # Keeps addresses out of cache keys
+        return hashlib.sha256(value.strip().lower().encode()).hexdigest()[:32]
+
+    def get_limits(self, request, view):
+        """``{cache key: (burst, tokens per second, failures only)}`` for the buckets ``request`` falls in"""
+        if not getattr(settings, 'THROTTLING_ENABLED', True):
+            return {}
+        scope = self.get_scope(view)
+        buckets = getattr(settings, 'THROTTLE_BUCKETS', {}).get(scope)
+        if not buckets:
+            return {}
+        identities = self.get_identities(request, buckets)
+        return {
+            f'throttle:{scope}:{kind}:{identities[kind]}': (
+                limit['burst'], parse_rate(limit['rate']), limit.get('failures_only', False),
+            )
+            for kind, limit in buckets.items() if kind in identities
+        }
+
+    def _spend(self, limits, failed=False):
+        """
+        Take a token from every bucket in ``limits``, or from none if one is
+        empty; returns whether it did. ``failures_only`` buckets are only
+        spent when ``failed``.
+        """
+        cache = caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+        now = time.time()
+        states = cache.get_many(list(limits))
+        tokens = {
+            key: _refill(states.get(key), burst, per_second, now)
+            for key, (burst, per_second, _) in limits.items()
+        }
+
+        empty = [key for key, available in tokens.items() if available < 1]
+        if empty:
+            # Nothing is written for a refused request
+            self.wait_seconds = max((1 - tokens[key]) / limits[key][1] for key in empty)
+            return False
+
+        for key, (burst, per_second, failures_only) in limits.items():
+            if failures_only and not failed:
+                continue
+            # Once a bucket would be full again its state no longer matters
+            cache.set(key, (tokens[key] - 1, now), timeout=int(burst / per_second) + 1)
+        return True
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        limits = self.get_limits(request, view)
+        return self._spend(limits) if limits else True
+
+    def record_failure(self, request, view):
+        """Spend a token from the ``failures_only`` buckets of a request that failed"""
+        limits = {key: limit for key, limit in self.get_limits(request, view).items() if limit[2]}
+        if limits:
+            self._spend(limits, failed=True)
+
+    def wait(self):
+        return self.wait_seconds
@@ -20,6 +20,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from . import views
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Agnovat Support Worker Management System API",
@@ -40,6 +42,9 @@ urlpatterns = [
     # API endpoints
     path('api/auth/', include('authentication.urls')),
     path('api/onboarding/', include('onboarding.urls')),
+    path('api/system/db-pool/', views.database_pool_status, name='database-pool-status'),
+    path('api/system/', include('monitoring.urls')),
+    path('metrics', views.metrics, name='metrics'),
     
     # Swagger documentation
     path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
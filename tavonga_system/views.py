@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+from .db import pool_metrics
+from .metrics import render_metrics
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={200: openapi.Response('Connection statistics per database alias', openapi.Schema(type=openapi.TYPE_OBJECT))}
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def database_pool_status(request):
+    """Get database connection/pool metrics for the worker serving this request"""
+    user = request.user
+    if user.role not in ['admin', 'coordinator']:
+        return Response(
+            {'error': 'Permission denied'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    return Response(pool_metrics())
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint; requires ``Authorization: Bearer <METRICS_TOKEN>``.
+
+    Without METRICS_TOKEN it is only open with DEBUG on, so a deployment that
+    forgot the token doesn't publish its metrics.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
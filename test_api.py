@@ -2,11 +2,37 @@
 """
 Simple test script to verify API endpoints are working correctly.
 Run this after starting the Django development server.
+
+    python test_api.py                       # one-off smoke test
+    python test_api.py load --users 20 --duration 60 --output results.json
+    python test_api.py compare before.json after.json
+
+``load`` replays mixed worker flows (login -> dashboard -> upload -> progress
+polls) and admin flows (login -> pending documents -> review) with concurrent
+virtual users, and reports throughput and p50/p95/p99 latency per endpoint.
+Each virtual user logs in once and keeps its token until the server rejects
+it; requests made during ``--ramp-up`` are not counted. It works against
+``runserver`` or gunicorn on SQLite or the docker-compose Postgres; create the
+admin account and document types first with ``manage.py create_test_users``
+and ``manage.py setup_document_types``, and start the server with
+``THROTTLING_ENABLED=False``: every virtual user registers and logs in from
+one address, which the rate limits would refuse. ``load`` checks this before
+it starts.
 """
 
-import requests
+import argparse
 import json
+import math
+import random
+import subprocess
 import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
 
 BASE_URL = "http://localhost:8000"
 
@@ -85,7 +111,7 @@ def test_profile_access(access_token):
         return False
 
 
-def main():
+def smoke():
     print("=" * 50)
     print("Agnovat API Test Script")
     print("=" * 50)
@@ -116,5 +142,317 @@ def main():
     print("=" * 50)
 
 
+# Load testing
+
+PDF_BYTES = b"%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\ntrailer << /Root 1 0 R >>\n%%EOF\n"
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    """Thread-safe latency and error samples per endpoint label, kept once measuring has started"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.measuring_since = None
+
+    def start(self):
+        self.measuring_since = time.perf_counter()
+
+    def record(self, label, started, elapsed, ok):
+        if self.measuring_since is None or started < self.measuring_since:
+            return
+        with self.lock:
+            self.latencies.setdefault(label, [])
+            self.errors.setdefault(label, 0)
+            if ok:
+                self.latencies[label].append(elapsed)
+            else:
+                self.errors[label] += 1
+
+    def summary(self, duration):
+        endpoints = {}
+        for label in sorted(self.latencies):
+            samples = self.latencies[label]
+            entry = {
+                "requests": len(samples),
+                "errors": self.errors[label],
+                "throughput_rps": round(len(samples) / duration, 2),
+            }
+            if samples:
+                entry["mean_ms"] = round(sum(samples) / len(samples) * 1000, 2)
+                entry["max_ms"] = round(max(samples) * 1000, 2)
+                for pct in PERCENTILES:
+                    entry[f"p{pct}_ms"] = round(percentile(samples, pct) * 1000, 2)
+            endpoints[label] = entry
+        return endpoints
+
+
+class VirtualUser:
+    """One simulated client with its own session and credentials"""
+
+    def __init__(self, base_url, recorder, stop_at):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.stop_at = stop_at
+        self.session = requests.Session()
+
+    def call(self, label, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=30, **kwargs)
+            ok = response.status_code < 400
+            if response.status_code == 401:
+                # Expired token: the next flow logs in again
+                self.session.headers.pop("Authorization", None)
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(label, started, time.perf_counter() - started, ok)
+        return response if ok else None
+
+    def login(self):
+        """Log in unless the session still holds a token"""
+        if "Authorization" in self.session.headers:
+            return True
+        response = self.call("login", "POST", "/api/auth/login/", json={"email": self.email, "password": self.password})
+        if response is None:
+            return False
+        self.session.headers["Authorization"] = f"Bearer {response.json()['access']}"
+        return True
+
+    def running(self):
+        return time.monotonic() < self.stop_at
+
+
+class WorkerUser(VirtualUser):
+    def __init__(self, base_url, recorder, stop_at, polls):
+        super().__init__(base_url, recorder, stop_at)
+        self.polls = polls
+        self.email = f"loadtest-{uuid.uuid4().hex[:12]}@example.com"
+        self.password = "loadtest-pass-123"
+        self.document_types = []
+
+    def setup(self):
+        data = {
+            "username": self.email.split("@")[0],
+            "email": self.email,
+            "password": self.password,
+            "password_confirm": self.password,
+            "first_name": "Load",
+            "last_name": "Test",
+            "role": "worker",
+        }
+        if self.call("register", "POST", "/api/auth/register/", json=data) is None:
+            return False
+        if not self.login():
+            return False
+        response = self.call("document-types", "GET", "/api/onboarding/document-types/")
+        if response is not None:
+            body = response.json()
+            self.document_types = [item["id"] for item in body.get("results", body)]
+        return True
+
+    def flow(self):
+        if not self.login():
+            return
+        self.call("dashboard", "GET", "/api/onboarding/dashboard/")
+        if self.document_types:
+            self.call(
+                "upload", "POST", "/api/onboarding/upload/",
+                data={"document_type": random.choice(self.document_types)},
+                files={"file": ("document.pdf", PDF_BYTES, "application/pdf")},
+            )
+        etag = None
+        for _ in range(self.polls):
+            headers = {"If-None-Match": etag} if etag else {}
+            response = self.call("progress", "GET", "/api/onboarding/progress/", headers=headers)
+            if response is not None:
+                etag = response.headers.get("ETag", etag)
+
+
+class AdminUser(VirtualUser):
+    def __init__(self, base_url, recorder, stop_at, email, password):
+        super().__init__(base_url, recorder, stop_at)
+        self.email = email
+        self.password = password
+
+    def setup(self):
+        return self.login()
+
+    def flow(self):
+        if not self.login():
+            return
+        response = self.call("pending-documents", "GET", "/api/onboarding/admin/documents/pending/")
+        if response is None or not response.json():
+            return
+        document = random.choice(response.json())
+        self.call(
+            "review", "PATCH", f"/api/onboarding/admin/documents/{document['id']}/review/",
+            json={"status": random.choice(["approved", "approved", "approved", "rejected"]), "notes": "Load test"},
+        )
+
+
+def run_virtual_user(user, think_time):
+    if not user.setup():
+        return
+    while user.running():
+        user.flow()
+        if think_time:
+            time.sleep(random.uniform(0, think_time))
+
+
+def check_throttling(base_url, attempts=10):
+    """
+    Refuse to run against a server with rate limits on.
+
+    Throttles are checked before the payload is read, so empty registrations
+    come back 400 from an unthrottled server and 429 once a bucket is spent.
+    """
+    for _ in range(attempts):
+        try:
+            response = requests.post(f"{base_url}/api/auth/register/", json={}, timeout=30)
+        except requests.RequestException:
+            print(f"❌ Connection error. Make sure the server is running on {base_url}")
+            return False
+        if response.status_code == 429:
+            print("❌ The server is rate limiting registrations; restart it with THROTTLING_ENABLED=False")
+            return False
+    return True
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load(args):
+    if not check_throttling(args.base_url):
+        sys.exit(1)
+    random.seed(args.seed)
+    recorder = Recorder()
+    stop_at = time.monotonic() + args.ramp_up + args.duration
+    admins = min(args.users, math.ceil(args.users * args.admin_ratio)) if args.admin_email else 0
+    users = [
+        AdminUser(args.base_url, recorder, stop_at, args.admin_email, args.admin_password)
+        for _ in range(admins)
+    ] + [
+        WorkerUser(args.base_url, recorder, stop_at, args.polls)
+        for _ in range(args.users - admins)
+    ]
+    random.shuffle(users)
+
+    print(f"Running {len(users) - admins} worker and {admins} admin virtual users "
+          f"against {args.base_url} for {args.duration}s...")
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        for user in users:
+            pool.submit(run_virtual_user, user, args.think_time)
+            if args.ramp_up:
+                time.sleep(args.ramp_up / len(users))
+        # Everyone is running from here on; only this window is measured
+        recorder.start()
+    elapsed = time.perf_counter() - recorder.measuring_since
+
+    results = {
+        "meta": {
+            "base_url": args.base_url,
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "users": len(users),
+            "admin_users": admins,
+            "duration_s": round(elapsed, 1),
+            "seed": args.seed,
+        },
+        "endpoints": recorder.summary(elapsed),
+    }
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"Results written to {args.output}")
+    return results
+
+
+def print_results(results):
+    print(f"{'endpoint':<18} {'reqs':>7} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, entry in results["endpoints"].items():
+        print(
+            f"{label:<18} {entry['requests']:>7} {entry['errors']:>7} {entry['throughput_rps']:>8.1f} "
+            f"{entry.get('p50_ms', 0):>9.1f} {entry.get('p95_ms', 0):>9.1f} {entry.get('p99_ms', 0):>9.1f}"
+        )
+
+
+def compare(args):
+    """Print per-endpoint changes between two result files; non-zero exit on p95 regressions"""
+    with open(args.before) as handle:
+        before = json.load(handle)
+    with open(args.after) as handle:
+        after = json.load(handle)
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}")
+    print(f"{'endpoint':<18} {'metric':<15} {'before':>10} {'after':>10} {'change':>8}")
+
+    regressions = []
+    for label in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        old, new = before["endpoints"].get(label, {}), after["endpoints"].get(label, {})
+        for metric in ["throughput_rps"] + [f"p{pct}_ms" for pct in PERCENTILES]:
+            if metric not in old or metric not in new:
+                continue
+            change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            print(f"{label:<18} {metric:<15} {old[metric]:>10.1f} {new[metric]:>10.1f} {change:>+7.1f}%")
+            if metric == "p95_ms" and change > args.threshold:
+                regressions.append(label)
+
+    if regressions:
+        print(f"❌ p95 regressed by more than {args.threshold}% on: {', '.join(regressions)}")
+        return 1
+    print("✅ No p95 regressions")
+    return 0
+
+
+def main():
+    global BASE_URL
+    parser = argparse.ArgumentParser(description="Agnovat API smoke and load tests")
+    parser.add_argument("--base-url", default=BASE_URL)
+    commands = parser.add_subparsers(dest="command")
+
+    load_parser = commands.add_parser("load", help="Run concurrent mixed flows")
+    load_parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    load_parser.add_argument("--duration", type=float, default=30, help="Seconds to run after ramp-up")
+    load_parser.add_argument("--ramp-up", type=float, default=0, help="Seconds over which users start")
+    load_parser.add_argument("--admin-ratio", type=float, default=0.1, help="Share of users running admin flows")
+    load_parser.add_argument("--admin-email", default="admin@agnovat.com")
+    load_parser.add_argument("--admin-password", default="admin123")
+    load_parser.add_argument("--polls", type=int, default=3, help="Progress polls per worker flow")
+    load_parser.add_argument("--think-time", type=float, default=0.5, help="Max random pause between flows")
+    load_parser.add_argument("--seed", type=int, default=1)
+    load_parser.add_argument("--output", help="Write JSON results here")
+
+    compare_parser = commands.add_parser("compare", help="Compare two JSON result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=10, help="Allowed p95 increase in percent")
+
+    args = parser.parse_args()
+    BASE_URL = args.base_url.rstrip("/")
+    args.base_url = BASE_URL
+    if args.command == "load":
+        load(args)
+    elif args.command == "compare":
+        sys.exit(compare(args))
+    else:
+        smoke()
+
+
 if __name__ == "__main__":
     main()
@@ -5,6 +5,7 @@ from .models import User
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
+    # Plain search: the search index only covers workers, and this lists everyone
     list_display = ('username', 'email', 'role', 'first_name', 'last_name', 'is_active', 'date_joined')
     list_filter = ('role', 'is_active', 'is_staff', 'is_superuser')
     search_fields = ('username', 'email', 'first_name', 'last_name')